@@ -56,6 +56,8 @@ SOCIALACCOUNT_PROVIDERS = {
 
 
 MIDDLEWARE = [
+    # Primero, para contar también las consultas de sesión y autenticación
+    'tienda.consultas.PresupuestoConsultasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',  # Añade esto
@@ -103,10 +105,87 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # BEGIN IMMEDIATE: las transacciones que escriben (p. ej. confirmaciones de
+        # PayU simultáneas) esperan su turno en vez de fallar con "database is locked".
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
 
+# Caché
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# LocMem es por proceso: con varios workers usar Redis o Memcached para que
+# la versión del catálogo se comparta entre todos.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'motolux',
+        # El límite por defecto (300) no alcanza para una tarjeta y una fila del
+        # panel por producto: con miles de productos se expulsarían entre sí
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+}
+
+# Sesiones leídas de la caché y respaldadas en la BD: el carrito de los visitantes
+# anónimos vive en la sesión (ver tienda/carrito.py) y se consulta en cada página
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Vistas async de la tienda (tienda/views_async.py): activarlas al servir con ASGI,
+# p. ej. `uvicorn motolux.asgi:application`. Con WSGI rinden más las síncronas.
+VISTAS_ASYNC = False
+
+# Segundos que se guardan los listados y tarjetas del catálogo (ver tienda/cache_catalogo.py)
+CATALOGO_CACHE_TIMEOUT = 60 * 60
+# Segundos que cada proceso usa la versión del catálogo de su caché antes de
+# releerla de la base: con LocMem, la demora máxima para ver un cambio hecho en
+# otro proceso (p. ej. los derivados que genera `manage.py run_worker`)
+CATALOGO_VERSION_SEGUNDOS = 5
+
+# Segundos que un proxy inverso o CDN puede servir las páginas públicas de la tienda
+# sin revalidar (s-maxage); el navegador revalida siempre con ETag (tienda/condicional.py)
+TIENDA_CACHE_PROXY_SEGUNDOS = 60
+
+# Presupuesto de consultas SQL por vista (tienda/consultas.py; los límites están en
+# tienda/urls.py). Fracción de peticiones que se miden (se puede bajar en producción
+# si el costo preocupa; en modo estricto se miden todas), veces que un mismo
+# SELECT puede repetirse antes de avisar (N+1) y si pasarse del límite lanza error
+# en vez de solo registrarlo en el log `tienda.consultas` (los tests lo activan).
+CONSULTAS_MUESTREO = 1.0
+CONSULTAS_REPETIDAS = 5
+CONSULTAS_ESTRICTO = False
+
+# Productos por página en los listados de la tienda (paginación por cursor)
+CATALOGO_TAMANO_PAGINA = 24
+
+# Backend de búsqueda de productos (ver tienda/busqueda.py). Sin definir se usa
+# FTS5 en SQLite y LIKE en otras bases de datos.
+# BUSQUEDA_BACKEND = 'tienda.busqueda.SQLiteFTS5Backend'
+
+# Formato y calidad de los derivados de imágenes de productos (ver tienda/imagenes.py).
+# 'AVIF' pesa menos pero tarda más en generarse; si Pillow no soporta el formato se usa JPEG.
+IMAGENES_FORMATO = 'WEBP'
+IMAGENES_CALIDAD = 80
+
+# Las tareas en segundo plano (tienda/tareas.py) las ejecuta `manage.py run_worker`.
+# Con True se ejecutan al confirmar la transacción, sin worker.
+TAREAS_EN_LINEA = False
+
+# Minutos que un pedido pendiente de pago aparta su stock (ver tienda/inventario.py).
+# Las reservas vencidas se limpian con `manage.py liberar_reservas`.
+RESERVA_STOCK_MINUTOS = 15
+
+# Reglas de precios que se aplican al crear pedidos (ver tienda/precios.py).
+# 'tipo' es la clase de la regla y el resto sus argumentos, p. ej.:
+# {'tipo': 'tienda.precios.DescuentoCategoria', 'categoria': 2, 'porcentaje': 10},
+# {'tipo': 'tienda.precios.DescuentoPorCantidad', 'tramos': [(3, 5), (10, 12)]},
+# {'tipo': 'tienda.precios.Cupon', 'codigo': 'MOTOLUX10', 'porcentaje': 10, 'minimo': 100000},
+PRECIOS_REGLAS = []
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -217,3 +296,13 @@ PAYU_PROD_URL    = "https://checkout.payulatam.com/ppp-web-gateway-payu/"
 PAYU_RESPONSE_URL = "https://pentahydrated-minta-uncollected.ngrok-free.dev/payu/response/"        # visible al usuario
 PAYU_CONFIRMATION_URL = "https://pentahydrated-minta-uncollected.ngrok-free.dev/payu/confirmation/" # webhook (POST)
 PAYU_CURRENCY = "COP"
+
+# Pasarela falsa para desarrollo y pruebas de carga (`manage.py payu_local`).
+# Si se define, payu_checkout envía el formulario ahí y las URLs de respuesta y
+# confirmación se arman con el host de la petición en vez de las de ngrok.
+# PAYU_LOCAL_URL = "http://127.0.0.1:8001/"
+
+# Con True la confirmación de PayU solo valida la firma, guarda el evento y
+# responde OK; los eventos los aplica `manage.py process_payu_events` por lotes
+# (ver tienda/pagos.py). Requiere tener ese proceso corriendo.
+PAYU_CONFIRMACION_DIFERIDA = False
@@ -1,7 +1,12 @@
 
 
 from django.contrib import admin
-from .models import Categoria, Producto, Rol,  Usuario, Pedido, CarritoProductoPedido, ProductoImagen, Transaccion
+from django.utils import timezone
+from .models import Categoria, Producto, Rol,  Usuario, Pedido, CarritoProductoPedido, ProductoImagen, Transaccion, VentaDiaria, VentaProductoDiaria, Tarea, MovimientoStock, ReservaStock, ItemCarrito, EventoPayU
+from .ventas import actualizar_resumenes
+from .pagos import aplicar_evento
+from .contadores import PaginadorAproximado
+from .exportar import ESTADOS_POL
 
 # Personalización del modelo Categoria
 @admin.register(Categoria)
@@ -60,18 +65,146 @@ class PedidoAdmin(admin.ModelAdmin):
     list_display = ('id', 'usuario', 'fecha', 'total', 'estado')
     list_filter = ('estado', 'fecha')
     search_fields = ('usuario__user__username', 'usuario__user__email')  # Búsqueda por nombre de usuario o email
+    list_select_related = ('usuario__user',)
+    # Sin COUNT(*) de la tabla completa en cada página (ver tienda/contadores.py)
+    paginator = PaginadorAproximado
+    show_full_result_count = False
+
+    def save_model(self, request, obj, form, change):
+        # Mantener los resúmenes de ventas cuando se cambia el estado desde el admin
+        estado_anterior = form.initial.get('estado') if change else None
+        super().save_model(request, obj, form, change)
+        actualizar_resumenes(obj, estado_anterior, obj.estado)
 
 
 # Personalización del modelo CarritoProductoPedido
 @admin.register(CarritoProductoPedido)
 class CarritoProductoPedidoAdmin(admin.ModelAdmin):
     list_display = ('id', 'pedido', 'producto', 'cantidad', 'total')
-    list_filter = ('pedido', 'producto')  # Agregar filtros por pedido y producto
-    search_fields = ('producto__nombre',)  # Búsqueda por nombre del producto
+    # Un filtro por pedido listaría todos los pedidos; se busca por su número
+    list_filter = ('producto',)
+    search_fields = ('producto__nombre', 'pedido__id__exact')  # Búsqueda por producto o número de pedido
+    list_select_related = ('pedido__usuario__user', 'producto')
+    paginator = PaginadorAproximado
+    show_full_result_count = False
+
+# Resúmenes de ventas (solo lectura: se reconstruyen con manage.py reconstruir_ventas)
+@admin.register(VentaDiaria)
+class VentaDiariaAdmin(admin.ModelAdmin):
+    list_display = ('fecha', 'ingresos', 'pendientes', 'procesando', 'entregados', 'cancelados')
+    date_hierarchy = 'fecha'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(VentaProductoDiaria)
+class VentaProductoDiariaAdmin(admin.ModelAdmin):
+    list_display = ('fecha', 'producto', 'unidades', 'ingresos')
+    list_select_related = ('producto',)
+    date_hierarchy = 'fecha'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+# Libro de movimientos de inventario (lo escribe tienda/inventario.py)
+@admin.register(MovimientoStock)
+class MovimientoStockAdmin(admin.ModelAdmin):
+    list_display = ('fecha', 'producto', 'pedido', 'cantidad', 'faltante', 'motivo')
+    list_filter = ('motivo',)
+    list_select_related = ('producto',)
+    search_fields = ('producto__nombre',)
+    date_hierarchy = 'fecha'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(ReservaStock)
+class ReservaStockAdmin(admin.ModelAdmin):
+    list_display = ('id', 'producto', 'pedido', 'cantidad', 'expira', 'activa')
+    list_filter = ('activa',)
+    list_select_related = ('producto',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+# Carritos guardados de los clientes con cuenta (ver tienda/carrito.py)
+@admin.register(ItemCarrito)
+class ItemCarritoAdmin(admin.ModelAdmin):
+    list_display = ('usuario', 'producto', 'cantidad', 'actualizado')
+    list_select_related = ('usuario__user', 'producto')
+    search_fields = ('usuario__user__username', 'producto__nombre')
+
+# Cola de tareas en segundo plano (las ejecuta manage.py run_worker)
+@admin.register(Tarea)
+class TareaAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'estado', 'intentos', 'max_intentos', 'ejecutar_despues', 'actualizada')
+    list_filter = ('estado', 'tipo')
+    readonly_fields = ('tipo', 'argumentos', 'estado', 'intentos', 'iniciada', 'error', 'creada', 'actualizada')
+    actions = ['reintentar']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="Reintentar las tareas seleccionadas")
+    def reintentar(self, request, queryset):
+        n = queryset.exclude(estado=Tarea.EN_PROCESO).update(
+            estado=Tarea.PENDIENTE, intentos=0, ejecutar_despues=timezone.now())
+        self.message_user(request, f"{n} tareas vuelven a la cola.")
+
+# Confirmaciones recibidas de PayU (solo lectura; ver tienda/pagos.py)
+@admin.register(EventoPayU)
+class EventoPayUAdmin(admin.ModelAdmin):
+    list_display = ('recibido', 'referencia', 'transaction_id', 'state_pol', 'procesado')
+    list_filter = ('state_pol', ('procesado', admin.EmptyFieldListFilter))
+    search_fields = ('referencia', 'transaction_id')
+    date_hierarchy = 'recibido'
+    readonly_fields = ('transaction_id', 'state_pol', 'referencia', 'datos', 'recibido', 'procesado', 'error')
+    actions = ['reaplicar']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="Volver a aplicar los eventos seleccionados")
+    def reaplicar(self, request, queryset):
+        n = sum(aplicar_evento(evento, forzar=True) for evento in queryset.order_by('recibido', 'id'))
+        self.message_user(request, f"{n} eventos aplicados de nuevo.")
+
+class EstadoPolFilter(admin.SimpleListFilter):
+    # Opciones fijas: el filtro por defecto sacaría los valores con un DISTINCT de toda la tabla
+    title = 'estado'
+    parameter_name = 'estado_pol'
+
+    def lookups(self, request, model_admin):
+        return list(ESTADOS_POL.items())
+
+    def queryset(self, request, queryset):
+        return queryset.filter(estado_pol=self.value()) if self.value() else queryset
+
+
+@admin.register(Transaccion)
+class TransaccionAdmin(admin.ModelAdmin):
+    list_display = ('id_transaccion_payu', 'pedido', 'fecha', 'valor', 'estado_pol', 'metodo_pago_nombre')
+    list_filter = (EstadoPolFilter,)
+    list_select_related = ('pedido__usuario__user',)
+    search_fields = ('id_transaccion_payu',)
+    paginator = PaginadorAproximado
+    show_full_result_count = False
 
 # Registra los otros modelos para que aparezcan en el admin
 admin.site.register(ProductoImagen)
-admin.site.register(Transaccion)
 
 
 # Personalización general del sitio de administración
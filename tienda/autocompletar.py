@@ -0,0 +1,192 @@
+# autocompletar.py
+
+# índice en memoria (trigramas) para sugerir productos mientras el cliente escribe
+import bisect
+import heapq
+import itertools
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+from django.urls import reverse
+
+from .cache_catalogo import version_catalogo
+from .models import Producto
+
+# Límites que acotan el costo por tecla aunque el catálogo sea grande:
+# productos que se puntúan por consulta, y palabras del vocabulario que se
+# aceptan por prefijo o por parecido para cada palabra escrita.
+MAX_CANDIDATOS = 500
+MAX_PREFIJOS = 200
+MAX_PARECIDAS = 200
+
+
+def normalizar(texto) -> str:
+    """
+    Minúsculas, sin tildes y solo letras/números: "Gixxer 250 (Suzuki)" -> "gixxer 250 suzuki".
+    """
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(re.findall(r'\w+', texto.lower()))
+
+
+def trigramas(palabra) -> set:
+    """
+    Trigramas con relleno al inicio, así los prefijos cortos ("gi") también coinciden.
+    """
+    palabra = f"  {palabra} "
+    return {palabra[i:i + 3] for i in range(len(palabra) - 2)}
+
+
+def _similitud(a, b) -> float:
+    # Coeficiente de Dice entre los trigramas de dos palabras
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+class IndiceAutocompletar:
+    """
+    Índice sobre Producto.nombre y Producto.modelo en dos niveles:
+    trigrama -> palabras del vocabulario y palabra -> productos.
+    Los errores de tipeo se resuelven contra el vocabulario (pequeño) y no
+    contra cada producto. Se construye con una sola consulta y luego responde
+    sin tocar la base de datos.
+    """
+
+    def __init__(self, filas):
+        # filas: iterable de (id, nombre, modelo)
+        self.entradas = []          # (id, nombre, modelo, ids de palabras)
+        self.vocabulario = {}       # palabra -> id de palabra
+        self.palabras = []          # id de palabra -> (palabra, trigramas)
+        self.por_trigrama = {}      # trigrama -> ids de palabra
+        self.por_palabra = []       # id de palabra -> índices de entradas
+        self._ordenadas = None      # vocabulario ordenado, para buscar por prefijo
+        for producto_id, nombre, modelo in filas:
+            ids_palabras = []
+            for palabra in normalizar(f"{nombre} {modelo or ''}").split():
+                id_palabra = self.vocabulario.get(palabra)
+                if id_palabra is None:
+                    id_palabra = self._agregar_palabra(palabra)
+                if id_palabra not in ids_palabras:
+                    ids_palabras.append(id_palabra)
+                    self.por_palabra[id_palabra].append(len(self.entradas))
+            self.entradas.append((producto_id, nombre, modelo or '', ids_palabras))
+
+    def _agregar_palabra(self, palabra):
+        id_palabra = len(self.palabras)
+        tris = trigramas(palabra)
+        self.vocabulario[palabra] = id_palabra
+        self.palabras.append((palabra, tris))
+        self.por_palabra.append([])
+        self._ordenadas = None
+        # Los trigramas del inicio ("  g", " gi") los comparten demasiadas
+        # palabras; los prefijos se resuelven con el vocabulario ordenado.
+        for trigrama in tris:
+            if trigrama[0] != ' ':
+                self.por_trigrama.setdefault(trigrama, []).append(id_palabra)
+        return id_palabra
+
+    def _con_prefijo(self, palabra):
+        # Búsqueda binaria en el vocabulario ordenado (equivale a recorrer un trie)
+        if self._ordenadas is None:
+            self._ordenadas = sorted(self.vocabulario)
+        inicio = bisect.bisect_left(self._ordenadas, palabra)
+        for texto in itertools.islice(self._ordenadas, inicio, inicio + MAX_PREFIJOS):
+            if not texto.startswith(palabra):
+                break
+            yield self.vocabulario[texto]
+
+    def _parecidas(self, palabra, minimo) -> dict:
+        """
+        Palabras del vocabulario parecidas a `palabra` -> similitud (1.0 si es prefijo).
+        """
+        parecidas = dict.fromkeys(self._con_prefijo(palabra), 1.0)
+        # Con palabras muy cortas, o si ya sobran coincidencias exactas por
+        # prefijo, no vale la pena buscar errores de tipeo.
+        if len(palabra) < 3 or len(parecidas) >= MAX_PREFIJOS:
+            return parecidas
+
+        tris = trigramas(palabra)
+        votos = Counter()
+        for trigrama in tris:
+            if trigrama[0] != ' ':
+                votos.update(self.por_trigrama.get(trigrama, ()))
+        for id_palabra, comunes in votos.most_common(MAX_PARECIDAS):
+            if comunes < 2:
+                break
+            if id_palabra in parecidas:
+                continue
+            similitud = _similitud(tris, self.palabras[id_palabra][1])
+            if similitud >= minimo:
+                parecidas[id_palabra] = similitud
+        return parecidas
+
+    def sugerir(self, texto, limite=8, minimo=0.45) -> list:
+        """
+        Sugerencias ordenadas por parecido. Todas las palabras escritas deben
+        coincidir con alguna del producto, tolerando errores de tipeo
+        ("gixer 250" -> "Gixxer 250") y sin distinguir tildes ni mayúsculas.
+        """
+        palabras = normalizar(texto).split()
+        if not palabras:
+            return []
+        parecidas = [self._parecidas(palabra, minimo) for palabra in palabras]
+        if not all(parecidas):
+            return []
+
+        # La palabra más selectiva decide qué productos se evalúan, empezando
+        # por sus coincidencias más parecidas.
+        guia = min(parecidas, key=lambda p: sum(len(self.por_palabra[i]) for i in p))
+        candidatos = []
+        vistos = set()
+        for id_palabra in sorted(guia, key=guia.get, reverse=True):
+            for indice in self.por_palabra[id_palabra]:
+                if indice not in vistos:
+                    vistos.add(indice)
+                    candidatos.append(indice)
+                    if len(candidatos) >= MAX_CANDIDATOS:
+                        break
+            else:
+                continue
+            break
+
+        puntuados = []
+        for indice in candidatos:
+            ids_palabras = self.entradas[indice][3]
+            puntaje = 0.0
+            for similitudes in parecidas:
+                mejor = max((similitudes.get(i, 0.0) for i in ids_palabras), default=0.0)
+                if not mejor:
+                    break
+                puntaje += mejor
+            else:
+                puntuados.append((puntaje, indice))
+
+        mejores = heapq.nsmallest(limite, puntuados, key=lambda p: (-p[0], len(self.entradas[p[1]][1])))
+        return [
+            {'id': producto_id, 'nombre': nombre, 'modelo': modelo,
+             'url': reverse('producto_detalle', args=[producto_id])}
+            for producto_id, nombre, modelo, _ in (self.entradas[indice] for _, indice in mejores)
+        ]
+
+
+_indice = None
+_version = None
+_lock = threading.Lock()
+
+
+def get_indice() -> IndiceAutocompletar:
+    """
+    Índice del proceso. Se construye la primera vez que se usa y se vuelve a
+    construir cuando cambia la versión del catálogo (ver tienda/cache_catalogo.py).
+    """
+    global _indice, _version
+    version = version_catalogo()
+    if _indice is None or _version != version:
+        with _lock:
+            if _indice is None or _version != version:
+                _indice = IndiceAutocompletar(Producto.objects.values_list('id', 'nombre', 'modelo').iterator())
+                _version = version
+    return _indice
@@ -0,0 +1,174 @@
+# busqueda.py
+
+# búsqueda de productos con backend intercambiable (SQLite FTS5 por defecto)
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Producto
+
+TABLA_FTS = 'tienda_producto_fts'
+
+# Máximo de ids por sentencia al indexar o eliminar
+LOTE = 500
+
+# Pesos de bm25 por columna: nombre, modelo, descripcion, categoria
+PESOS_FTS = (10.0, 6.0, 1.0, 3.0)
+
+# Texto indexado de cada producto (el mismo SELECT sirve para indexar uno o todos)
+SELECT_DOCUMENTOS = """
+    SELECT p.id, p.nombre, COALESCE(p.modelo, ''), p.descripcion, c.nombre
+    FROM tienda_producto p
+    JOIN tienda_categoria c ON c.id = p.categoria_id
+"""
+
+
+def crear_tabla_fts(cursor):
+    """
+    Crea la tabla virtual FTS5. remove_diacritics 2 hace que "accion" encuentre
+    "acción" y prefix='2 3' acelera las búsquedas por prefijo ("gix" -> "gixxer").
+    La migración 0010 crea la misma tabla; esta función la usa reconstruir().
+    """
+    cursor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} "
+        "USING fts5(nombre, modelo, descripcion, categoria, "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    cursor.execute(f"DELETE FROM {TABLA_FTS}")
+    cursor.execute(f"INSERT INTO {TABLA_FTS}(rowid, nombre, modelo, descripcion, categoria) {SELECT_DOCUMENTOS}")
+
+
+def terminos(query) -> list:
+    """
+    Palabras de la búsqueda del cliente (sin signos ni operadores).
+    """
+    return re.findall(r'\w+', query.lower())
+
+
+class BackendBusqueda:
+    """
+    Interfaz de un backend de búsqueda. Para cambiarlo (p. ej. a uno con
+    SearchVector de PostgreSQL) basta con apuntar BUSQUEDA_BACKEND a otra subclase.
+    """
+
+    def filtrar(self, queryset, query):
+        """Restringe el queryset a los productos que coinciden con la búsqueda."""
+        raise NotImplementedError
+
+    def ids_por_relevancia(self, query, limite=1000) -> list:
+        """Ids de los productos que coinciden, del más al menos relevante."""
+        raise NotImplementedError
+
+    def indexar(self, productos):
+        """Agrega o actualiza productos en el índice."""
+
+    def eliminar(self, ids):
+        """Quita productos del índice."""
+
+    def reconstruir(self):
+        """Vuelve a generar el índice completo."""
+
+
+class IcontainsBackend(BackendBusqueda):
+    """
+    Búsqueda con LIKE sobre nombre, modelo, descripción y categoría.
+    No necesita índice; sirve de respaldo y de referencia en el benchmark.
+    """
+
+    def _condicion(self, query):
+        condicion = Q()
+        for termino in terminos(query):
+            condicion &= (
+                Q(nombre__icontains=termino) |
+                Q(modelo__icontains=termino) |
+                Q(descripcion__icontains=termino) |
+                Q(categoria__nombre__icontains=termino)
+            )
+        return condicion
+
+    def filtrar(self, queryset, query):
+        if not terminos(query):
+            return queryset.none()
+        return queryset.filter(self._condicion(query))
+
+    def ids_por_relevancia(self, query, limite=1000):
+        return list(self.filtrar(Producto.objects.order_by('-id'), query).values_list('id', flat=True)[:limite])
+
+
+class SQLiteFTS5Backend(BackendBusqueda):
+    """
+    Índice invertido FTS5 en la tabla virtual tienda_producto_fts (rowid = id del producto).
+    Resultados ordenados por bm25, coincidencia por prefijo y sin distinguir tildes.
+    """
+
+    def expresion(self, query) -> str:
+        # Cada palabra se cita (para que no se lea como operador) y se busca por prefijo
+        return ' '.join(f'"{termino}"*' for termino in terminos(query))
+
+    def filtrar(self, queryset, query):
+        expresion = self.expresion(query)
+        if not expresion:
+            return queryset.none()
+        return queryset.filter(id__in=RawSQL(f"SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s", [expresion]))
+
+    def ids_por_relevancia(self, query, limite=1000):
+        expresion = self.expresion(query)
+        if not expresion:
+            return []
+        pesos = ', '.join(str(peso) for peso in PESOS_FTS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s "
+                f"ORDER BY bm25({TABLA_FTS}, {pesos}) LIMIT %s",
+                [expresion, limite],
+            )
+            return [fila[0] for fila in cursor.fetchall()]
+
+    def indexar(self, productos):
+        ids = [producto.id for producto in productos]
+        with connection.cursor() as cursor:
+            for inicio in range(0, len(ids), LOTE):
+                lote = ids[inicio:inicio + LOTE]
+                marcas = ', '.join(['%s'] * len(lote))
+                cursor.execute(f"DELETE FROM {TABLA_FTS} WHERE rowid IN ({marcas})", lote)
+                cursor.execute(
+                    f"INSERT INTO {TABLA_FTS}(rowid, nombre, modelo, descripcion, categoria) "
+                    f"{SELECT_DOCUMENTOS} WHERE p.id IN ({marcas})",
+                    lote,
+                )
+
+    def eliminar(self, ids):
+        ids = list(ids)
+        with connection.cursor() as cursor:
+            for inicio in range(0, len(ids), LOTE):
+                lote = ids[inicio:inicio + LOTE]
+                marcas = ', '.join(['%s'] * len(lote))
+                cursor.execute(f"DELETE FROM {TABLA_FTS} WHERE rowid IN ({marcas})", lote)
+
+    def reconstruir(self):
+        with connection.cursor() as cursor:
+            crear_tabla_fts(cursor)
+
+
+_backend = None
+
+
+def get_backend() -> BackendBusqueda:
+    """
+    Backend configurado en settings.BUSQUEDA_BACKEND; si no hay, FTS5 en SQLite
+    y búsqueda por LIKE en cualquier otra base de datos.
+    """
+    global _backend
+    if _backend is None:
+        ruta = getattr(settings, 'BUSQUEDA_BACKEND', None)
+        if ruta:
+            _backend = import_string(ruta)()
+        elif connection.vendor == 'sqlite':
+            _backend = SQLiteFTS5Backend()
+        else:
+            _backend = IcontainsBackend()
+    return _backend
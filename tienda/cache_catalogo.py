@@ -0,0 +1,252 @@
+# cache_catalogo.py
+
+# caché versionada del catálogo: páginas de productos, categorías y tarjetas renderizadas
+import hashlib
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+from .models import Producto, Categoria, EstadoCatalogo
+from .busqueda import get_backend
+from .imagenes import url_derivado
+from .paginacion import ORDEN_POR_DEFECTO, ORDEN_RELEVANCIA, apaginar, normalizar_orden, paginar, paginar_ids
+
+VERSION_KEY = 'catalogo:version'
+TIMEOUT = getattr(settings, 'CATALOGO_CACHE_TIMEOUT', 60 * 60)
+TAMANO_PAGINA = getattr(settings, 'CATALOGO_TAMANO_PAGINA', 24)
+# Segundos que la caché guarda la versión antes de volver a leerla de la base.
+# Con una caché por proceso (LocMem) es lo que tarda un proceso en ver un cambio
+# hecho en otro (el worker de tareas, otro proceso web)
+VERSION_SEGUNDOS = getattr(settings, 'CATALOGO_VERSION_SEGUNDOS', 5)
+# Resultados por relevancia que se guardan por búsqueda
+MAX_RESULTADOS_BUSQUEDA = 1000
+
+
+def _version_de(actualizado) -> int:
+    return int(actualizado.timestamp() * 1_000_000)
+
+
+def version_catalogo() -> int:
+    """
+    Número de versión actual del catálogo: la fecha de EstadoCatalogo en
+    microsegundos. Todas las claves lo incluyen, así que cambiarla invalida de
+    una vez todo lo cacheado. La fuente es la base, no la caché: así la ven
+    todos los procesos aunque cada uno tenga su propia caché.
+    """
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = _version_de(EstadoCatalogo.objects.get_or_create(pk=1)[0].actualizado)
+        cache.set(VERSION_KEY, version, VERSION_SEGUNDOS)
+    return version
+
+
+def invalidar_catalogo():
+    """
+    Sube la versión del catálogo, que es su fecha de modificación (se llama
+    desde tienda/signals.py y desde el worker de tareas).
+    """
+    ahora = timezone.now()
+    EstadoCatalogo.objects.update_or_create(pk=1, defaults={'actualizado': ahora})
+    cache.set(VERSION_KEY, _version_de(ahora), VERSION_SEGUNDOS)
+
+
+def _digest(texto) -> str:
+    return hashlib.md5(texto.encode('utf-8')).hexdigest()
+
+
+def _clave(*partes) -> str:
+    return ':'.join(['catalogo', str(version_catalogo())] + [str(p) for p in partes])
+
+
+def _cacheado(clave, calcular):
+    valor = cache.get(clave)
+    if valor is None:
+        valor = calcular()
+        cache.set(clave, valor, TIMEOUT)
+    return valor
+
+
+def categorias() -> list:
+    return _cacheado(_clave('categorias'), lambda: list(Categoria.objects.all()))
+
+
+def categoria(categoria_id):
+    """
+    Busca la categoría en la lista cacheada; None si no existe.
+    """
+    return next((c for c in categorias() if c.id == categoria_id), None)
+
+
+def _ids_por_relevancia(query) -> list:
+    return _cacheado(_clave('relevancia', _digest(query.lower())),
+                     lambda: get_backend().ids_por_relevancia(query, MAX_RESULTADOS_BUSQUEDA))
+
+
+def pagina(categoria_id=None, query='', orden=ORDEN_POR_DEFECTO, cursor=None):
+    """
+    Página cacheada de productos, opcionalmente de una categoría o de una búsqueda.
+    Devuelve (productos, siguiente_cursor); ver tienda/paginacion.py.
+    """
+    query = query.strip()
+    orden = normalizar_orden(orden, busqueda=bool(query))
+    if query and orden == ORDEN_RELEVANCIA:
+        clave = _clave('pagina', 'relevancia', _digest(query.lower()), _digest(cursor) if cursor else '-', TAMANO_PAGINA)
+
+        def calcular():
+            ids, siguiente = paginar_ids(_ids_por_relevancia(query), cursor, TAMANO_PAGINA)
+            por_id = Producto.objects.in_bulk(ids)
+            return [por_id[i] for i in ids if i in por_id], siguiente
+
+        return _cacheado(clave, calcular)
+
+    queryset, filtro = _productos_filtrados(categoria_id, query)
+    clave = _clave('pagina', *filtro, orden, _digest(cursor) if cursor else '-', TAMANO_PAGINA)
+    return _cacheado(clave, lambda: paginar(queryset, orden, cursor, TAMANO_PAGINA))
+
+
+def _productos_filtrados(categoria_id, query):
+    """
+    Queryset de la página y la parte de la clave de caché que lo identifica.
+    """
+    if query:
+        return get_backend().filtrar(Producto.objects.all(), query), ('busqueda', _digest(query.lower()))
+    if categoria_id is not None:
+        return Producto.objects.filter(categoria_id=categoria_id), ('categoria', categoria_id)
+    return Producto.objects.all(), ('todos',)
+
+
+def _renderizar_tarjetas(claves, productos, variante, en_cache):
+    nuevas = {}
+    html = []
+    for clave, producto in zip(claves, productos):
+        fragmento = en_cache.get(clave)
+        if fragmento is None:
+            fragmento = render_to_string(f'tienda/index/tarjetas/{variante}.html', {'producto': producto})
+            nuevas[clave] = fragmento
+        html.append(mark_safe(fragmento))
+    return html, nuevas
+
+
+def tarjetas(productos, variante) -> list:
+    """
+    HTML de la tarjeta de cada producto (plantilla tienda/index/tarjetas/<variante>.html).
+    Las tarjetas se cachean por producto, variante e idioma y se piden con get_many.
+    """
+    prefijo = _clave('tarjeta', variante, get_language() or '')
+    claves = [f"{prefijo}:{producto.id}" for producto in productos]
+    html, nuevas = _renderizar_tarjetas(claves, productos, variante, cache.get_many(claves))
+    if nuevas:
+        cache.set_many(nuevas, TIMEOUT)
+    return html
+
+
+# --- Filas de la tabla de productos del panel (views.productos) ---
+# No dependen de la versión del catálogo: cada fila se invalida sola porque la
+# clave lleva la fecha `actualizado` de su producto.
+
+def tocar_producto(producto_id):
+    """
+    Marca el producto como modificado sin pasar por save() (cambiaron sus
+    imágenes o sus derivados): nueva clave para su fila y nuevo ETag para su página.
+    """
+    Producto.objects.filter(pk=producto_id).update(actualizado=timezone.now())
+
+
+def _renderizar_fila(producto) -> str:
+    imagenes = [url_derivado(imagen, 'miniatura') for imagen in producto.imagenes_adicionales.all()]
+    return render_to_string('tienda/admin/productos/fila.html', {
+        'producto': producto,
+        'imagenes': json.dumps(imagenes),
+    })
+
+
+def filas_admin() -> list:
+    """
+    HTML de cada fila de la tabla de productos del panel, ordenadas por id.
+    Con la caché llena cuesta una consulta (id y fecha de cada producto) y un
+    get_many; los productos que faltan se cargan juntos con sus imágenes adicionales.
+    """
+    idioma = get_language() or ''
+    versiones = list(Producto.objects.order_by('id').values_list('id', 'actualizado'))
+    claves = [f"admin:fila:{idioma}:{pk}:{actualizado.timestamp()}" for pk, actualizado in versiones]
+    en_cache = cache.get_many(claves)
+    faltan = [pk for (pk, _), clave in zip(versiones, claves) if clave not in en_cache]
+    if faltan:
+        productos = Producto.objects.prefetch_related('imagenes_adicionales').in_bulk(faltan)
+        nuevas = {
+            clave: _renderizar_fila(productos[pk])
+            for (pk, _), clave in zip(versiones, claves)
+            if clave not in en_cache and pk in productos
+        }
+        cache.set_many(nuevas, TIMEOUT)
+        en_cache.update(nuevas)
+    return [mark_safe(en_cache[clave]) for clave in claves if clave in en_cache]
+
+
+# --- Versiones async (tienda/views_async.py) ---
+# Mismas claves que las funciones de arriba, con la API async de la caché y del ORM.
+
+async def aversion_catalogo() -> int:
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        version = _version_de((await EstadoCatalogo.objects.aget_or_create(pk=1))[0].actualizado)
+        await cache.aset(VERSION_KEY, version, VERSION_SEGUNDOS)
+    return version
+
+
+async def _aclave(*partes) -> str:
+    return ':'.join(['catalogo', str(await aversion_catalogo())] + [str(p) for p in partes])
+
+
+async def _acacheado(clave, calcular):
+    valor = await cache.aget(clave)
+    if valor is None:
+        valor = await calcular()
+        await cache.aset(clave, valor, TIMEOUT)
+    return valor
+
+
+async def acategorias() -> list:
+    async def calcular():
+        return [c async for c in Categoria.objects.all()]
+    return await _acacheado(await _aclave('categorias'), calcular)
+
+
+async def acategoria(categoria_id):
+    return next((c for c in await acategorias() if c.id == categoria_id), None)
+
+
+async def apagina(categoria_id=None, query='', orden=ORDEN_POR_DEFECTO, cursor=None):
+    query = query.strip()
+    orden = normalizar_orden(orden, busqueda=bool(query))
+    if query and orden == ORDEN_RELEVANCIA:
+        clave = await _aclave('pagina', 'relevancia', _digest(query.lower()), _digest(cursor) if cursor else '-', TAMANO_PAGINA)
+
+        async def calcular():
+            # La búsqueda FTS5 usa el cursor de la conexión directamente: va en un hilo
+            todos = await _acacheado(await _aclave('relevancia', _digest(query.lower())),
+                                     sync_to_async(lambda: get_backend().ids_por_relevancia(query, MAX_RESULTADOS_BUSQUEDA)))
+            ids, siguiente = paginar_ids(todos, cursor, TAMANO_PAGINA)
+            por_id = await Producto.objects.ain_bulk(ids)
+            return [por_id[i] for i in ids if i in por_id], siguiente
+
+        return await _acacheado(clave, calcular)
+
+    queryset, filtro = _productos_filtrados(categoria_id, query)
+    clave = await _aclave('pagina', *filtro, orden, _digest(cursor) if cursor else '-', TAMANO_PAGINA)
+    return await _acacheado(clave, lambda: apaginar(queryset, orden, cursor, TAMANO_PAGINA))
+
+
+async def atarjetas(productos, variante) -> list:
+    prefijo = await _aclave('tarjeta', variante, get_language() or '')
+    claves = [f"{prefijo}:{producto.id}" for producto in productos]
+    html, nuevas = _renderizar_tarjetas(claves, productos, variante, await cache.aget_many(claves))
+    if nuevas:
+        await cache.aset_many(nuevas, TIMEOUT)
+    return html
@@ -0,0 +1,180 @@
+# carrito.py
+
+# carrito del lado del servidor: en la sesión para anónimos y en ItemCarrito para clientes con cuenta
+from django.db import IntegrityError, transaction
+
+from .imagenes import url_derivado
+from .inventario import con_disponible
+from .models import ItemCarrito, Producto
+from .precios import Linea, get_motor
+
+CLAVE_SESION = 'carrito'
+# Tope de unidades por producto aunque haya más stock
+MAX_UNIDADES = 99
+
+
+class ProductoNoDisponible(LookupError):
+    pass
+
+
+class CarritoSesion:
+    """
+    Carrito anónimo: {"producto_id": cantidad} dentro de la sesión (que con
+    SESSION_ENGINE cached_db se lee de la caché).
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    def items(self) -> dict:
+        return {int(pk): cantidad for pk, cantidad in self.session.get(CLAVE_SESION, {}).items()}
+
+    def fijar(self, producto_id, cantidad):
+        datos = dict(self.session.get(CLAVE_SESION, {}))
+        if cantidad > 0:
+            datos[str(producto_id)] = cantidad
+        else:
+            datos.pop(str(producto_id), None)
+        self.session[CLAVE_SESION] = datos
+
+    def vaciar(self):
+        self.session.pop(CLAVE_SESION, None)
+
+
+class CarritoBD:
+    """
+    Carrito de un cliente con sesión iniciada, guardado en ItemCarrito.
+    """
+
+    def __init__(self, usuario):
+        self.usuario = usuario
+
+    def items(self) -> dict:
+        return dict(ItemCarrito.objects.filter(usuario=self.usuario).values_list('producto_id', 'cantidad'))
+
+    def fijar(self, producto_id, cantidad):
+        filas = ItemCarrito.objects.filter(usuario=self.usuario, producto_id=producto_id)
+        if cantidad <= 0:
+            filas.delete()
+            return
+        if filas.update(cantidad=cantidad):
+            return
+        try:
+            with transaction.atomic():
+                ItemCarrito.objects.create(usuario=self.usuario, producto_id=producto_id, cantidad=cantidad)
+        except IntegrityError:
+            # Otra pestaña lo creó al mismo tiempo
+            filas.update(cantidad=cantidad)
+
+    def vaciar(self):
+        ItemCarrito.objects.filter(usuario=self.usuario).delete()
+
+
+def get_carrito(request):
+    if request.user.is_authenticated:
+        return CarritoBD(request.user.perfil)
+    return CarritoSesion(request.session)
+
+
+def _productos(ids) -> dict:
+    # Una consulta: lo necesario para mostrar y cotizar cada línea, más el disponible
+    campos = ('id', 'nombre', 'precio', 'categoria_id', 'imagen', 'derivados', 'stock')
+    return con_disponible(Producto.objects.only(*campos)).in_bulk(list(ids))
+
+
+def _linea(producto, cantidad, cotizada) -> dict:
+    return {
+        'producto_id': producto.id,
+        'nombre': producto.nombre,
+        'imagen': url_derivado(producto, 'miniatura'),
+        'precio': int(producto.precio),
+        'cantidad': cantidad,
+        'disponible': max(producto.disponible, 0),
+        'total': int(cotizada.total),
+    }
+
+
+def _cotizar(items, productos):
+    return get_motor().cotizar([
+        Linea(pk, productos[pk].categoria_id, productos[pk].precio, cantidad)
+        for pk, cantidad in items.items() if pk in productos
+    ])
+
+
+def _resumen(cotizacion) -> dict:
+    return {
+        'unidades': sum(linea.cantidad for linea in cotizacion.lineas),
+        'subtotal': int(cotizacion.subtotal),
+        'descuento': int(cotizacion.descuento),
+        'total': int(cotizacion.total),
+    }
+
+
+def contenido(carrito) -> dict:
+    """
+    Carrito completo (se pide una vez al cargar la página).
+    Los productos que ya no existen se quitan en silencio.
+    """
+    items = carrito.items()
+    productos = _productos(items)
+    for pk in [pk for pk in items if pk not in productos]:
+        carrito.fijar(pk, 0)
+        del items[pk]
+    cotizacion = _cotizar(items, productos)
+    return {
+        'lineas': [_linea(productos[linea.producto_id], linea.cantidad, linea) for linea in cotizacion.lineas],
+        'resumen': _resumen(cotizacion),
+    }
+
+
+def cambiar(carrito, producto_id, calcular) -> dict:
+    """
+    Cambia la cantidad de un producto (calcular: cantidad actual -> nueva) y
+    devuelve solo lo que cambió: la línea afectada (None si se quitó) y el resumen.
+    La cantidad se limita al stock disponible; si se recorta se avisa.
+    """
+    items = carrito.items()
+    productos = _productos(set(items) | {producto_id})
+    producto = productos.get(producto_id)
+    deseada = calcular(items.get(producto_id, 0))
+    if producto is None:
+        if deseada > 0:
+            raise ProductoNoDisponible(producto_id)
+        cantidad = 0
+    else:
+        cantidad = max(min(deseada, MAX_UNIDADES, max(producto.disponible, 0)), 0)
+
+    if cantidad != items.get(producto_id, 0):
+        carrito.fijar(producto_id, cantidad)
+    if cantidad:
+        items[producto_id] = cantidad
+    else:
+        items.pop(producto_id, None)
+
+    cotizacion = _cotizar(items, productos)
+    cotizada = next((linea for linea in cotizacion.lineas if linea.producto_id == producto_id), None)
+    return {
+        'producto_id': producto_id,
+        'linea': _linea(producto, cantidad, cotizada) if cotizada else None,
+        'aviso': "Solo puedes llevar {} unidades de este producto.".format(cantidad) if cantidad < deseada else '',
+        'resumen': _resumen(cotizacion),
+    }
+
+
+def fusionar(session, usuario):
+    """
+    Al iniciar sesión suma el carrito anónimo al guardado del cliente.
+    """
+    anonimo = CarritoSesion(session)
+    items = anonimo.items()
+    if not items:
+        return
+    guardado = CarritoBD(usuario)
+    actuales = guardado.items()
+    productos = _productos(items)
+    with transaction.atomic():
+        for pk, cantidad in items.items():
+            if pk in productos:
+                total = min(actuales.get(pk, 0) + cantidad, MAX_UNIDADES, max(productos[pk].disponible, 0))
+                guardado.fijar(pk, total)
+    anonimo.vaciar()
@@ -0,0 +1,135 @@
+# condicional.py
+
+# GET condicional para las páginas públicas de la tienda: ETag y Last-Modified a
+# partir de la fecha del catálogo (y la del producto), 304 sin renderizar nada y
+# cabeceras Cache-Control/Vary para que un proxy inverso o CDN guarde la página
+import hashlib
+from functools import wraps
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.db.models import Subquery
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.utils.translation import get_language
+
+from .inventario import con_disponible
+from .models import EstadoCatalogo, Producto
+
+# Segundos que un proxy compartido puede servir la página sin revalidar (s-maxage);
+# el navegador revalida siempre y recibe 304 si nada cambió
+MAX_AGE_PROXY = getattr(settings, 'TIENDA_CACHE_PROXY_SEGUNDOS', 60)
+
+_version_plantillas = None
+
+
+def version_plantillas() -> str:
+    """
+    Fecha de la plantilla más reciente de la tienda: entra en el ETag para que
+    un despliegue con plantillas nuevas no siga respondiendo 304 con la página vieja.
+    """
+    global _version_plantillas
+    if _version_plantillas is None:
+        carpeta = Path(__file__).resolve().parent / 'templates'
+        _version_plantillas = str(max((p.stat().st_mtime_ns for p in carpeta.rglob('*.html')), default=0))
+    return _version_plantillas
+
+
+def _estado_catalogo():
+    return EstadoCatalogo.objects.filter(pk=1).values('actualizado')
+
+
+def marca_catalogo(request, *args, **kwargs):
+    """
+    Listados: dependen solo del catálogo. Una consulta.
+    """
+    actualizado = _estado_catalogo().values_list('actualizado', flat=True).first()
+    return (actualizado, ()) if actualizado else None
+
+
+def marca_producto(request, producto_id, **kwargs):
+    """
+    Detalle: el producto, su stock disponible (las reservas cambian sin tocar
+    el producto) y el catálogo (productos relacionados), en una sola consulta.
+    """
+    fila = (
+        con_disponible(Producto.objects.filter(id=producto_id))
+        .annotate(catalogo=Subquery(_estado_catalogo()))
+        .values_list('actualizado', 'catalogo', 'disponible')
+        .first()
+    )
+    if fila is None:
+        return None
+    actualizado, catalogo, disponible = fila
+    return max(actualizado, catalogo or actualizado), (disponible,)
+
+
+def _etag(actualizado, extra) -> str:
+    partes = [actualizado.isoformat(), get_language() or '', version_plantillas(), *map(str, extra)]
+    return '"%s"' % hashlib.md5('|'.join(partes).encode()).hexdigest()
+
+
+def _validar(request, resultado):
+    """
+    (304 o None, etag, last_modified en segundos). None: hay que renderizar la página.
+    """
+    actualizado, extra = resultado
+    etag = _etag(actualizado, extra)
+    segundos = int(actualizado.timestamp())
+    return get_conditional_response(request, etag=etag, last_modified=segundos), etag, segundos
+
+
+def _cabeceras(respuesta, etag=None, segundos=None, publica=False):
+    if publica and respuesta.status_code in (200, 304):
+        respuesta.headers.setdefault('ETag', etag)
+        respuesta.headers.setdefault('Last-Modified', http_date(segundos))
+        patch_cache_control(respuesta, public=True, max_age=0, s_maxage=MAX_AGE_PROXY)
+    elif not respuesta.has_header('Cache-Control'):
+        # Con sesión iniciada la página lleva el nombre del usuario: no va a cachés compartidas
+        patch_cache_control(respuesta, private=True, max_age=0)
+    # La misma URL cambia con la sesión (visitante / cliente) y con el idioma
+    patch_vary_headers(respuesta, ('Cookie', 'Accept-Language'))
+    return respuesta
+
+
+def condicional(marca):
+    """
+    Decorador de vistas GET de la tienda. Para visitantes sin sesión iniciada
+    consulta solo `marca(request, *args, **kwargs)` -> (fecha, extras) o None y,
+    si el ETag o la fecha coinciden con lo que manda el navegador, responde 304
+    sin llamar a la vista. Con sesión iniciada la vista se ejecuta siempre.
+    Funciona con vistas síncronas y async (tienda/views_async.py).
+    """
+    def decorador(vista):
+        if iscoroutinefunction(vista):
+            @wraps(vista)
+            async def envuelta(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD') or await request.session.aget(SESSION_KEY):
+                    return _cabeceras(await vista(request, *args, **kwargs))
+                resultado = await sync_to_async(marca)(request, *args, **kwargs)
+                if resultado is None:
+                    return _cabeceras(await vista(request, *args, **kwargs))
+                respuesta, etag, segundos = _validar(request, resultado)
+                if respuesta is None:
+                    respuesta = await vista(request, *args, **kwargs)
+                return _cabeceras(respuesta, etag, segundos, publica=True)
+
+            return envuelta
+
+        @wraps(vista)
+        def envuelta(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or request.session.get(SESSION_KEY):
+                return _cabeceras(vista(request, *args, **kwargs))
+            resultado = marca(request, *args, **kwargs)
+            if resultado is None:
+                return _cabeceras(vista(request, *args, **kwargs))
+            respuesta, etag, segundos = _validar(request, resultado)
+            if respuesta is None:
+                respuesta = vista(request, *args, **kwargs)
+            return _cabeceras(respuesta, etag, segundos, publica=True)
+
+        return envuelta
+
+    return decorador
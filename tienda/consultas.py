@@ -0,0 +1,128 @@
+# consultas.py
+
+# conteo de consultas SQL por petición: presupuesto por nombre de URL (declarado
+# en tienda/urls.py), aviso de consultas repetidas (el patrón N+1) y ayuda para tests
+import logging
+import random
+import re
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_NUMEROS = re.compile(r"\b\d+\b")
+_LISTAS = re.compile(r"\((?:%s, )*%s\)")
+
+
+class PresupuestoExcedido(AssertionError):
+    """
+    Una petición hizo más consultas de las que permite su presupuesto.
+    """
+
+
+def forma(sql) -> str:
+    """
+    La consulta sin sus valores: `IN (%s, %s, %s)` queda `IN (...)` y los
+    números literales (LIMIT 21) quedan `?`, así dos consultas que solo cambian
+    en los parámetros cuentan como la misma.
+    """
+    return _NUMEROS.sub('?', _LISTAS.sub('(...)', sql))
+
+
+class Medicion:
+    """
+    Consultas ejecutadas mientras está activa `medir()`, agrupadas por forma.
+    """
+
+    def __init__(self):
+        self.formas = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.formas[forma(sql)] += 1
+        return execute(sql, params, many, context)
+
+    @property
+    def total(self) -> int:
+        return sum(self.formas.values())
+
+    def repetidas(self, umbral=None) -> list:
+        """
+        [(forma, veces)] de los SELECT que se repitieron `umbral` veces o más.
+        No cuenta los `IN (...)`: son lotes (in_bulk, prefetch_related), no N+1.
+        """
+        umbral = umbral or getattr(settings, 'CONSULTAS_REPETIDAS', 5)
+        return [(sql, veces) for sql, veces in self.formas.most_common()
+                if veces >= umbral and sql.lstrip().upper().startswith('SELECT') and 'IN (...)' not in sql]
+
+
+@contextmanager
+def medir():
+    medicion = Medicion()
+    with ExitStack() as pila:
+        for conexion in connections.all():
+            pila.enter_context(conexion.execute_wrapper(medicion))
+        yield medicion
+
+
+def presupuesto(nombre_url):
+    """
+    Máximo de consultas de la vista (tienda.urls.PRESUPUESTO_CONSULTAS); None si no tiene.
+    """
+    from .urls import PRESUPUESTO_CONSULTAS
+    return PRESUPUESTO_CONSULTAS.get(nombre_url)
+
+
+def _resumen(nombre_url, medicion, limite) -> str:
+    tope = f"presupuesto {limite}" if limite is not None else "sin presupuesto"
+    lineas = [f"{nombre_url}: {medicion.total} consultas ({tope})"]
+    lineas += [f"  {veces} veces: {sql[:300]}" for sql, veces in medicion.repetidas()]
+    return "\n".join(lineas)
+
+
+@contextmanager
+def assert_presupuesto(nombre_url, limite=None):
+    """
+    Para tests: falla si lo que se ejecuta dentro del `with` supera el
+    presupuesto de `nombre_url` (o `limite`).
+
+        with assert_presupuesto('pedido_detalle'):
+            self.client.get(reverse('pedido_detalle', args=[pedido.id]))
+    """
+    limite = limite if limite is not None else presupuesto(nombre_url)
+    with medir() as medicion:
+        yield medicion
+    if limite is not None and medicion.total > limite:
+        raise PresupuestoExcedido(_resumen(nombre_url, medicion, limite))
+
+
+class PresupuestoConsultasMiddleware:
+    """
+    Mide una fracción de las peticiones (settings.CONSULTAS_MUESTREO). Si la
+    vista supera su presupuesto o repite un SELECT, lo registra en el log
+    `tienda.consultas`; con settings.CONSULTAS_ESTRICTO mide todas y el exceso
+    lanza PresupuestoExcedido (en tests: la prueba falla).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        estricto = getattr(settings, 'CONSULTAS_ESTRICTO', False)
+        if not estricto and random.random() >= getattr(settings, 'CONSULTAS_MUESTREO', 1.0):
+            return self.get_response(request)
+
+        with medir() as medicion:
+            respuesta = self.get_response(request)
+
+        nombre_url = request.resolver_match.view_name if request.resolver_match else request.path
+        limite = presupuesto(nombre_url)
+        excedido = limite is not None and medicion.total > limite
+        if excedido and estricto:
+            raise PresupuestoExcedido(_resumen(nombre_url, medicion, limite))
+        if excedido or medicion.repetidas():
+            logger.warning("Consultas de %s %s\n%s", request.method, request.path,
+                           _resumen(nombre_url, medicion, limite))
+        return respuesta
@@ -0,0 +1,83 @@
+# contadores.py
+
+# totales de las tablas grandes sin COUNT(*): las señales suman o restan al crear
+# o borrar filas, y `manage.py reconciliar_contadores` los corrige contra la base
+# (bulk_create, QuerySet.update/delete y SQL directo no envían señales).
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .models import CarritoProductoPedido, Categoria, Contador, Pedido, Producto, Transaccion, Usuario
+from .tablas import contar
+
+# nombre del contador -> modelo contado
+CONTADOS = {
+    'productos': Producto,
+    'usuarios': Usuario,
+    'categorias': Categoria,
+    'pedidos': Pedido,
+    'lineas_pedido': CarritoProductoPedido,
+    'transacciones': Transaccion,
+}
+NOMBRES = {modelo: nombre for nombre, modelo in CONTADOS.items()}
+
+
+def sumar(nombre, delta):
+    """
+    Suma `delta` al contador cuando se confirma la transacción del llamador: si
+    se revierte no cuenta, y la fila del contador no queda bloqueada mientras
+    dura (todos los pedidos pasan por ella). Si el contador aún no existe no
+    hace nada; la primera lectura lo calcula.
+    """
+    if delta:
+        transaction.on_commit(
+            lambda: Contador.objects.filter(nombre=nombre).update(valor=F('valor') + delta))
+
+
+def reconciliar(nombres=None) -> dict:
+    """
+    Recuenta los contadores (todos, o los de `nombres`) con COUNT(*) y los
+    corrige. Devuelve {nombre: (valor anterior o None, valor contado)}.
+    """
+    anteriores = dict(Contador.objects.values_list('nombre', 'valor'))
+    resultado = {}
+    for nombre in nombres or CONTADOS:
+        total = CONTADOS[nombre].objects.count()
+        Contador.objects.update_or_create(nombre=nombre, defaults={'valor': total, 'reconciliado': timezone.now()})
+        resultado[nombre] = (anteriores.get(nombre), total)
+    return resultado
+
+
+def valores(*nombres) -> dict:
+    """
+    {nombre: total} en una sola consulta. Los que faltan se cuentan y se guardan.
+    """
+    encontrados = dict(Contador.objects.filter(nombre__in=nombres).values_list('nombre', 'valor'))
+    faltantes = [nombre for nombre in nombres if nombre not in encontrados]
+    if faltantes:
+        encontrados.update({nombre: total for nombre, (_, total) in reconciliar(faltantes).items()})
+    return encontrados
+
+
+def valor(nombre) -> int:
+    return valores(nombre)[nombre]
+
+
+class PaginadorAproximado(Paginator):
+    """
+    Paginador del admin para tablas grandes. Sin filtros ni búsqueda el total
+    sale del contador; con ellos se cuenta hasta tablas.LIMITE_CONTEO, y las
+    páginas más allá de ese límite no se enlazan. Va con
+    show_full_result_count = False, que evita el COUNT(*) del buscador.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        filtrada = bool(queryset.query.where)
+        if not filtrada and queryset.model in NOMBRES:
+            return valor(NOMBRES[queryset.model])
+        return contar(queryset, filtrada)[0]
+
@@ -0,0 +1,295 @@
+# exportar.py
+
+# exportación completa de pedidos y transacciones para contabilidad, en CSV o
+# XLSX. El archivo se genera por partes con StreamingHttpResponse mientras se
+# leen las filas con .iterator(): la memoria no crece con el número de filas.
+import csv
+import io
+import re
+import zipfile
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Pedido, Transaccion
+
+# Filas que se traen de la base por vez y que se envían juntas al cliente
+LOTE = getattr(settings, 'EXPORTAR_LOTE', 2_000)
+# Filas por hoja de Excel (el máximo de Excel es 1.048.576 contando el encabezado)
+FILAS_POR_HOJA = 1_048_575
+
+# Estado de PayU (estado_pol) -> nombre que muestra el panel
+ESTADOS_POL = {'4': 'Aprobada', '6': 'Rechazada', '5': 'Expirada', '7': 'Pendiente'}
+
+
+def _fecha(valor):
+    return timezone.localtime(valor).strftime('%Y-%m-%d %H:%M:%S') if valor else ''
+
+
+# Nombre -> queryset, campo del filtro ?estado= con sus valores válidos y
+# columnas (encabezado, campo, formato).
+# Los campos de otras tablas van en el mismo values_list: una sola consulta con JOIN.
+EXPORTACIONES = {
+    'pedidos': {
+        'queryset': lambda: Pedido.objects.all(),
+        'estado': 'estado',
+        'estados': dict(Pedido.ESTADOS),
+        'columnas': [
+            ('ID pedido', 'id', None),
+            ('Fecha', 'fecha', _fecha),
+            ('Estado', 'estado', None),
+            ('Total', 'total', None),
+            ('Usuario', 'usuario__user__username', None),
+            ('Nombre', 'usuario__user__first_name', None),
+            ('Apellido', 'usuario__user__last_name', None),
+            ('Email', 'usuario__user__email', None),
+            ('Cédula', 'usuario__cedula', None),
+            ('Teléfono', 'usuario__telefono', None),
+            ('Ciudad', 'usuario__ciudad', None),
+            ('Departamento', 'usuario__departamento', None),
+        ],
+    },
+    'transacciones': {
+        'queryset': lambda: Transaccion.objects.all(),
+        'estado': 'estado_pol',
+        'estados': ESTADOS_POL,
+        'columnas': [
+            ('ID', 'id', None),
+            ('Fecha', 'fecha', _fecha),
+            ('Pedido', 'pedido_id', None),
+            ('Transacción PayU', 'id_transaccion_payu', None),
+            ('Estado', 'estado_pol', lambda valor: ESTADOS_POL.get(valor, valor)),
+            ('Mensaje', 'mensaje_respuesta', None),
+            ('Método de pago', 'metodo_pago_nombre', None),
+            ('Valor', 'valor', None),
+            ('Moneda', 'moneda', None),
+            ('Email cliente', 'pedido__usuario__user__email', None),
+            ('Cédula cliente', 'pedido__usuario__cedula', None),
+        ],
+    },
+}
+
+
+def filtros_de(request) -> dict:
+    """
+    ?start_date= y ?end_date= (YYYY-MM-DD, ambos incluidos) y ?estado=. Los que
+    faltan o no son válidos no filtran: sin parámetros se exporta todo.
+    """
+    filtros = {'estado': request.GET.get('estado') or None}
+    for clave in ('start_date', 'end_date'):
+        try:
+            filtros[clave] = datetime.strptime(request.GET.get(clave, ''), '%Y-%m-%d').date()
+        except ValueError:
+            filtros[clave] = None
+    return filtros
+
+
+def tabla(nombre, start_date=None, end_date=None, estado=None):
+    """
+    (encabezados, generador de filas) de la exportación `nombre`, en orden de
+    fecha. El rango se filtra con fechas locales convertidas a instantes para
+    que la consulta use el índice de `fecha`.
+    """
+    exportacion = EXPORTACIONES[nombre]
+    queryset = exportacion['queryset']()
+    if start_date:
+        queryset = queryset.filter(fecha__gte=timezone.make_aware(datetime.combine(start_date, time.min)))
+    if end_date:
+        queryset = queryset.filter(fecha__lt=timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min)))
+    if estado in exportacion['estados']:
+        queryset = queryset.filter(**{exportacion['estado']: estado})
+
+    columnas = exportacion['columnas']
+    formatos = [formato for *_, formato in columnas]
+    filas = queryset.order_by('fecha', 'id').values_list(*(campo for _, campo, _ in columnas))
+
+    def generar():
+        for fila in filas.iterator(chunk_size=LOTE):
+            yield [formato(valor) if formato else valor for formato, valor in zip(formatos, fila)]
+
+    return [encabezado for encabezado, *_ in columnas], generar()
+
+
+# Excel y LibreOffice toman como fórmula una celda que empieza con estos caracteres
+_INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _texto_seguro(valor):
+    """
+    Antepone ' al texto que empieza como fórmula (nombres, ciudades o mensajes
+    que escribe el cliente o PayU) para que la hoja de cálculo no lo ejecute.
+    """
+    if isinstance(valor, str) and valor.startswith(_INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def csv_por_partes(encabezados, filas):
+    """
+    Texto CSV en trozos de LOTE filas. Empieza con BOM para que Excel abra el
+    UTF-8 con tildes.
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(encabezados)
+    yield '\ufeff' + buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for i, fila in enumerate(filas, 1):
+        escritor.writerow(['' if valor is None else _texto_seguro(valor) for valor in fila])
+        if i % LOTE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+class _Salida(io.RawIOBase):
+    """
+    Destino del zip: guarda lo escrito hasta que se recoge. No permite seek, así
+    zipfile escribe cada archivo de corrido (con data descriptor) sin volver atrás.
+    """
+
+    def __init__(self):
+        self.partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+    def recoger(self) -> bytes:
+        datos = b''.join(self.partes)
+        self.partes.clear()
+        return datos
+
+
+# Caracteres de control que XML no admite
+_NO_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _celda(valor) -> str:
+    if valor is None or valor == '':
+        return '<c/>'
+    if isinstance(valor, (int, Decimal)) and not isinstance(valor, bool):
+        return f'<c><v>{valor}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(_NO_XML.sub("", str(_texto_seguro(valor))))}</t></is></c>'
+
+
+def _fila(valores) -> str:
+    return '<row>' + ''.join(_celda(valor) for valor in valores) + '</row>'
+
+
+_INICIO_HOJA = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+_FIN_HOJA = '</sheetData></worksheet>'
+
+
+def _archivos_libro(hojas) -> dict:
+    """
+    Partes fijas del .xlsx para `hojas` hojas (se escriben al final, cuando se sabe cuántas son).
+    """
+    principal = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+    tipos = ''.join(
+        f'<Override PartName="/xl/worksheets/sheet{n}.xml" '
+        f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        for n in range(1, hojas + 1)
+    )
+    return {
+        '[Content_Types].xml': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            f'{tipos}</Types>'
+        ),
+        '_rels/.rels': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'<Relationship Id="rId1" Type="{principal}/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        ),
+        'xl/workbook.xml': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            f'xmlns:r="{principal}"><sheets>'
+            + ''.join(f'<sheet name="Hoja{n}" sheetId="{n}" r:id="rId{n}"/>' for n in range(1, hojas + 1))
+            + '</sheets></workbook>'
+        ),
+        'xl/_rels/workbook.xml.rels': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + ''.join(f'<Relationship Id="rId{n}" Type="{principal}/worksheet" Target="worksheets/sheet{n}.xml"/>'
+                      for n in range(1, hojas + 1))
+            + '</Relationships>'
+        ),
+    }
+
+
+def xlsx_por_partes(encabezados, filas):
+    """
+    Libro de Excel mínimo (texto en línea, sin estilos) escrito con zipfile
+    mientras llegan las filas; sin dependencias externas. Pasadas FILAS_POR_HOJA
+    filas sigue en una hoja nueva con el mismo encabezado.
+    """
+    salida = _Salida()
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_DEFLATED) as libro:
+        hojas = 0
+        hoja = None
+        en_hoja = FILAS_POR_HOJA
+        for i, fila in enumerate(filas, 1):
+            if en_hoja == FILAS_POR_HOJA:
+                if hoja:
+                    hoja.write(_FIN_HOJA.encode())
+                    hoja.close()
+                hojas += 1
+                hoja = libro.open(f'xl/worksheets/sheet{hojas}.xml', 'w', force_zip64=True)
+                hoja.write((_INICIO_HOJA + _fila(encabezados)).encode())
+                en_hoja = 0
+            hoja.write(_fila(fila).encode())
+            en_hoja += 1
+            if i % LOTE == 0:
+                yield salida.recoger()
+        if hoja is None:
+            hojas = 1
+            hoja = libro.open('xl/worksheets/sheet1.xml', 'w')
+            hoja.write((_INICIO_HOJA + _fila(encabezados)).encode())
+        hoja.write(_FIN_HOJA.encode())
+        hoja.close()
+        for nombre, contenido in _archivos_libro(hojas).items():
+            libro.writestr(nombre, contenido)
+    yield salida.recoger()
+
+
+FORMATOS = {
+    'csv': (csv_por_partes, 'text/csv; charset=utf-8'),
+    'xlsx': (xlsx_por_partes, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+def respuesta(request, nombre):
+    """
+    StreamingHttpResponse con la exportación `nombre` filtrada según el request.
+    ?formato=xlsx para Excel; por defecto CSV.
+    """
+    formato = request.GET.get('formato', 'csv')
+    if formato not in FORMATOS:
+        formato = 'csv'
+    filtros = filtros_de(request)
+    generar, tipo = FORMATOS[formato]
+    contenido = generar(*tabla(nombre, **filtros))
+
+    if filtros['estado'] not in EXPORTACIONES[nombre]['estados']:
+        filtros['estado'] = None
+    partes = [nombre] + [str(filtros[clave]) for clave in ('start_date', 'end_date', 'estado') if filtros[clave]]
+    respuesta = StreamingHttpResponse(contenido, content_type=tipo)
+    respuesta['Content-Disposition'] = f'attachment; filename="{"_".join(partes)}.{formato}"'
+    return respuesta
@@ -0,0 +1,166 @@
+# imagenes.py
+
+# derivados redimensionados (miniatura, tarjeta, detalle) de las imágenes de productos
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+# Nombre del tamaño -> ancho máximo en píxeles. Nunca se agranda una imagen.
+TAMANOS = {
+    'miniatura': 150,
+    'tarjeta': 400,
+    'detalle': 1000,
+}
+
+# WebP lo soportan todos los navegadores actuales; si Pillow no lo trae, JPEG
+FORMATO = getattr(settings, 'IMAGENES_FORMATO', 'WEBP')
+CALIDAD = getattr(settings, 'IMAGENES_CALIDAD', 80)
+EXTENSIONES = {'WEBP': 'webp', 'AVIF': 'avif', 'JPEG': 'jpg'}
+
+
+def formato_salida() -> str:
+    if FORMATO != 'JPEG' and features.check(FORMATO.lower()):
+        return FORMATO
+    return 'JPEG'
+
+
+def ruta_derivado(nombre_original, tamano, formato) -> str:
+    """
+    productos/moto.jpg -> productos/derivados/moto-400w.webp
+    """
+    carpeta, archivo = os.path.split(nombre_original)
+    base = os.path.splitext(archivo)[0]
+    return os.path.join(carpeta, 'derivados', f"{base}-{TAMANOS[tamano]}w.{EXTENSIONES[formato]}")
+
+
+def _redimensionar(imagen, ancho, formato) -> tuple:
+    copia = imagen.copy()
+    copia.thumbnail((ancho, ancho * 4), Image.LANCZOS)
+    if formato == 'JPEG' and copia.mode != 'RGB':
+        copia = copia.convert('RGB')
+    salida = io.BytesIO()
+    copia.save(salida, formato, quality=CALIDAD)
+    return salida.getvalue(), copia.size
+
+
+def firma(campo):
+    """
+    Tamaño y fecha de modificación del archivo: distingue una imagen reemplazada
+    por otra con el mismo nombre. None si el archivo no existe o el storage no
+    informa la fecha.
+    """
+    try:
+        return f"{campo.storage.size(campo.name)}:{campo.storage.get_modified_time(campo.name).timestamp()}"
+    except (OSError, NotImplementedError):
+        return None
+
+
+def generar_derivados(campo) -> dict:
+    """
+    Genera los derivados del ImageField `campo` en su mismo storage y devuelve
+    el diccionario que se guarda en el campo `derivados` del modelo:
+    {'origen': nombre, 'firma': ..., 'tarjeta': {'nombre': ..., 'ancho': ..., 'alto': ...}, ...}
+    Si dos tamaños quedan iguales (imagen pequeña) solo se guarda el primero.
+    """
+    formato = formato_salida()
+    storage = campo.storage
+    with storage.open(campo.name, 'rb') as archivo:
+        imagen = Image.open(archivo)
+        imagen.load()
+    # Respeta la orientación EXIF de las fotos tomadas con el celular
+    imagen = ImageOps.exif_transpose(imagen)
+    if imagen.mode not in ('RGB', 'RGBA'):
+        imagen = imagen.convert('RGBA' if 'transparency' in imagen.info or imagen.mode in ('LA', 'PA') else 'RGB')
+
+    derivados = {'origen': campo.name, 'firma': firma(campo)}
+    anchos = set()
+    for tamano, ancho in TAMANOS.items():
+        if ancho >= imagen.width and imagen.width in anchos:
+            continue
+        contenido, (w, h) = _redimensionar(imagen, ancho, formato)
+        nombre = ruta_derivado(campo.name, tamano, formato)
+        if storage.exists(nombre):
+            storage.delete(nombre)
+        nombre = storage.save(nombre, ContentFile(contenido))
+        derivados[tamano] = {'nombre': nombre, 'ancho': w, 'alto': h}
+        anchos.add(w)
+    return derivados
+
+
+def eliminar_derivados(derivados, storage, conservar=()):
+    """
+    Borra los archivos de `derivados` salvo los nombres en `conservar` (los que
+    se acaban de regenerar con el mismo nombre).
+    """
+    for tamano in TAMANOS:
+        if tamano in (derivados or {}) and derivados[tamano]['nombre'] not in conservar:
+            storage.delete(derivados[tamano]['nombre'])
+
+
+def archivos_de(instancia) -> list:
+    """
+    Nombres de la imagen original y de sus derivados (para borrarlos juntos).
+    """
+    derivados = instancia.derivados or {}
+    return [instancia.imagen.name] + [derivados[tamano]['nombre'] for tamano in TAMANOS if tamano in derivados]
+
+
+def derivados_al_dia(instancia) -> bool:
+    """
+    True si los derivados guardados corresponden a la imagen actual: mismo
+    nombre y mismo archivo (tamaño y fecha).
+    """
+    if not instancia.imagen:
+        return True
+    derivados = instancia.derivados or {}
+    return derivados.get('origen') == instancia.imagen.name and derivados.get('firma') == firma(instancia.imagen)
+
+
+def actualizar_derivados(instancia):
+    """
+    Regenera los derivados de un Producto o ProductoImagen si su imagen cambió
+    y los guarda con un UPDATE directo (sin volver a disparar post_save).
+    """
+    if derivados_al_dia(instancia):
+        return
+    anteriores = instancia.derivados
+    try:
+        derivados = generar_derivados(instancia.imagen)
+    except (OSError, Image.DecompressionBombError):
+        # Archivo que falta o que no es una imagen: se sigue sirviendo el original
+        derivados = {'origen': instancia.imagen.name, 'firma': firma(instancia.imagen)}
+    if anteriores:
+        nuevos = {tamano['nombre'] for tamano in derivados.values() if isinstance(tamano, dict)}
+        eliminar_derivados(anteriores, instancia.imagen.storage, conservar=nuevos)
+    type(instancia).objects.filter(pk=instancia.pk).update(derivados=derivados)
+    instancia.derivados = derivados
+
+
+def url_derivado(instancia, tamano) -> str:
+    """
+    URL del derivado más cercano a `tamano` (o del original si no hay derivados).
+    """
+    if not instancia.imagen:
+        return ''
+    derivados = instancia.derivados or {}
+    if derivados.get('origen') == instancia.imagen.name:
+        orden = list(TAMANOS)
+        # Si el tamaño pedido no se generó (imagen pequeña) sirve el anterior
+        for nombre in reversed(orden[:orden.index(tamano) + 1]):
+            if nombre in derivados:
+                return instancia.imagen.storage.url(derivados[nombre]['nombre'])
+    return instancia.imagen.url
+
+
+def srcset(instancia) -> str:
+    derivados = instancia.derivados or {}
+    if not instancia.imagen or derivados.get('origen') != instancia.imagen.name:
+        return ''
+    storage = instancia.imagen.storage
+    return ', '.join(
+        f"{storage.url(derivados[tamano]['nombre'])} {derivados[tamano]['ancho']}w"
+        for tamano in TAMANOS if tamano in derivados
+    )
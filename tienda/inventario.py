@@ -0,0 +1,163 @@
+# inventario.py
+
+# descuento de stock atómico por pedido, libro de movimientos (MovimientoStock)
+# y reservas con vencimiento (ReservaStock)
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import MovimientoStock, Producto, ReservaStock
+
+logger = logging.getLogger(__name__)
+
+# Minutos que se aparta el stock de un pedido mientras el cliente paga en PayU
+RESERVA_MINUTOS = getattr(settings, 'RESERVA_STOCK_MINUTOS', 15)
+
+
+class StockInsuficiente(Exception):
+    """
+    No alcanza el stock disponible. `faltantes`: producto_id -> unidades disponibles.
+    """
+
+    def __init__(self, faltantes):
+        super().__init__("Stock insuficiente")
+        self.faltantes = faltantes
+
+
+class _Sobreventa(Exception):
+    pass
+
+
+def lineas_pedido(pedido) -> dict:
+    """
+    producto_id -> unidades del pedido (suma las líneas repetidas del mismo producto).
+    """
+    return dict(
+        pedido.carritos.values('producto_id').annotate(total=Sum('cantidad')).order_by()
+        .values_list('producto_id', 'total')
+    )
+
+
+def _por_producto(lineas):
+    # CASE id WHEN 1 THEN 2 WHEN 5 THEN 1 ... END
+    return Case(*[When(id=pk, then=Value(cantidad)) for pk, cantidad in lineas.items()],
+                output_field=IntegerField())
+
+
+def descontar_stock(lineas, pedido=None) -> dict:
+    """
+    Descuenta del stock las unidades de `lineas` (producto_id -> cantidad) y
+    registra los movimientos. Devuelve producto_id -> unidades faltantes de los
+    productos sobrevendidos (vacío si alcanzó para todo).
+
+    Camino normal: un solo UPDATE ... SET stock = stock - CASE ... WHERE stock >= CASE ...
+    Como la condición y la resta van en la misma sentencia, dos confirmaciones
+    simultáneas nunca pisan el descuento de la otra. Si no todas las filas
+    cumplen la condición, se deshace y se descuenta línea por línea para saber
+    cuáles productos no tenían stock; esos quedan intactos y se anotan como sobreventa.
+    """
+    if not lineas:
+        return {}
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                cantidad = _por_producto(lineas)
+                actualizadas = (
+                    Producto.objects
+                    .filter(id__in=list(lineas), stock__gte=cantidad)
+                    .update(stock=F('stock') - cantidad, actualizado=timezone.now())
+                )
+                if actualizadas != len(lineas):
+                    raise _Sobreventa
+            faltantes = {}
+        except _Sobreventa:
+            faltantes = {
+                pk: unidades for pk, unidades in lineas.items()
+                if not Producto.objects.filter(id=pk, stock__gte=unidades).update(stock=F('stock') - unidades, actualizado=timezone.now())
+            }
+
+        existentes = set(Producto.objects.filter(id__in=list(faltantes)).values_list('id', flat=True)) if faltantes else set()
+        movimientos = []
+        for pk, unidades in lineas.items():
+            if pk not in faltantes:
+                movimientos.append(MovimientoStock(producto_id=pk, pedido=pedido, cantidad=-unidades,
+                                                   motivo=MovimientoStock.VENTA))
+            elif pk in existentes:
+                movimientos.append(MovimientoStock(producto_id=pk, pedido=pedido, cantidad=0, faltante=unidades,
+                                                   motivo=MovimientoStock.SOBREVENTA))
+        MovimientoStock.objects.bulk_create(movimientos)
+
+    if faltantes:
+        logger.warning("Sobreventa en el pedido %s: %s", getattr(pedido, 'id', None), faltantes)
+    return faltantes
+
+
+def descontar_stock_pedido(pedido) -> dict:
+    return descontar_stock(lineas_pedido(pedido), pedido=pedido)
+
+
+def reservas_activas(ahora=None):
+    return ReservaStock.objects.filter(activa=True, expira__gt=ahora or timezone.now())
+
+
+def con_disponible(queryset):
+    """
+    Anota `disponible` = stock - unidades en reservas activas y sin vencer.
+    La suma sale del índice parcial reserva_activa_producto_idx.
+    """
+    reservado = (
+        reservas_activas().filter(producto=OuterRef('pk'))
+        .values('producto').annotate(total=Sum('cantidad')).values('total')
+    )
+    return queryset.annotate(disponible=F('stock') - Coalesce(Subquery(reservado, output_field=IntegerField()), 0))
+
+
+def disponibles(ids) -> dict:
+    """
+    producto_id -> unidades disponibles (nunca negativo).
+    """
+    filas = con_disponible(Producto.objects.filter(id__in=list(ids))).values_list('id', 'disponible')
+    return {pk: max(disponible, 0) for pk, disponible in filas}
+
+
+def reservar_stock(pedido, lineas=None, disponible=None):
+    """
+    Aparta las unidades del pedido por RESERVA_MINUTOS. Si algún producto no
+    tiene suficiente disponible lanza StockInsuficiente y no reserva nada.
+    Las filas de Producto se bloquean (FOR UPDATE en PostgreSQL; en SQLite la
+    transacción ya es BEGIN IMMEDIATE) para que dos pedidos no aparten la misma unidad.
+    Si el llamador ya cargó y bloqueó los productos con con_disponible() puede
+    pasar `disponible` (producto_id -> unidades) y se ahorra esa consulta.
+    """
+    lineas = lineas_pedido(pedido) if lineas is None else lineas
+    if not lineas:
+        return
+    with transaction.atomic():
+        if disponible is None:
+            bloqueados = Producto.objects.select_for_update().filter(id__in=list(lineas))
+            disponible = {pk: max(d, 0) for pk, d in con_disponible(bloqueados).values_list('id', 'disponible')}
+        faltantes = {pk: disponible.get(pk, 0) for pk, unidades in lineas.items() if disponible.get(pk, 0) < unidades}
+        if faltantes:
+            raise StockInsuficiente(faltantes)
+        expira = timezone.now() + timedelta(minutes=RESERVA_MINUTOS)
+        ReservaStock.objects.bulk_create([
+            ReservaStock(producto_id=pk, pedido=pedido, cantidad=unidades, expira=expira)
+            for pk, unidades in lineas.items()
+        ])
+
+
+def liberar_reservas(pedido) -> int:
+    return ReservaStock.objects.filter(pedido=pedido, activa=True).update(activa=False)
+
+
+def liberar_vencidas() -> int:
+    """
+    Marca como inactivas las reservas vencidas. Ya no contaban para `disponible`;
+    esto solo mantiene pequeño el índice parcial.
+    """
+    return ReservaStock.objects.filter(activa=True, expira__lte=timezone.now()).update(activa=False)
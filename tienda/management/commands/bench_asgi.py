@@ -0,0 +1,170 @@
+import http.client
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tienda.models import Categoria, Producto
+
+
+def _percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def _rss_kb(pid) -> int:
+    """
+    Memoria residente del proceso y sus hijos (workers), leída de /proc (Linux).
+    """
+    total = 0
+    pids = [pid]
+    while pids:
+        actual = pids.pop()
+        try:
+            with open(f"/proc/{actual}/status") as f:
+                total += next((int(linea.split()[1]) for linea in f if linea.startswith('VmRSS:')), 0)
+            with open(f"/proc/{actual}/task/{actual}/children") as f:
+                pids.extend(int(hijo) for hijo in f.read().split())
+        except OSError:
+            pass
+    return total
+
+
+class Command(BaseCommand):
+    help = ("Compara peticiones/s, latencia y memoria de la tienda servida con WSGI (gunicorn, "
+            "vistas síncronas) y con ASGI (uvicorn, VISTAS_ASYNC = True) con N clientes concurrentes. "
+            "Necesita uvicorn y gunicorn instalados (sin gunicorn usa runserver).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=32, help="Conexiones concurrentes.")
+        parser.add_argument('--duracion', type=float, default=10.0, help="Segundos de carga por servidor.")
+        parser.add_argument('--workers', type=int, default=1, help="Procesos de cada servidor.")
+        parser.add_argument('--hilos-wsgi', type=int, default=8, help="Hilos por worker de gunicorn.")
+        parser.add_argument('--puerto', type=int, default=8100)
+        parser.add_argument('--rutas', nargs='+', help="Rutas a pedir (por defecto las vistas con versión async).")
+
+    def rutas(self):
+        producto = Producto.objects.order_by('id').values_list('id', flat=True).first()
+        categoria = Categoria.objects.order_by('id').values_list('id', flat=True).first()
+        if producto is None or categoria is None:
+            raise CommandError("La base de datos no tiene productos ni categorías.")
+        return ['/', '/catalogo/', '/catalogo/?q=moto', f"/producto/{producto}/", f"/productos/categoria/{categoria}/"]
+
+    def settings_temporales(self, carpeta, asincronas):
+        # Mismo settings con DEBUG apagado (no acumula consultas en memoria) y las vistas elegidas
+        nombre = f"bench_asgi_{'async' if asincronas else 'sync'}"
+        Path(carpeta, f"{nombre}.py").write_text(
+            f"from {os.environ['DJANGO_SETTINGS_MODULE']} import *\n"
+            f"DEBUG = False\n"
+            f"VISTAS_ASYNC = {asincronas}\n"
+        )
+        return nombre
+
+    def levantar(self, modo, puerto, carpeta, options):
+        if modo == 'asgi':
+            if importlib.util.find_spec('uvicorn') is None:
+                raise CommandError("Instala uvicorn para medir ASGI: pip install uvicorn")
+            modulo = self.settings_temporales(carpeta, True)
+            comando = [sys.executable, '-m', 'uvicorn', 'motolux.asgi:application', '--port', str(puerto),
+                       '--workers', str(options['workers']), '--no-access-log', '--log-level', 'warning']
+        elif importlib.util.find_spec('gunicorn') is not None:
+            modulo = self.settings_temporales(carpeta, False)
+            comando = [sys.executable, '-m', 'gunicorn', 'motolux.wsgi:application', '-b', f"127.0.0.1:{puerto}",
+                       '--workers', str(options['workers']), '--threads', str(options['hilos_wsgi']),
+                       '--log-level', 'warning']
+        else:
+            self.stderr.write("gunicorn no está instalado: WSGI se mide con runserver (no es un servidor de producción)")
+            modulo = self.settings_temporales(carpeta, False)
+            comando = [sys.executable, 'manage.py', 'runserver', f"127.0.0.1:{puerto}", '--noreload']
+
+        entorno = {**os.environ, 'DJANGO_SETTINGS_MODULE': modulo,
+                   'PYTHONPATH': os.pathsep.join([carpeta, str(settings.BASE_DIR), os.environ.get('PYTHONPATH', '')])}
+        proceso = subprocess.Popen(comando, cwd=settings.BASE_DIR, env=entorno,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        limite = time.monotonic() + 30
+        while time.monotonic() < limite:
+            if proceso.poll() is not None:
+                raise CommandError(f"El servidor {modo} terminó al arrancar:\n{proceso.stderr.read().decode()}")
+            try:
+                conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=5)
+                conexion.request('GET', '/')
+                if conexion.getresponse().status == 200:
+                    return proceso
+            except OSError:
+                time.sleep(0.3)
+        proceso.terminate()
+        raise CommandError(f"El servidor {modo} no respondió en 30 s")
+
+    def cargar(self, puerto, rutas, options):
+        fin = time.monotonic() + options['duracion']
+
+        def cliente(numero):
+            # Una conexión keep-alive por cliente, rotando por las rutas
+            tiempos, errores = [], 0
+            conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=30)
+            i = numero
+            while time.monotonic() < fin:
+                ruta = rutas[i % len(rutas)]
+                i += 1
+                inicio = time.perf_counter()
+                try:
+                    conexion.request('GET', ruta)
+                    respuesta = conexion.getresponse()
+                    respuesta.read()
+                    if respuesta.status != 200:
+                        errores += 1
+                except (OSError, http.client.HTTPException):
+                    errores += 1
+                    conexion.close()
+                    conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=30)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            conexion.close()
+            return tiempos, errores
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['clientes']) as pool:
+            resultados = list(pool.map(cliente, range(options['clientes'])))
+        duracion = time.perf_counter() - inicio
+        tiempos = sorted(t for parcial, _ in resultados for t in parcial)
+        return tiempos, sum(e for _, e in resultados), duracion
+
+    def handle(self, *args, **options):
+        rutas = options['rutas'] or self.rutas()
+        self.stdout.write(f"{options['clientes']} clientes, {options['duracion']:.0f} s por servidor, rutas: {' '.join(rutas)}")
+        self.stdout.write(f"{'servidor':<10}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errores':>9}{'RSS máx MB':>12}")
+        with tempfile.TemporaryDirectory() as carpeta:
+            for numero, modo in enumerate(('wsgi', 'asgi')):
+                puerto = options['puerto'] + numero
+                proceso = self.levantar(modo, puerto, carpeta, options)
+                maximo = [0]
+                midiendo = threading.Event()
+
+                def muestrear():
+                    while not midiendo.wait(0.2):
+                        maximo[0] = max(maximo[0], _rss_kb(proceso.pid))
+
+                muestreo = threading.Thread(target=muestrear, daemon=True)
+                muestreo.start()
+                try:
+                    # Calentamiento: llena la caché del catálogo antes de medir
+                    self.cargar(puerto, rutas, {**options, 'duracion': 1.0})
+                    tiempos, errores, duracion = self.cargar(puerto, rutas, options)
+                finally:
+                    midiendo.set()
+                    muestreo.join()
+                    proceso.terminate()
+                    proceso.wait(timeout=10)
+                if not tiempos:
+                    raise CommandError(f"Sin respuestas de {modo}")
+                self.stdout.write(
+                    f"{modo:<10}{len(tiempos) / duracion:>9.0f}{_percentil(tiempos, 0.50):>9.1f}"
+                    f"{_percentil(tiempos, 0.95):>9.1f}{_percentil(tiempos, 0.99):>9.1f}{errores:>9}"
+                    f"{maximo[0] / 1024:>12.1f}"
+                )
@@ -0,0 +1,40 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from tienda.autocompletar import IndiceAutocompletar
+from tienda.management.commands.bench_busqueda import MODELOS, PIEZAS
+
+# Lo que va escribiendo un cliente, tecla por tecla (con errores de tipeo)
+ESCRITURAS = ['gixer 250', 'protectr radiador', 'pastilas ct100', 'nmax mofle', 'xt660']
+
+
+class Command(BaseCommand):
+    help = "Mide el tiempo por tecla del autocompletado sobre un índice en memoria de N productos sintéticos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        random.seed(42)
+        filas = []
+        for i in range(options['productos']):
+            modelo = random.choice(MODELOS)
+            filas.append((i, f"{random.choice(PIEZAS)} {random.choice(PIEZAS).lower()} {modelo}", modelo))
+
+        inicio = time.perf_counter()
+        indice = IndiceAutocompletar(filas)
+        self.stdout.write(f"Índice de {len(filas)} productos construido en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+        tiempos = []
+        for texto in ESCRITURAS:
+            for fin in range(1, len(texto) + 1):
+                inicio = time.perf_counter()
+                indice.sugerir(texto[:fin])
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+        tiempos.sort()
+        p95 = tiempos[int(len(tiempos) * 0.95) - 1]
+        self.stdout.write(f"{len(tiempos)} teclas: p50 {statistics.median(tiempos):.2f} ms, "
+                          f"p95 {p95:.2f} ms, máx {tiempos[-1]:.2f} ms")
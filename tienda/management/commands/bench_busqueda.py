@@ -0,0 +1,88 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+
+from tienda.busqueda import SQLiteFTS5Backend
+from tienda.models import Categoria, Producto
+
+PIEZAS = ['Protector', 'Radiador', 'Portaplaca', 'Tapa', 'Motor', 'Pastillas', 'Freno', 'Mofle',
+          'Defensa', 'Slider', 'Manubrio', 'Espejo', 'Kit', 'Arrastre', 'Cadena', 'Filtro', 'Aceite']
+MODELOS = ['Gixxer 250', 'NMax 155', 'XT660R', 'FZ 3.0', 'CT100', 'Pulsar NS200', 'MT-03', 'Duke 390',
+           'AKT 125', 'Boxer 100', 'XR 150', 'Apache 160']
+CATEGORIAS = ['Protección', 'Frenos', 'Transmisión', 'Iluminación', 'Accesorios', 'Lubricación']
+BUSQUEDAS = ['gixxer', 'protector radiador', 'proteccion', 'pastillas ct100', 'nmax mofle', 'duke', 'xyz']
+
+
+def _busqueda_icontains(query):
+    # Filtro que usaba la vista catalogo antes del índice FTS5
+    return Producto.objects.filter(
+        Q(nombre__icontains=query) |
+        Q(descripcion__icontains=query) |
+        Q(categoria__nombre__icontains=query)
+    )
+
+
+class Command(BaseCommand):
+    help = ("Compara la búsqueda con icontains contra el índice FTS5 sobre N productos sintéticos. "
+            "Trabaja en una base de datos de prueba temporal, no toca la real.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, default=100_000)
+        parser.add_argument('--repeticiones', type=int, default=5)
+
+    def medir(self, funcion, repeticiones):
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            resultado = funcion()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return statistics.median(tiempos), resultado
+
+    def poblar(self, cantidad):
+        random.seed(42)
+        categorias = Categoria.objects.bulk_create([Categoria(nombre=nombre) for nombre in CATEGORIAS])
+        lote = []
+        for i in range(cantidad):
+            modelo = random.choice(MODELOS)
+            pieza = random.choice(PIEZAS)
+            lote.append(Producto(
+                nombre=f"{pieza} {random.choice(PIEZAS).lower()} {modelo}",
+                modelo=modelo,
+                descripcion=f"{pieza} para {modelo}, referencia {i}. Instalación fácil y garantía.",
+                precio=random.randint(10, 900) * 1000,
+                categoria=random.choice(categorias),
+                imagen='productos/logo.png',
+            ))
+            if len(lote) == 5000:
+                Producto.objects.bulk_create(lote)
+                lote = []
+        Producto.objects.bulk_create(lote)
+
+    def handle(self, *args, **options):
+        creation = connection.creation
+        nombre_original = connection.settings_dict['NAME']
+        creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(f"Creando {options['productos']} productos…")
+            self.poblar(options['productos'])
+            backend = SQLiteFTS5Backend()
+            inicio = time.perf_counter()
+            backend.reconstruir()
+            self.stdout.write(f"Índice FTS5 construido en {(time.perf_counter() - inicio):.1f} s\n")
+
+            repeticiones = options['repeticiones']
+            self.stdout.write(f"{'búsqueda':<22} | {'icontains ms':>12} | {'filas':>6} | {'fts5 ms':>8} | {'filas':>6}")
+            for query in BUSQUEDAS:
+                # Ambos caminos devuelven hasta 1000 ids, que es lo que se cachea por búsqueda
+                ms_like, filas_like = self.medir(
+                    lambda: len(_busqueda_icontains(query).order_by('-id').values_list('id', flat=True)[:1000]),
+                    repeticiones)
+                ms_fts, filas_fts = self.medir(
+                    lambda: len(backend.ids_por_relevancia(query, limite=1000)), repeticiones)
+                self.stdout.write(f"{query:<22} | {ms_like:>12.1f} | {filas_like:>6} | {ms_fts:>8.1f} | {filas_fts:>6}")
+        finally:
+            creation.destroy_test_db(nombre_original, verbosity=0)
@@ -0,0 +1,43 @@
+import random
+import timeit
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from tienda.precios import Cupon, DescuentoCategoria, DescuentoPorCantidad, Linea, MotorPrecios
+
+
+class Command(BaseCommand):
+    help = "Mide cuánto tarda el motor de precios en cotizar un carrito de N líneas con reglas activas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lineas', type=int, default=50)
+        parser.add_argument('--reglas', type=int, default=200,
+                            help="Reglas por categoría y por producto que se cargan en la tabla.")
+        parser.add_argument('--repeticiones', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        random.seed(1)
+        reglas = [DescuentoPorCantidad([(3, 5), (10, 12)]), Cupon('MOTOLUX10', porcentaje=10, minimo=100000)]
+        for i in range(options['reglas']):
+            reglas.append(DescuentoCategoria(categoria=i, porcentaje=random.choice([5, 10, 15])))
+            reglas.append(DescuentoPorCantidad([(2, random.randint(5, 20))], producto=i))
+        motor = MotorPrecios(reglas)
+
+        lineas = [
+            (random.randrange(options['reglas'] * 2), random.randrange(options['reglas'] * 2),
+             Decimal(random.randint(10, 900) * 1000), random.randint(1, 12))
+            for _ in range(options['lineas'])
+        ]
+
+        def cotizar():
+            return motor.cotizar([Linea(*linea) for linea in lineas], cupon='motolux10')
+
+        cotizacion = cotizar()
+        repeticiones = options['repeticiones']
+        mejor = min(timeit.repeat(cotizar, number=repeticiones, repeat=5)) / repeticiones
+        self.stdout.write(
+            f"Carrito de {len(lineas)} líneas con {len(reglas)} reglas: "
+            f"{mejor * 1e6:.0f} µs por cotización ({mejor * 1e6 / len(lineas):.1f} µs por línea)"
+        )
+        self.stdout.write(f"Subtotal {cotizacion.subtotal}, descuento {cotizacion.descuento}, total {cotizacion.total}")
@@ -0,0 +1,48 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from tienda.models import Pedido
+from tienda.reportes import ESTADOS_PAGADOS, serie_ventas
+
+
+def _serie_por_dia(start_date, end_date):
+    """
+    Versión anterior del dashboard: una consulta aggregate() por cada día.
+    Se conserva solo como referencia para el benchmark.
+    """
+    pedidos_pagados = Pedido.objects.filter(estado__in=ESTADOS_PAGADOS, fecha__date__range=[start_date, end_date])
+    serie = []
+    for i in range((end_date - start_date).days + 1):
+        day = start_date + timedelta(days=i)
+        serie.append(pedidos_pagados.filter(fecha__date=day).aggregate(total=Sum('total'))['total'] or 0)
+    return serie
+
+
+class Command(BaseCommand):
+    help = "Compara consultas y tiempo de la serie de ventas por día contra la consulta agrupada."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, nargs='+', default=[7, 30, 90, 365],
+                            help="Tamaños de rango (en días) a medir.")
+
+    def medir(self, funcion, *args):
+        with CaptureQueriesContext(connection) as ctx:
+            inicio = time.perf_counter()
+            funcion(*args)
+            ms = (time.perf_counter() - inicio) * 1000
+        return len(ctx.captured_queries), ms
+
+    def handle(self, *args, **options):
+        end_date = timezone.localdate()
+        self.stdout.write(f"{'días':>6} | {'consultas antes':>15} | {'ms antes':>9} | {'consultas ahora':>15} | {'ms ahora':>9}")
+        for dias in options['dias']:
+            start_date = end_date - timedelta(days=dias - 1)
+            consultas_antes, ms_antes = self.medir(_serie_por_dia, start_date, end_date)
+            consultas_ahora, ms_ahora = self.medir(serie_ventas, start_date, end_date, 'dia')
+            self.stdout.write(f"{dias:>6} | {consultas_antes:>15} | {ms_antes:>9.1f} | {consultas_ahora:>15} | {ms_ahora:>9.1f}")
@@ -0,0 +1,224 @@
+import json
+import logging
+import platform
+import statistics
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from tienda import urls
+from tienda.consultas import medir
+from tienda.models import Pedido, Transaccion, Usuario
+from tienda.sembrado import base_temporal, poblar
+
+from .seed_perf import ESCALAS
+
+# Vistas que modifican datos (o son callbacks de PayU): no se miden con GET
+MUTANTES = {
+    'payu_confirmation', 'payu_response', 'crear_pedido',
+    'api_carrito_agregar', 'api_carrito_actualizar', 'api_carrito_quitar',
+    'eliminar_producto', 'editar_producto', 'eliminar_imagenes_producto',
+    'eliminar_categoria', 'editar_categoria', 'eliminar_usuario',
+}
+# Vistas de la tienda que también se miden sin sesión (las ve un visitante)
+PUBLICAS = {'index', 'productos_por_categoria', 'producto_detalle', 'catalogo', 'api_productos', 'api_autocompletar'}
+# Parámetros GET con los que se pide cada vista
+PARAMETROS = {
+    'api_autocompletar': '?q=prod',
+    'api_productos': '?orden=precio',
+}
+# Rutas extra con otros parámetros: clave -> (nombre de URL, query string[, argumentos de la ruta])
+VARIANTES = {
+    'catalogo?q': ('catalogo', '?q=producto'),
+    'index_admin?granularidad': ('index_admin', '?granularidad=semana'),
+    'tabla_datos?search': ('tabla_datos', '?search=user&filter={"estado":"Pendiente"}'),
+    'tabla_datos/transacciones': ('tabla_datos', '', {'nombre': 'transacciones'}),
+    'tabla_datos/usuarios': ('tabla_datos', '?sort=nombre&order=asc', {'nombre': 'usuarios'}),
+}
+
+
+def _percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def rutas(ids) -> dict:
+    """
+    Clave -> (nombre de URL, ruta) de cada vista GET de tienda/urls.py, con
+    argumentos tomados de `ids` (ver ids_de_ejemplo).
+    """
+    argumentos = {
+        'producto_id': ids['producto'],
+        'categoria_id': ids['categoria'],
+        'pedido_id': ids['pedido'],
+        'transaction_id': ids['transaccion'],
+        'nombre': 'pedidos',
+    }
+    resultado = {}
+    for patron in urls.urlpatterns:
+        if not isinstance(patron, URLPattern) or not patron.name or patron.name in MUTANTES:
+            continue
+        kwargs = {nombre: argumentos[nombre] for nombre in patron.pattern.converters}
+        resultado[patron.name] = (patron.name, reverse(patron.name, kwargs=kwargs) + PARAMETROS.get(patron.name, ''))
+    for clave, (nombre, consulta, *otros) in VARIANTES.items():
+        if nombre not in resultado:
+            continue
+        ruta = reverse(nombre, kwargs=otros[0]) if otros else resultado[nombre][1].split('?')[0]
+        resultado[clave] = (nombre, ruta + consulta)
+    return resultado
+
+
+def ids_de_ejemplo(usuario=None) -> dict:
+    """
+    Ids con los que se arman las rutas: el cliente `usuario` (por defecto el de
+    más pedidos), su último pedido con una transacción y un producto de ese pedido.
+    """
+    if usuario is None:
+        usuario = (Pedido.objects.order_by().values('usuario').annotate(n=Count('id'))
+                   .order_by('-n').values_list('usuario', flat=True).first())
+    transaccion = (Transaccion.objects.filter(pedido__usuario_id=usuario).select_related('pedido')
+                   .order_by('-id').first())
+    if transaccion is None:
+        raise CommandError("La base de datos no tiene pedidos pagados; use seed_perf primero.")
+    producto = transaccion.pedido.carritos.select_related('producto').first().producto
+    return {
+        'usuario': usuario,
+        'pedido': transaccion.pedido_id,
+        'transaccion': transaccion.id,
+        'producto': producto.id,
+        'categoria': producto.categoria_id,
+    }
+
+
+def comparar(anterior, actual, tolerancia, minimo_ms) -> list:
+    """
+    [(clave, p50 anterior, p50 actual, consultas anteriores, consultas actuales, regresión)]
+    Es regresión si la mediana creció más de `tolerancia` (y más de `minimo_ms`,
+    para no marcar ruido en vistas de 1 ms) o si la vista hace más consultas.
+    """
+    filas = []
+    for clave, nuevo in actual['resultados'].items():
+        viejo = anterior['resultados'].get(clave)
+        if viejo is None:
+            continue
+        lenta = (nuevo['p50_ms'] > viejo['p50_ms'] * (1 + tolerancia)
+                 and nuevo['p50_ms'] - viejo['p50_ms'] > minimo_ms)
+        filas.append((clave, viejo['p50_ms'], nuevo['p50_ms'], viejo['consultas'], nuevo['consultas'],
+                      lenta or nuevo['consultas'] > viejo['consultas']))
+    return filas
+
+
+class Command(BaseCommand):
+    help = ("Mide todas las vistas GET de tienda/urls.py con el cliente de pruebas de Django: "
+            "latencia (p50/p90/p99), consultas SQL y tamaño de la respuesta, con y sin sesión. "
+            "Por defecto puebla una base temporal con seed_perf (reproducible); guarda el resultado "
+            "en JSON y lo compara con una corrida anterior para ver regresiones.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', choices=ESCALAS, default='pequena',
+                            help="Tamaño de los datos de la base temporal (sin fotos).")
+        parser.add_argument('--base-actual', action='store_true',
+                            help="Mide sobre la base configurada en lugar de una temporal.")
+        parser.add_argument('--semilla', type=int, default=7)
+        parser.add_argument('--repeticiones', type=int, default=30)
+        parser.add_argument('--calentamiento', type=int, default=3, help="Peticiones descartadas antes de medir.")
+        parser.add_argument('--solo', nargs='+', help="Claves de las rutas a medir (por defecto todas).")
+        parser.add_argument('--salida', help="Guarda el resultado en este JSON.")
+        parser.add_argument('--comparar', help="JSON de una corrida anterior.")
+        parser.add_argument('--tolerancia', type=float, default=0.5, help="Aumento de la mediana que cuenta como regresión.")
+        parser.add_argument('--minimo-ms', type=float, default=2.0, help="Diferencia mínima en ms para marcar regresión.")
+        parser.add_argument('--estricto', action='store_true', help="Termina con error si hay regresiones.")
+
+    def medir_ruta(self, cliente, ruta, repeticiones, calentamiento) -> dict:
+        inicio = time.perf_counter()
+        respuesta = cliente.get(ruta)
+        primera = (time.perf_counter() - inicio) * 1000
+        for _ in range(calentamiento):
+            cliente.get(ruta)
+        tiempos = []
+        consultas = 0
+        for _ in range(repeticiones):
+            with medir() as medicion:
+                inicio = time.perf_counter()
+                respuesta = cliente.get(ruta)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            consultas = max(consultas, medicion.total)
+        tiempos.sort()
+        contenido = b'' if respuesta.streaming else respuesta.content
+        return {
+            'ruta': ruta,
+            'estado': respuesta.status_code,
+            'bytes': len(contenido),
+            'consultas': consultas,
+            'primera_ms': round(primera, 3),
+            'p50_ms': round(statistics.median(tiempos), 3),
+            'p90_ms': round(_percentil(tiempos, 0.90), 3),
+            'p99_ms': round(_percentil(tiempos, 0.99), 3),
+            'max_ms': round(tiempos[-1], 3),
+        }
+
+    def correr(self, ids, options) -> dict:
+        setup_test_environment()
+        anonimo = Client(raise_request_exception=False)
+        cliente = Client(raise_request_exception=False)
+        cliente.force_login(Usuario.objects.select_related('user').get(id=ids['usuario']).user)
+
+        # Las vistas que fallan quedan con estado 500 en el resultado, sin la traza en pantalla
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        resultados = {}
+        for clave, (nombre, ruta) in rutas(ids).items():
+            for sesion, http in (('cliente', cliente), ('anonimo', anonimo)):
+                if sesion == 'anonimo' and nombre not in PUBLICAS:
+                    continue
+                clave_sesion = f"{clave} [{sesion}]"
+                if options['solo'] and clave not in options['solo'] and clave_sesion not in options['solo']:
+                    continue
+                resultados[clave_sesion] = self.medir_ruta(http, ruta, options['repeticiones'], options['calentamiento'])
+                r = resultados[clave_sesion]
+                self.stdout.write(f"{clave_sesion:<42}{r['estado']:>5}{r['consultas']:>5}"
+                                  f"{r['p50_ms']:>10.2f}{r['p90_ms']:>10.2f}{r['p99_ms']:>10.2f}")
+        return resultados
+
+    def handle(self, *args, **options):
+        tamanos = dict(ESCALAS[options['escala']], imagenes=0)
+        self.stdout.write(f"{'ruta':<42}{'est':>5}{'sql':>5}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}")
+        if options['base_actual']:
+            resultados = self.correr(ids_de_ejemplo(), options)
+        else:
+            with base_temporal():
+                # El comprador frecuente tiene pedidos de sobra para `perfil`
+                frecuente = poblar(semilla=options['semilla'], **tamanos)['usuario_frecuente']
+                resultados = self.correr(ids_de_ejemplo(frecuente), options)
+
+        actual = {
+            'fecha': timezone.now().isoformat(),
+            'escala': None if options['base_actual'] else options['escala'],
+            'tamanos': None if options['base_actual'] else tamanos,
+            'repeticiones': options['repeticiones'],
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'resultados': resultados,
+        }
+        if options['salida']:
+            with open(options['salida'], 'w') as f:
+                json.dump(actual, f, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Resultado guardado en {options['salida']}")
+
+        if options['comparar']:
+            with open(options['comparar']) as f:
+                anterior = json.load(f)
+            if anterior.get('escala') != actual['escala']:
+                self.stdout.write(self.style.WARNING("Las corridas usan datos distintos: la comparación es orientativa."))
+            filas = comparar(anterior, actual, options['tolerancia'], options['minimo_ms'])
+            self.stdout.write(f"\n{'ruta':<42}{'antes':>10}{'ahora':>10}{'sql':>9}")
+            for clave, antes, ahora, sql_antes, sql_ahora, regresion in filas:
+                linea = f"{clave:<42}{antes:>10.2f}{ahora:>10.2f}{sql_antes:>4} ->{sql_ahora:>3}"
+                self.stdout.write(self.style.ERROR(linea + "  REGRESIÓN") if regresion else linea)
+            regresiones = [fila[0] for fila in filas if fila[-1]]
+            if regresiones and options['estricto']:
+                raise CommandError(f"{len(regresiones)} regresiones: {', '.join(regresiones)}")
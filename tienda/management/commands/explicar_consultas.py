@@ -0,0 +1,110 @@
+import json
+import re
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.utils import timezone
+
+from tienda.models import CarritoProductoPedido, Pedido, Producto, Transaccion
+from tienda.sembrado import base_temporal, poblar
+
+# Migración que agrega los índices: "antes" se mide en la anterior
+MIGRACION_INDICES = '0019_indices_consultas'
+
+
+def consultas(ids) -> dict:
+    """
+    Nombre -> queryset: las consultas que hacen las vistas (mismos filtros y orden;
+    los listados sin paginar se miden con su primera página).
+    """
+    hace_30 = timezone.now() - timedelta(days=30)
+    return {
+        'index_admin: pedidos recientes': Pedido.objects.select_related('usuario__user').order_by('-fecha')[:8],
+        'index_admin: stock bajo': Producto.objects.filter(stock__lte=5).order_by('stock')[:8],
+        'pedidos (50 primeros)': Pedido.objects.select_related('usuario__user').order_by('-fecha')[:50],
+        'transactions (50 primeras)': (Transaccion.objects.select_related('pedido__usuario__user')
+                                       .order_by('-fecha')[:50]),
+        'perfil: pedidos del cliente': Pedido.objects.filter(usuario_id=ids['usuario_frecuente']).order_by('-fecha'),
+        'pedido_detalle: líneas': CarritoProductoPedido.objects.filter(pedido_id=ids['pedido']).select_related('producto'),
+        'pedido_detalle: transacciones': Transaccion.objects.filter(pedido_id=ids['pedido']).order_by('-fecha'),
+        'admin: pendientes del último mes': (Pedido.objects.filter(estado='Pendiente', fecha__gte=hace_30)
+                                             .order_by('-fecha')[:100]),
+        'admin: pedidos de un día': Pedido.objects.filter(fecha__range=[hace_30, hace_30 + timedelta(days=1)]),
+        'catalogo: por precio': Producto.objects.order_by('precio', 'id')[:24],
+        'catalogo: por nombre en categoría': (Producto.objects.filter(categoria_id=ids['categoria'])
+                                              .order_by('nombre', 'id')[:24]),
+    }
+
+
+_ID_PASO = re.compile(r"^\d+ \d+ \d+ ")
+
+
+def _plan(queryset) -> str:
+    # "SCAN tienda_pedido" / "SEARCH tienda_pedido USING INDEX ..." en una línea
+    return ' | '.join(_ID_PASO.sub('', linea.strip(' -|`')) for linea in queryset.explain().splitlines()
+                      if linea.strip(' -|`'))
+
+
+class Command(BaseCommand):
+    help = ("Crea una base temporal con un volumen realista (por defecto 1M de pedidos), "
+            "y para cada consulta de las vistas muestra EXPLAIN QUERY PLAN y la mediana "
+            "de su latencia sin los índices de 0019 y con ellos. No toca la base real.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pedidos', type=int, default=1_000_000)
+        parser.add_argument('--usuarios', type=int, default=10_000)
+        parser.add_argument('--productos', type=int, default=2_000)
+        parser.add_argument('--repeticiones', type=int, default=5, help="Ejecuciones por consulta (se toma la mediana).")
+        parser.add_argument('--json', help="Guarda el informe en este archivo.")
+
+    def medir(self, ids, repeticiones) -> dict:
+        resultado = {}
+        for nombre, queryset in consultas(ids).items():
+            tiempos = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                list(queryset.all())
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            resultado[nombre] = {'plan': _plan(queryset), 'ms': statistics.median(tiempos)}
+        return resultado
+
+    def handle(self, *args, **options):
+        with base_temporal():
+            # Se puebla sin los índices nuevos; la migración los crea sobre los datos.
+            # Solo se deshace 0019: volver a la migración anterior borraría también
+            # las tablas de las posteriores (contadores), que poblar necesita
+            loader = MigrationLoader(connection)
+            migracion = loader.get_migration('tienda', MIGRACION_INDICES)
+            # Estado del proyecto antes de 0019: apply y unapply parten de él
+            estado = loader.project_state(('tienda', MIGRACION_INDICES), at_end=False)
+            with connection.schema_editor(atomic=migracion.atomic) as editor:
+                migracion.unapply(estado, editor)
+            inicio = time.perf_counter()
+            ids = poblar(options['pedidos'], options['usuarios'], options['productos'],
+                         salida=lambda texto: self.stdout.write(f"  {texto}"))
+            self.stdout.write(f"Base poblada en {time.perf_counter() - inicio:.0f} s")
+            antes = self.medir(ids, options['repeticiones'])
+
+            inicio = time.perf_counter()
+            with connection.schema_editor(atomic=migracion.atomic) as editor:
+                migracion.apply(estado, editor)
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+            self.stdout.write(f"{MIGRACION_INDICES} aplicada en {time.perf_counter() - inicio:.0f} s")
+            despues = self.medir(ids, options['repeticiones'])
+
+        self.stdout.write(f"\n{'consulta':<36}{'antes ms':>10}{'ahora ms':>10}{'x':>8}")
+        for nombre in antes:
+            a, d = antes[nombre]['ms'], despues[nombre]['ms']
+            self.stdout.write(f"{nombre:<36}{a:>10.2f}{d:>10.2f}{a / max(d, 1e-6):>8.1f}")
+        self.stdout.write("\nPlanes (antes -> ahora):")
+        for nombre in antes:
+            self.stdout.write(f"{nombre}\n  {antes[nombre]['plan']}\n  {despues[nombre]['plan']}")
+
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump({'pedidos': options['pedidos'], 'antes': antes, 'despues': despues}, f, indent=2, ensure_ascii=False)
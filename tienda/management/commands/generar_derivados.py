@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from tienda.imagenes import actualizar_derivados, TAMANOS
+from tienda.models import Producto, ProductoImagen
+
+
+class Command(BaseCommand):
+    help = "Genera los derivados (miniatura, tarjeta, detalle) de las imágenes que aún no los tienen."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--forzar', action='store_true', help="Regenera también los que ya existen.")
+
+    def handle(self, *args, **options):
+        originales = derivados = 0
+        for modelo in (Producto, ProductoImagen):
+            generados = 0
+            for instancia in modelo.objects.exclude(imagen='').only('id', 'imagen', 'derivados').iterator():
+                if options['forzar']:
+                    instancia.derivados = {**instancia.derivados, 'origen': None}
+                antes = instancia.derivados
+                actualizar_derivados(instancia)
+                if instancia.derivados is not antes:
+                    generados += 1
+                storage = instancia.imagen.storage
+                if storage.exists(instancia.imagen.name):
+                    originales += storage.size(instancia.imagen.name)
+                if 'tarjeta' in instancia.derivados or 'miniatura' in instancia.derivados:
+                    tamano = 'tarjeta' if 'tarjeta' in instancia.derivados else 'miniatura'
+                    derivados += storage.size(instancia.derivados[tamano]['nombre'])
+            self.stdout.write(f"{modelo.__name__}: {generados} imágenes procesadas")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Originales: {originales / 1024:.0f} KB; derivados de tarjeta ({TAMANOS['tarjeta']}px): {derivados / 1024:.0f} KB"
+        ))
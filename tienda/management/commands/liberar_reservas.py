@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from tienda.inventario import liberar_vencidas
+
+
+class Command(BaseCommand):
+    help = "Libera las reservas de stock vencidas (para cron, o en bucle con --cada)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cada', type=int, default=0,
+                            help="Repite cada N segundos en vez de ejecutarse una sola vez.")
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            liberadas = liberar_vencidas()
+            if liberadas or not options['cada']:
+                self.stdout.write(f"{liberadas} reservas vencidas liberadas")
+            if not options['cada']:
+                break
+            time.sleep(options['cada'])
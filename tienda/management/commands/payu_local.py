@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tienda.payu_local import PasarelaLocal
+
+
+class Command(BaseCommand):
+    help = ("Levanta una pasarela PayU falsa para desarrollo y pruebas de carga. "
+            "Con settings.PAYU_LOCAL_URL apuntando a ella, payu_checkout le envía el formulario "
+            "y ella confirma el pago contra payu_confirmation.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--puerto', type=int, default=8001)
+        parser.add_argument('--rechazos', type=float, default=0.0,
+                            help="Fracción de pagos rechazados (0 a 1).")
+        parser.add_argument('--demora', type=float, default=0.0,
+                            help="Segundos antes de enviar la confirmación.")
+
+    def handle(self, *args, **options):
+        pasarela = PasarelaLocal(
+            (options['host'], options['puerto']), settings.PAYU_API_KEY, settings.PAYU_MERCHANT_ID,
+            rechazos=options['rechazos'], demora=options['demora'],
+        )
+        self.stdout.write(f"Pasarela PayU local en http://{options['host']}:{options['puerto']}/ "
+                          f"(estadísticas en /estadisticas). Ctrl+C para salir.")
+        try:
+            pasarela.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            pasarela.server_close()
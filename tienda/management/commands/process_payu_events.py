@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from tienda.pagos import procesar_pendientes
+
+
+class Command(BaseCommand):
+    help = ("Aplica por lotes las confirmaciones de PayU guardadas en modo diferido "
+            "(settings.PAYU_CONFIRMACION_DIFERIDA).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=100, help="Eventos por transacción.")
+        parser.add_argument('--intervalo', type=float, default=1.0,
+                            help="Segundos de espera cuando no hay eventos pendientes.")
+        parser.add_argument('--una-vez', action='store_true', help="Vacía la cola y termina.")
+
+    def handle(self, *args, **options):
+        total_aplicados = total_fallidos = 0
+        try:
+            while True:
+                close_old_connections()
+                inicio = time.perf_counter()
+                aplicados, fallidos = procesar_pendientes(options['lote'])
+                if aplicados or fallidos:
+                    total_aplicados += aplicados
+                    total_fallidos += fallidos
+                    self.stdout.write(f"{aplicados} eventos aplicados, {fallidos} con error "
+                                      f"en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+                    if fallidos:
+                        self.stderr.write("Revisa los errores en el admin y reaplica con `manage.py reprocesar_payu`.")
+                # Un lote incompleto significa que la cola quedó vacía
+                if aplicados + fallidos < options['lote']:
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"{total_aplicados} eventos aplicados, {total_fallidos} con error."))
@@ -0,0 +1,190 @@
+import html
+import json
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from urllib.error import HTTPError
+from urllib.parse import urlencode, urljoin
+from urllib.request import HTTPRedirectHandler, Request, build_opener
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+
+from tienda.inventario import con_disponible
+from tienda.models import Pedido, Producto
+
+ETAPAS = ['producto', 'carrito', 'crear_pedido', 'payu_checkout', 'pasarela', 'payu_response']
+FORMULARIO = re.compile(r'<form id="payuForm" method="post" action="([^"]+)">')
+CAMPO = re.compile(r'<input name="([^"]+)" type="hidden" value="([^"]*)" />')
+
+
+def _percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+class _SinRedireccion(HTTPRedirectHandler):
+    # Las redirecciones se siguen a mano para medir cada etapa por separado
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Comprador:
+    """
+    Un usuario virtual: guarda sus cookies y mide cada petición.
+    """
+
+    def __init__(self, base, sesion, registrar):
+        self.base = base
+        self.cookies = {settings.SESSION_COOKIE_NAME: sesion}
+        self.registrar = registrar
+        self.opener = build_opener(_SinRedireccion)
+
+    def pedir(self, etapa, url, datos=None, json_=None):
+        cabeceras = {'Cookie': '; '.join(f"{k}={v}" for k, v in self.cookies.items())}
+        if json_ is not None:
+            datos = json.dumps(json_).encode()
+            cabeceras['Content-Type'] = 'application/json'
+        elif datos is not None:
+            cabeceras['Content-Type'] = 'application/x-www-form-urlencoded'
+        if 'csrftoken' in self.cookies:
+            cabeceras['X-CSRFToken'] = self.cookies['csrftoken']
+
+        inicio = time.perf_counter()
+        try:
+            with self.opener.open(Request(urljoin(self.base, url), data=datos, headers=cabeceras), timeout=60) as r:
+                codigo, encabezados, cuerpo = r.status, r.headers, r.read()
+        except HTTPError as e:
+            codigo, encabezados, cuerpo = e.code, e.headers, e.read()
+        ms = (time.perf_counter() - inicio) * 1000
+        for valor in encabezados.get_all('Set-Cookie') or []:
+            self.cookies.update({k: m.value for k, m in SimpleCookie(valor).items()})
+        self.registrar(etapa, ms, codigo < 400)
+        return codigo, encabezados, cuerpo
+
+    def comprar(self, productos):
+        """
+        Recorre el checkout completo; devuelve el id del pedido o None si alguna etapa falló.
+        """
+        producto_id = random.choice(productos)
+        codigo, _, _ = self.pedir('producto', f"/producto/{producto_id}/")
+        if codigo != 200:
+            return None
+        codigo, _, _ = self.pedir('carrito', '/api/carrito/agregar/', json_={'producto_id': producto_id, 'cantidad': 1})
+        if codigo != 200:
+            return None
+        codigo, _, cuerpo = self.pedir('crear_pedido', '/crear-pedido/', json_={})
+        if codigo != 200:
+            return None
+        pedido_id = json.loads(cuerpo)['pedido_id']
+        codigo, _, cuerpo = self.pedir('payu_checkout', f"/payu/checkout/{pedido_id}/")
+        texto = cuerpo.decode()
+        accion = FORMULARIO.search(texto)
+        if codigo != 200 or not accion:
+            return None
+        # La pasarela recibe el formulario tal como lo enviaría el navegador
+        campos = urlencode({nombre: html.unescape(valor) for nombre, valor in CAMPO.findall(texto)}).encode()
+        codigo, encabezados, _ = self.pedir('pasarela', accion.group(1), datos=campos)
+        if codigo != 302:
+            return None
+        codigo, _, _ = self.pedir('payu_response', encabezados['Location'])
+        return pedido_id if codigo == 200 else None
+
+
+class Command(BaseCommand):
+    help = ("Prueba de carga de punta a punta del checkout contra un servidor corriendo "
+            "(producto -> carrito -> crear_pedido -> payu_checkout -> pasarela -> payu_response, "
+            "más la confirmación que envía la pasarela). Requiere `manage.py payu_local` y "
+            "settings.PAYU_LOCAL_URL apuntando a ella. Crea usuarios y pedidos y descuenta stock "
+            "en la base de datos configurada: úsalo sobre una copia.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000/', help="Servidor de la tienda.")
+        parser.add_argument('--usuarios', type=int, default=10, help="Compradores concurrentes.")
+        parser.add_argument('--compras', type=int, default=5, help="Compras por comprador.")
+        parser.add_argument('--espera', type=float, default=30.0,
+                            help="Segundos máximos esperando que lleguen las confirmaciones.")
+
+    def sesion(self, usuario):
+        # Sesión iniciada creada directamente en la BD (sin pasar por el formulario de login)
+        sesion = SessionStore()
+        sesion[SESSION_KEY] = str(usuario.pk)
+        sesion[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        sesion[HASH_SESSION_KEY] = usuario.get_session_auth_hash()
+        sesion.create()
+        return sesion.session_key
+
+    def handle(self, *args, **options):
+        pasarela = getattr(settings, 'PAYU_LOCAL_URL', None)
+        if not pasarela:
+            raise CommandError("Define settings.PAYU_LOCAL_URL y levanta `manage.py payu_local`.")
+        base = options['url']
+        productos = list(con_disponible(Producto.objects.all()).filter(disponible__gt=0).values_list('id', flat=True))
+        if not productos:
+            raise CommandError("No hay productos con stock disponible.")
+
+        compradores = []
+        for i in range(options['usuarios']):
+            usuario, creado = User.objects.get_or_create(username=f"carga-checkout-{i}")
+            if creado:
+                usuario.set_unusable_password()
+                usuario.save()
+            compradores.append(self.sesion(usuario))
+
+        tiempos = defaultdict(list)
+        errores = defaultdict(int)
+        lock = threading.Lock()
+
+        def registrar(etapa, ms, ok):
+            with lock:
+                tiempos[etapa].append(ms)
+                if not ok:
+                    errores[etapa] += 1
+
+        def recorrer(sesion):
+            comprador = Comprador(base, sesion, registrar)
+            resultado = []
+            for _ in range(options['compras']):
+                inicio = time.perf_counter()
+                pedido_id = comprador.comprar(productos)
+                if pedido_id:
+                    resultado.append((pedido_id, (time.perf_counter() - inicio) * 1000))
+            return resultado
+
+        build_opener().open(urljoin(pasarela, 'reiniciar'), timeout=10).read()
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(compradores)) as pool:
+            compras = [compra for resultado in pool.map(recorrer, compradores) for compra in resultado]
+        duracion = time.perf_counter() - inicio
+        pedidos = [pedido_id for pedido_id, _ in compras]
+
+        # Las confirmaciones llegan en segundo plano: se espera a que ningún pedido siga Pendiente
+        limite = time.monotonic() + options['espera']
+        while Pedido.objects.filter(id__in=pedidos, estado='Pendiente').exists() and time.monotonic() < limite:
+            time.sleep(0.2)
+        pendientes = Pedido.objects.filter(id__in=pedidos, estado='Pendiente').count()
+        estadisticas = json.loads(build_opener().open(urljoin(pasarela, 'estadisticas'), timeout=10).read())
+
+        intentadas = options['usuarios'] * options['compras']
+        self.stdout.write(f"{len(compras)} de {intentadas} checkouts completos en {duracion:.1f} s "
+                          f"con {options['usuarios']} compradores: {len(compras) / duracion:.1f} checkouts/s")
+        filas = [(etapa, tiempos[etapa], errores[etapa]) for etapa in ETAPAS]
+        filas.append(('checkout completo', [ms for _, ms in compras], intentadas - len(compras)))
+        filas.append(('confirmación', estadisticas['confirmaciones_ms'], estadisticas['fallidas']))
+        self.stdout.write(f"{'etapa':<18}{'n':>6}{'err':>5}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for etapa, valores, fallos in filas:
+            valores = sorted(valores)
+            if not valores:
+                self.stdout.write(f"{etapa:<18}{0:>6}{fallos:>5}")
+                continue
+            self.stdout.write(f"{etapa:<18}{len(valores):>6}{fallos:>5}{_percentil(valores, 0.50):>9.1f}"
+                              f"{_percentil(valores, 0.95):>9.1f}{_percentil(valores, 0.99):>9.1f}")
+        if pendientes:
+            self.stderr.write(f"{pendientes} pedidos siguen Pendiente tras {options['espera']:.0f} s "
+                              f"(¿PAYU_CONFIRMACION_DIFERIDA sin process_payu_events?)")
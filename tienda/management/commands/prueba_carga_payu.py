@@ -0,0 +1,131 @@
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from tienda.models import CarritoProductoPedido, Categoria, EventoPayU, Pedido, Producto
+from tienda.pagos import procesar_pendientes
+from tienda.utils import build_confirmation_payload
+
+MODOS = ('directo', 'diferido')
+
+
+def _percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def _enviar(datos):
+    # Devuelve (código HTTP, milisegundos)
+    try:
+        cliente = Client(HTTP_HOST='localhost')
+        inicio = time.perf_counter()
+        codigo = cliente.post(reverse('payu_confirmation'), datos).status_code
+        return codigo, (time.perf_counter() - inicio) * 1000
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = ("Prueba de carga del webhook de PayU: envía confirmaciones firmadas sintéticas "
+            "en paralelo y mide latencia (p50/p95/p99) y rendimiento en modo directo y diferido. "
+            "En modo diferido mide además cuánto tarda process_payu_events en aplicarlas. "
+            "Trabaja en una base de datos temporal, no toca la real.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pedidos', type=int, default=300)
+        parser.add_argument('--hilos', type=int, default=8)
+        parser.add_argument('--repetidos', type=int, default=1,
+                            help="Veces que se reenvía cada confirmación (PayU reintenta).")
+        parser.add_argument('--lote', type=int, default=100, help="Eventos por lote del worker (modo diferido).")
+        parser.add_argument('--modo', choices=MODOS + ('ambos',), default='ambos')
+
+    def poblar(self, cantidad):
+        random.seed(11)
+        categoria = Categoria.objects.create(nombre='Carga')
+        productos = Producto.objects.bulk_create([
+            Producto(nombre=f"Producto {i}", descripcion='-', precio=1000, categoria=categoria,
+                     imagen='productos/logo.png', stock=10_000)
+            for i in range(10)
+        ])
+        usuario = User.objects.create_user('carga').perfil
+        pedidos = Pedido.objects.bulk_create([Pedido(usuario=usuario, total=1000) for _ in range(cantidad)])
+        CarritoProductoPedido.objects.bulk_create([
+            CarritoProductoPedido(pedido=pedido, producto=producto, cantidad=random.randint(1, 3), total=1000)
+            for pedido in pedidos
+            for producto in random.sample(productos, random.randint(1, 4))
+        ])
+        return pedidos
+
+    def medir(self, modo, options):
+        pedidos = self.poblar(options['pedidos'])
+        envios = [
+            build_confirmation_payload(settings.PAYU_API_KEY, settings.PAYU_MERCHANT_ID, f"MOTO-{pedido.id}",
+                                       '1000.00', 'COP', '4', f"tx-{pedido.id}")
+            for pedido in pedidos
+            for _ in range(options['repetidos'])
+        ]
+        random.shuffle(envios)
+        connection.close()
+
+        with override_settings(PAYU_CONFIRMACION_DIFERIDA=(modo == 'diferido')):
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['hilos']) as pool:
+                resultados = list(pool.map(_enviar, envios))
+            duracion = time.perf_counter() - inicio
+
+        codigos = Counter(codigo for codigo, _ in resultados)
+        tiempos = sorted(ms for _, ms in resultados)
+        self.stdout.write(
+            f"[{modo}] {len(envios)} confirmaciones con {options['hilos']} hilos: {len(envios) / duracion:.0f} req/s, "
+            f"p50 {_percentil(tiempos, 0.50):.1f} ms, p95 {_percentil(tiempos, 0.95):.1f} ms, "
+            f"p99 {_percentil(tiempos, 0.99):.1f} ms, máx {tiempos[-1]:.1f} ms {dict(codigos)}"
+        )
+
+        if modo == 'diferido':
+            inicio = time.perf_counter()
+            aplicados = fallidos = 0
+            while True:
+                a, f = procesar_pendientes(options['lote'])
+                aplicados, fallidos = aplicados + a, fallidos + f
+                if a + f < options['lote']:
+                    break
+            duracion = time.perf_counter() - inicio
+            self.stdout.write(f"[{modo}] worker: {aplicados} eventos aplicados en {duracion:.2f} s "
+                              f"({aplicados / max(duracion, 1e-9):.0f} eventos/s), {fallidos} con error")
+
+        errores = []
+        sin_procesar = Pedido.objects.exclude(estado='Procesando').count()
+        if sin_procesar:
+            errores.append(f"[{modo}] {sin_procesar} pedidos no quedaron en Procesando")
+        if EventoPayU.objects.count() != len(pedidos):
+            errores.append(f"[{modo}] {EventoPayU.objects.count()} eventos registrados para {len(pedidos)} confirmaciones distintas")
+        if codigos.keys() != {200}:
+            errores.append(f"[{modo}] respuestas distintas de 200: {dict(codigos)}")
+        return errores
+
+    def handle(self, *args, **options):
+        modos = MODOS if options['modo'] == 'ambos' else (options['modo'],)
+        errores = []
+        for modo in modos:
+            # Base de prueba en archivo: SQLite en memoria no admite escrituras desde varios hilos
+            carpeta = tempfile.mkdtemp()
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(carpeta, 'carga.sqlite3')
+            nombre_original = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                errores += self.medir(modo, options)
+            finally:
+                connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+        if errores:
+            raise CommandError("\n".join(errores))
+        self.stdout.write(self.style.SUCCESS("Todas las confirmaciones se aplicaron una sola vez."))
@@ -0,0 +1,111 @@
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Sum
+from django.test import Client
+from django.urls import reverse
+
+from tienda.models import CarritoProductoPedido, Categoria, MovimientoStock, Pedido, Producto
+from tienda.utils import build_confirmation_payload
+
+
+def _confirmar(pedido_id, transaccion):
+    # Arma el POST que envía PayU al aprobar el pago
+    datos = build_confirmation_payload(
+        settings.PAYU_API_KEY, settings.PAYU_MERCHANT_ID, f"MOTO-{pedido_id}", '1000.00', 'COP', '4', transaccion,
+    )
+    try:
+        return Client(HTTP_HOST='localhost').post(reverse('payu_confirmation'), datos).status_code
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = ("Envía confirmaciones de PayU en paralelo (cada una repetida) contra la vista "
+            "payu_confirmation y verifica que el stock final y el libro de movimientos cuadren. "
+            "Trabaja en una base de datos temporal, no toca la real.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, default=5)
+        parser.add_argument('--stock', type=int, default=40)
+        parser.add_argument('--pedidos', type=int, default=150)
+        parser.add_argument('--hilos', type=int, default=16)
+
+    def poblar(self, opciones):
+        random.seed(7)
+        categoria = Categoria.objects.create(nombre='Prueba')
+        productos = Producto.objects.bulk_create([
+            Producto(nombre=f"Producto {i}", descripcion='-', precio=1000, categoria=categoria,
+                     imagen='productos/logo.png', stock=opciones['stock'])
+            for i in range(opciones['productos'])
+        ])
+        usuario = User.objects.create_user('concurrencia').perfil
+        pedidos = Pedido.objects.bulk_create([Pedido(usuario=usuario, total=1000) for _ in range(opciones['pedidos'])])
+        CarritoProductoPedido.objects.bulk_create([
+            CarritoProductoPedido(pedido=pedido, producto=producto, cantidad=random.randint(1, 3), total=1000)
+            for pedido in pedidos
+            for producto in random.sample(productos, random.randint(1, min(3, len(productos))))
+        ])
+        return productos, pedidos
+
+    def verificar(self, productos, stock_inicial):
+        errores = []
+        demanda = Counter(dict(
+            CarritoProductoPedido.objects.values('producto_id').annotate(total=Sum('cantidad')).values_list('producto_id', 'total')
+        ))
+        for producto in Producto.objects.filter(id__in=[p.id for p in productos]):
+            movimientos = producto.movimientos_stock.aggregate(salida=Sum('cantidad'), faltante=Sum('faltante'))
+            salida = -(movimientos['salida'] or 0)
+            faltante = movimientos['faltante'] or 0
+            if producto.stock != stock_inicial - salida:
+                errores.append(f"{producto.nombre}: stock {producto.stock}, esperado {stock_inicial - salida}")
+            if salida + faltante != demanda[producto.id]:
+                errores.append(f"{producto.nombre}: {salida} vendidas + {faltante} faltantes != demanda {demanda[producto.id]}")
+            self.stdout.write(f"  {producto.nombre}: demanda {demanda[producto.id]:>3}, vendidas {salida:>3}, "
+                              f"sobreventa {faltante:>3}, stock final {producto.stock}")
+
+        pendientes = Pedido.objects.exclude(estado='Procesando').count()
+        if pendientes:
+            errores.append(f"{pendientes} pedidos no quedaron en Procesando")
+        repetidos = (
+            MovimientoStock.objects.values('pedido_id', 'producto_id').annotate(n=Count('id')).filter(n__gt=1).count()
+        )
+        if repetidos:
+            errores.append(f"{repetidos} líneas descontadas más de una vez")
+        return errores
+
+    def handle(self, *args, **options):
+        # SQLite en memoria no admite escrituras concurrentes desde varios hilos:
+        # la base de prueba va en un archivo temporal
+        carpeta = tempfile.mkdtemp()
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(carpeta, 'concurrencia.sqlite3')
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            productos, pedidos = self.poblar(options)
+            # Cada pedido se confirma dos veces (PayU reintenta), todo mezclado
+            envios = [(pedido.id, f"tx-{pedido.id}-{intento}") for pedido in pedidos for intento in range(2)]
+            random.shuffle(envios)
+            connection.close()
+
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['hilos']) as pool:
+                codigos = Counter(pool.map(lambda envio: _confirmar(*envio), envios))
+            duracion = time.perf_counter() - inicio
+            self.stdout.write(f"{len(envios)} confirmaciones con {options['hilos']} hilos en {duracion:.1f} s: {dict(codigos)}")
+
+            errores = self.verificar(productos, options['stock'])
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+        if errores:
+            raise CommandError("Inconsistencias:\n" + "\n".join(errores))
+        self.stdout.write(self.style.SUCCESS("Stock y movimientos consistentes."))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from tienda.contadores import CONTADOS, reconciliar
+
+
+class Command(BaseCommand):
+    help = ("Recuenta los contadores del panel (tienda/contadores.py) y corrige las diferencias "
+            "que dejan las escrituras sin señales. Para cron, o en bucle con --cada.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('nombres', nargs='*',
+                            help=f"Contadores a recontar: {', '.join(CONTADOS)} (por defecto, todos).")
+        parser.add_argument('--cada', type=int, default=0,
+                            help="Repite cada N segundos en vez de ejecutarse una sola vez.")
+
+    def handle(self, *args, **options):
+        desconocidos = set(options['nombres']) - set(CONTADOS)
+        if desconocidos:
+            raise CommandError(f"Contadores desconocidos: {', '.join(sorted(desconocidos))}")
+        while True:
+            close_old_connections()
+            for nombre, (anterior, total) in reconciliar(options['nombres']).items():
+                if anterior is None:
+                    self.stdout.write(f"{nombre}: {total} (nuevo)")
+                elif anterior != total:
+                    self.stdout.write(self.style.WARNING(f"{nombre}: {anterior} -> {total} ({total - anterior:+d})"))
+                elif not options['cada']:
+                    self.stdout.write(f"{nombre}: {total}")
+            if not options['cada']:
+                break
+            time.sleep(options['cada'])
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from tienda.busqueda import get_backend
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice de búsqueda de productos (p. ej. después de cargas con bulk_create)."
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        backend.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f"Índice de búsqueda reconstruido ({backend.__class__.__name__})."))
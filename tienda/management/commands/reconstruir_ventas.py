@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from tienda.ventas import reconstruir_resumenes
+
+
+class Command(BaseCommand):
+    help = "Reconstruye desde cero los resúmenes VentaDiaria y VentaProductoDiaria."
+
+    def handle(self, *args, **options):
+        dias, productos = reconstruir_resumenes()
+        self.stdout.write(self.style.SUCCESS(
+            f"Resúmenes reconstruidos: {dias} días, {productos} filas de producto."
+        ))
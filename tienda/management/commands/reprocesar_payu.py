@@ -0,0 +1,56 @@
+import traceback
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime, parse_date
+
+from tienda.models import EventoPayU
+from tienda.pagos import aplicar_evento
+
+
+class Command(BaseCommand):
+    help = ("Vuelve a aplicar los eventos de PayU registrados, en el orden en que llegaron. "
+            "Por defecto solo los que no se alcanzaron a procesar (p. ej. tras una caída).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ids', type=int, nargs='+', help="Solo estos eventos.")
+        parser.add_argument('--referencia', help="Solo los eventos de esta referencia, p. ej. MOTO-19.")
+        parser.add_argument('--desde', help="Solo los recibidos desde esta fecha (AAAA-MM-DD o fecha y hora).")
+        parser.add_argument('--forzar', action='store_true',
+                            help="Incluye los ya procesados (aplicar dos veces no descuenta stock dos veces).")
+        parser.add_argument('--simular', action='store_true', help="Solo muestra qué eventos se aplicarían.")
+
+    def handle(self, *args, **options):
+        eventos = EventoPayU.objects.order_by('recibido', 'id')
+        if not options['forzar']:
+            eventos = eventos.filter(procesado__isnull=True)
+        if options['ids']:
+            eventos = eventos.filter(id__in=options['ids'])
+        if options['referencia']:
+            eventos = eventos.filter(referencia=options['referencia'])
+        if options['desde']:
+            dia = parse_date(options['desde'])
+            if dia:
+                eventos = eventos.filter(recibido__date__gte=dia)
+            else:
+                desde = parse_datetime(options['desde'])
+                if timezone.is_naive(desde):
+                    desde = timezone.make_aware(desde)
+                eventos = eventos.filter(recibido__gte=desde)
+
+        aplicados = omitidos = fallidos = 0
+        for evento in eventos.iterator():
+            if options['simular']:
+                self.stdout.write(f"  {evento.id}: {evento} ({evento.referencia})")
+                continue
+            try:
+                if aplicar_evento(evento, forzar=options['forzar']):
+                    aplicados += 1
+                else:
+                    omitidos += 1
+            except Exception as e:
+                fallidos += 1
+                EventoPayU.objects.filter(pk=evento.pk).update(error=traceback.format_exc())
+                self.stderr.write(f"  {evento.id}: {e!r}")
+        if not options['simular']:
+            self.stdout.write(f"{aplicados} aplicados, {omitidos} ya procesados por otro proceso, {fallidos} con error")
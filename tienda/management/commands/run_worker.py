@@ -0,0 +1,57 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from tienda import tareas
+
+
+def _ejecutar(tarea):
+    # Cada hilo usa su propia conexión; se cierra al terminar
+    try:
+        return tareas.ejecutar(tarea)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = "Ejecuta las tareas en segundo plano (imágenes, borrado de archivos...) con un pool de hilos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=4)
+        parser.add_argument('--intervalo', type=float, default=2.0,
+                            help="Segundos de espera cuando la cola está vacía.")
+        parser.add_argument('--una-vez', action='store_true',
+                            help="Vacía la cola y termina (útil en cron o en despliegues).")
+        parser.add_argument('--limpiar-huerfanos', action='store_true',
+                            help="Encola la limpieza de archivos de productos que ya nadie usa.")
+
+    def handle(self, *args, **options):
+        hilos = options['hilos']
+        if options['limpiar_huerfanos']:
+            tareas.encolar('limpiar_huerfanos')
+
+        completadas = fallidas = 0
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            try:
+                while True:
+                    close_old_connections()
+                    liberadas = tareas.liberar_abandonadas()
+                    if liberadas:
+                        self.stdout.write(f"{liberadas} tareas abandonadas volvieron a la cola")
+                    lote = tareas.reclamar(hilos * 2)
+                    if not lote:
+                        if options['una_vez']:
+                            break
+                        time.sleep(options['intervalo'])
+                        continue
+                    for tarea, ok in zip(lote, pool.map(_ejecutar, lote)):
+                        if ok:
+                            completadas += 1
+                        else:
+                            fallidas += 1
+                            self.stderr.write(f"Tarea {tarea.id} ({tarea.tipo}) falló: intento {tarea.intentos} de {tarea.max_intentos}")
+            except KeyboardInterrupt:
+                pass
+        self.stdout.write(self.style.SUCCESS(f"Worker detenido: {completadas} completadas, {fallidas} con error."))
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tienda.sembrado import poblar
+
+# Tamaños predefinidos (--escala); cada opción suelta los reemplaza
+ESCALAS = {
+    'pequena': {'categorias': 8, 'productos': 200, 'usuarios': 100, 'pedidos': 2_000, 'imagenes': 6},
+    'mediana': {'categorias': 20, 'productos': 2_000, 'usuarios': 2_000, 'pedidos': 50_000, 'imagenes': 12},
+    'grande': {'categorias': 40, 'productos': 20_000, 'usuarios': 20_000, 'pedidos': 1_000_000, 'imagenes': 24},
+}
+
+
+class Command(BaseCommand):
+    help = ("Puebla la base de datos actual con datos sintéticos para pruebas de rendimiento: "
+            "categorías, productos con imágenes y derivados, clientes (creados por la señal de perfil), "
+            "pedidos, líneas y transacciones, con inserciones en lote. Es reproducible con --semilla.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', choices=ESCALAS, default='pequena')
+        parser.add_argument('--categorias', type=int)
+        parser.add_argument('--productos', type=int)
+        parser.add_argument('--usuarios', type=int)
+        parser.add_argument('--pedidos', type=int)
+        parser.add_argument('--imagenes', type=int, help="Fotos distintas a generar (0: todas usan el logo).")
+        parser.add_argument('--dias', type=int, default=730, help="Los pedidos se reparten en estos últimos días.")
+        parser.add_argument('--semilla', type=int, default=7)
+        parser.add_argument('--prefijo', default='perf-',
+                            help="Prefijo de nombres de usuario y productos (para poblar varias veces la misma base).")
+
+    def handle(self, *args, **options):
+        tamanos = {campo: options[campo] if options[campo] is not None else valor
+                   for campo, valor in ESCALAS[options['escala']].items()}
+        if min(tamanos['categorias'], tamanos['productos'], tamanos['usuarios']) < 1:
+            raise CommandError("Se necesita al menos una categoría, un producto y un usuario.")
+
+        inicio = time.perf_counter()
+        ids = poblar(dias=options['dias'], semilla=options['semilla'], prefijo=options['prefijo'],
+                     salida=lambda texto: self.stdout.write(f"  {texto}"), **tamanos)
+        self.stdout.write(self.style.SUCCESS(
+            f"Datos creados en {time.perf_counter() - inicio:.1f} s "
+            f"(cliente frecuente {ids['usuario_frecuente']}, pedido de ejemplo {ids['pedido']})."
+        ))
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+ESTADOS_PAGADOS = ['Procesando', 'Entregado']
+CAMPOS_ESTADO = {
+    'Pendiente': 'pendientes',
+    'Procesando': 'procesando',
+    'Entregado': 'entregados',
+    'Cancelado': 'cancelados',
+}
+
+
+def poblar_resumenes(apps, schema_editor):
+    # Carga inicial de los resúmenes con los pedidos existentes
+    Pedido = apps.get_model('tienda', 'Pedido')
+    CarritoProductoPedido = apps.get_model('tienda', 'CarritoProductoPedido')
+    VentaDiaria = apps.get_model('tienda', 'VentaDiaria')
+    VentaProductoDiaria = apps.get_model('tienda', 'VentaProductoDiaria')
+
+    dias = {}
+    for pedido in Pedido.objects.only('fecha', 'estado', 'total').iterator():
+        dia = timezone.localtime(pedido.fecha).date()
+        venta = dias.setdefault(dia, VentaDiaria(fecha=dia, ingresos=0))
+        campo = CAMPOS_ESTADO.get(pedido.estado)
+        if campo:
+            setattr(venta, campo, getattr(venta, campo) + 1)
+        if pedido.estado in ESTADOS_PAGADOS:
+            venta.ingresos += pedido.total or 0
+    VentaDiaria.objects.bulk_create(dias.values(), batch_size=500)
+
+    productos = {}
+    lineas = CarritoProductoPedido.objects.filter(pedido__estado__in=ESTADOS_PAGADOS).select_related('pedido')
+    for linea in lineas.iterator():
+        dia = timezone.localtime(linea.pedido.fecha).date()
+        venta = productos.setdefault((dia, linea.producto_id),
+                                     VentaProductoDiaria(fecha=dia, producto_id=linea.producto_id, unidades=0, ingresos=0))
+        venta.unidades += linea.cantidad
+        venta.ingresos += linea.total or 0
+    VentaProductoDiaria.objects.bulk_create(productos.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0007_producto_modelo_productoimagen'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+                ('ingresos', models.DecimalField(decimal_places=0, default=0, max_digits=14)),
+                ('pendientes', models.IntegerField(default=0)),
+                ('procesando', models.IntegerField(default=0)),
+                ('entregados', models.IntegerField(default=0)),
+                ('cancelados', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VentaProductoDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('unidades', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=0, default=0, max_digits=14)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventas_diarias', to='tienda.producto')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'producto'), name='venta_producto_diaria_unica')],
+            },
+        ),
+        migrations.RunPython(poblar_resumenes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+
+def crear_indice(apps, schema_editor):
+    # El índice FTS5 solo existe en SQLite; otras bases usan su propio backend (tienda/busqueda.py)
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS tienda_producto_fts "
+            "USING fts5(nombre, modelo, descripcion, categoria, "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        cursor.execute(
+            "INSERT INTO tienda_producto_fts(rowid, nombre, modelo, descripcion, categoria) "
+            "SELECT p.id, p.nombre, COALESCE(p.modelo, ''), p.descripcion, c.nombre "
+            "FROM tienda_producto p JOIN tienda_categoria c ON c.id = p.categoria_id"
+        )
+
+
+def borrar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS tienda_producto_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0009_indices_paginacion_producto'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
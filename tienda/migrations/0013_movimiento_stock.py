@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0012_tarea'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.IntegerField()),
+                ('faltante', models.PositiveIntegerField(default=0)),
+                ('motivo', models.CharField(choices=[('venta', 'Venta'), ('sobreventa', 'Sobreventa'), ('ajuste', 'Ajuste')], max_length=20)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('pedido', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_stock', to='tienda.pedido')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos_stock', to='tienda.producto')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['producto', 'fecha'], name='movimiento_producto_fecha_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:12
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0013_movimiento_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1)])),
+                ('expira', models.DateTimeField()),
+                ('activa', models.BooleanField(default=True)),
+                ('creada', models.DateTimeField(auto_now_add=True)),
+                ('pedido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='tienda.pedido')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='tienda.producto')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('activa', True)), fields=['producto', 'expira', 'cantidad'], name='reserva_activa_producto_idx')],
+            },
+        ),
+    ]
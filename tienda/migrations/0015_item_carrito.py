@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:16
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0014_reserva_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemCarrito',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1)])),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='en_carritos', to='tienda.producto')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='carrito', to='tienda.usuario')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'producto'), name='item_carrito_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0015_item_carrito'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoPayU',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_id', models.CharField(max_length=255)),
+                ('state_pol', models.CharField(max_length=50)),
+                ('referencia', models.CharField(db_index=True, help_text='reference_sale, p. ej. MOTO-19', max_length=100)),
+                ('datos', models.JSONField(help_text='POST completo recibido de PayU')),
+                ('recibido', models.DateTimeField(auto_now_add=True)),
+                ('procesado', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'evento PayU',
+                'verbose_name_plural': 'eventos PayU',
+                'constraints': [models.UniqueConstraint(fields=('transaction_id', 'state_pol'), name='evento_payu_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0016_evento_payu'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='eventopayu',
+            index=models.Index(condition=models.Q(('procesado__isnull', True)), fields=['recibido'], name='evento_payu_pendiente_idx'),
+        ),
+    ]
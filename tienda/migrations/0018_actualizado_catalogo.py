@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def crear_estado(apps, schema_editor):
+    apps.get_model('tienda', 'EstadoCatalogo').objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0017_evento_payu_pendiente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Actualizado'),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='EstadoCatalogo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('actualizado', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(crear_estado, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0018_actualizado_catalogo'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pedido',
+            name='usuario',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='pedidos', to='tienda.usuario'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['fecha'], name='pedido_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['estado', 'fecha'], name='pedido_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['usuario', 'fecha'], name='pedido_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['stock'], name='producto_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaccion',
+            index=models.Index(fields=['fecha'], name='transaccion_fecha_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='carritoproductopedido',
+            constraint=models.CheckConstraint(condition=models.Q(('cantidad__gte', 1)), name='carrito_cantidad_positiva'),
+        ),
+        migrations.AddConstraint(
+            model_name='pedido',
+            constraint=models.CheckConstraint(condition=models.Q(('total__gte', 0)), name='pedido_total_no_negativo'),
+        ),
+        migrations.AddConstraint(
+            model_name='pedido',
+            constraint=models.CheckConstraint(condition=models.Q(('estado__in', ['Pendiente', 'Procesando', 'Entregado', 'Cancelado'])), name='pedido_estado_valido'),
+        ),
+        migrations.AddConstraint(
+            model_name='producto',
+            constraint=models.CheckConstraint(condition=models.Q(('precio__gte', 0)), name='producto_precio_no_negativo'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 from django import forms
 from django.core.validators import MinValueValidator
@@ -32,19 +33,46 @@ class Producto(models.Model):
     categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE, related_name='productos',verbose_name="Categoría")
     imagen = models.ImageField(upload_to='productos/', verbose_name="Imagen")
     stock = models.PositiveIntegerField(default=0,verbose_name="Stock")
+    # Versiones redimensionadas de la imagen (ver tienda/imagenes.py)
+    derivados = models.JSONField(default=dict, blank=True, editable=False)
+    # Último cambio del producto o de su stock (ETag/Last-Modified, ver tienda/condicional.py)
+    actualizado = models.DateTimeField(auto_now=True, verbose_name="Actualizado")
+
+    class Meta:
+        # Índices para la paginación por cursor de la tienda (ver tienda/paginacion.py):
+        # cada orden (precio, nombre) se desempata por id, en todo el catálogo y por categoría.
+        indexes = [
+            models.Index(fields=['precio', 'id'], name='producto_precio_id_idx'),
+            models.Index(fields=['nombre', 'id'], name='producto_nombre_id_idx'),
+            models.Index(fields=['categoria', 'precio', 'id'], name='producto_cat_precio_id_idx'),
+            models.Index(fields=['categoria', 'nombre', 'id'], name='producto_cat_nombre_id_idx'),
+            # Widget de stock bajo del dashboard (stock <= 5 ORDER BY stock)
+            models.Index(fields=['stock'], name='producto_stock_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(precio__gte=0), name='producto_precio_no_negativo'),
+        ]
 
     def __str__(self):
         fila = f"ID: {self.id}, Nombre: {self.nombre}, Precio: {self.precio}, Stock: {self.stock}"
         return fila
-    
-    def delete (self, using=None, keep_parents=False):
-        self.imagen.storage.delete(self.imagen.name)  # Elimina la imagen del sistema de archivos
-        super().delete()
+
+
+class EstadoCatalogo(models.Model):
+    """
+    Fila única (pk=1) con la fecha del último cambio en productos, categorías o
+    imágenes. Las páginas de la tienda la usan para responder 304 (tienda/condicional.py).
+    """
+    actualizado = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Catálogo actualizado el {self.actualizado}"
 
 
 class ProductoImagen(models.Model):
     producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='imagenes_adicionales')
     imagen = models.ImageField(upload_to='productos/adicionales/', verbose_name="Imagen Adicional")
+    derivados = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return f"Imagen para {self.producto.nombre}"
@@ -77,12 +105,29 @@ class Pedido(models.Model):
         ('Cancelado', 'Cancelado'),
     ]
 
-    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='pedidos')
+    # Sin índice propio: lo cubre pedido_usuario_fecha_idx (usuario va primero)
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='pedidos', db_index=False)
     
     fecha = models.DateTimeField(auto_now_add=True)
     total = models.DecimalField(max_digits=10, decimal_places=0, validators=[MinValueValidator(0)])
     estado = models.CharField(max_length=20, choices=ESTADOS, default='Pendiente')
 
+    class Meta:
+        # Medidos con `manage.py explicar_consultas`
+        indexes = [
+            # Pedidos recientes del dashboard y listado de pedidos (ORDER BY fecha DESC)
+            models.Index(fields=['fecha'], name='pedido_fecha_idx'),
+            # Filtros por estado y rango de fechas (admin, reportes)
+            models.Index(fields=['estado', 'fecha'], name='pedido_estado_fecha_idx'),
+            # Pedidos del cliente en `perfil`, del más reciente al más antiguo
+            models.Index(fields=['usuario', 'fecha'], name='pedido_usuario_fecha_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(total__gte=0), name='pedido_total_no_negativo'),
+            models.CheckConstraint(condition=models.Q(estado__in=['Pendiente', 'Procesando', 'Entregado', 'Cancelado']),
+                                   name='pedido_estado_valido'),
+        ]
+
     def __str__(self):
         return f"Pedido {self.id} - Usuario: {self.usuario.user.username}"
 
@@ -94,6 +139,11 @@ class CarritoProductoPedido(models.Model):
     cantidad = models.PositiveIntegerField(validators=[MinValueValidator(1)])
     total = models.DecimalField(max_digits=10, decimal_places=0, validators=[MinValueValidator(0)])
 
+    class Meta:
+        constraints = [
+            models.CheckConstraint(condition=models.Q(cantidad__gte=1), name='carrito_cantidad_positiva'),
+        ]
+
     def __str__(self):
         return f"Carrito {self.id} - Pedido: {self.pedido.id}"
 
@@ -108,5 +158,190 @@ class Transaccion(models.Model):
     moneda = models.CharField(max_length=10)
     fecha = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Listado de transacciones (ORDER BY fecha DESC)
+        indexes = [models.Index(fields=['fecha'], name='transaccion_fecha_idx')]
+
+    def __str__(self):
+        return f"Transacción {self.id_transaccion_payu} para Pedido {self.pedido.id}"
+
+
+class EventoPayU(models.Model):
+    """
+    Registro de cada confirmación de PayU tal como llegó (ver tienda/pagos.py).
+    Solo se agregan filas: un par (transaction_id, state_pol) se guarda una vez
+    y los reintentos de PayU se reconocen con esa restricción única.
+    `procesado` queda vacío hasta que el evento se aplica al pedido.
+    """
+    transaction_id = models.CharField(max_length=255)
+    state_pol = models.CharField(max_length=50)
+    referencia = models.CharField(max_length=100, db_index=True, help_text="reference_sale, p. ej. MOTO-19")
+    datos = models.JSONField(help_text="POST completo recibido de PayU")
+    recibido = models.DateTimeField(auto_now_add=True)
+    procesado = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['transaction_id', 'state_pol'], name='evento_payu_unico')]
+        # Cola de pendientes de process_payu_events
+        indexes = [models.Index(fields=['recibido'], name='evento_payu_pendiente_idx',
+                                condition=models.Q(procesado__isnull=True))]
+        verbose_name = 'evento PayU'
+        verbose_name_plural = 'eventos PayU'
+
+    def __str__(self):
+        return f"PayU {self.transaction_id} estado {self.state_pol}"
+
+
+class ItemCarrito(models.Model):
+    """
+    Carrito guardado de un cliente con sesión iniciada (los anónimos lo tienen en
+    la sesión). Lo maneja tienda/carrito.py.
+    """
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='carrito')
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='en_carritos')
+    cantidad = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['usuario', 'producto'], name='item_carrito_unico')]
+
+    def __str__(self):
+        return f"{self.cantidad} x {self.producto_id} en el carrito de {self.usuario_id}"
+
+
+class MovimientoStock(models.Model):
+    """
+    Libro de movimientos de inventario (ver tienda/inventario.py). `cantidad` es
+    lo que realmente cambió el stock (negativo = salida); `faltante` son las
+    unidades vendidas que no había en stock (sobreventa).
+    """
+    VENTA = 'venta'
+    SOBREVENTA = 'sobreventa'
+    AJUSTE = 'ajuste'
+    MOTIVOS = [
+        (VENTA, 'Venta'),
+        (SOBREVENTA, 'Sobreventa'),
+        (AJUSTE, 'Ajuste'),
+    ]
+
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='movimientos_stock')
+    pedido = models.ForeignKey(Pedido, on_delete=models.SET_NULL, null=True, blank=True, related_name='movimientos_stock')
+    cantidad = models.IntegerField()
+    faltante = models.PositiveIntegerField(default=0)
+    motivo = models.CharField(max_length=20, choices=MOTIVOS)
+    fecha = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['producto', 'fecha'], name='movimiento_producto_fecha_idx')]
+
+    def __str__(self):
+        return f"{self.get_motivo_display()} {self.cantidad:+d} de {self.producto_id}"
+
+
+class ReservaStock(models.Model):
+    """
+    Unidades apartadas por un pedido pendiente de pago. Se crean en crear_pedido,
+    se liberan al confirmarse o rechazarse el pago, y dejan de contar solas al
+    vencer `expira` (ver tienda/inventario.py).
+    """
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='reservas')
+    pedido = models.ForeignKey(Pedido, on_delete=models.CASCADE, related_name='reservas')
+    cantidad = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    expira = models.DateTimeField()
+    activa = models.BooleanField(default=True)
+    creada = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Índice parcial y "cubriente": la suma de reservas activas de un producto
+            # se resuelve solo con el índice, que además solo guarda las activas.
+            models.Index(fields=['producto', 'expira', 'cantidad'], condition=models.Q(activa=True),
+                         name='reserva_activa_producto_idx'),
+        ]
+
+    def __str__(self):
+        return f"Reserva de {self.cantidad} x {self.producto_id} (pedido {self.pedido_id})"
+
+
+class Contador(models.Model):
+    """
+    Total de filas de una tabla grande (productos, pedidos...) mantenido por
+    señales en tienda/contadores.py, para no hacer COUNT(*) en el panel. Se
+    corrige con `manage.py reconciliar_contadores`.
+    """
+    nombre = models.CharField(max_length=50, unique=True)
+    valor = models.BigIntegerField(default=0)
+    reconciliado = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.nombre}: {self.valor}"
+
+
+class VentaDiaria(models.Model):
+    """
+    Resumen precalculado por día (fecha local del pedido) para el dashboard.
+    Lo mantiene tienda/ventas.py y se puede reconstruir con `manage.py reconstruir_ventas`.
+    """
+    fecha = models.DateField(unique=True)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=0, default=0)
+    pendientes = models.IntegerField(default=0)
+    procesando = models.IntegerField(default=0)
+    entregados = models.IntegerField(default=0)
+    cancelados = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Ventas del {self.fecha}: {self.ingresos}"
+
+
+class VentaProductoDiaria(models.Model):
+    """
+    Unidades e ingresos vendidos por producto y día (solo pedidos pagados).
+    """
+    fecha = models.DateField()
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='ventas_diarias')
+    unidades = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=0, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'producto'], name='venta_producto_diaria_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.producto.nombre} el {self.fecha}: {self.unidades} uds"
+
+
+class Tarea(models.Model):
+    """
+    Trabajo en segundo plano (procesar imágenes, borrar archivos...).
+    Se encola con tienda.tareas.encolar y lo ejecuta `manage.py run_worker`.
+    """
+    PENDIENTE = 'pendiente'
+    EN_PROCESO = 'en_proceso'
+    COMPLETADA = 'completada'
+    FALLIDA = 'fallida'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (EN_PROCESO, 'En proceso'),
+        (COMPLETADA, 'Completada'),
+        (FALLIDA, 'Fallida'),
+    ]
+
+    tipo = models.CharField(max_length=50)
+    argumentos = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    intentos = models.PositiveIntegerField(default=0)
+    max_intentos = models.PositiveIntegerField(default=3)
+    ejecutar_despues = models.DateTimeField(default=timezone.now)
+    iniciada = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    creada = models.DateTimeField(auto_now_add=True)
+    actualizada = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # El worker busca las pendientes cuya hora ya llegó
+        indexes = [models.Index(fields=['estado', 'ejecutar_despues'], name='tarea_estado_ejecutar_idx')]
+
     def __str__(self):
-        return f"Transacción {self.id_transaccion_payu} para Pedido {self.pedido.id}"
\ No newline at end of file
+        return f"Tarea {self.id} ({self.tipo}) - {self.estado}"
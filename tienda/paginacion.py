@@ -0,0 +1,139 @@
+# paginacion.py
+
+# paginación por cursor (keyset) para los listados de productos de la tienda
+import base64
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+
+# Orden -> (campo de ordenamiento, descendente). Siempre se desempata por id en el
+# mismo sentido, así cada orden tiene su índice compuesto en Producto.Meta.indexes.
+ORDENES = {
+    'nuevos': (None, True),
+    'precio': ('precio', False),
+    'precio_desc': ('precio', True),
+    'nombre': ('nombre', False),
+}
+ORDEN_POR_DEFECTO = 'nuevos'
+
+# Las búsquedas se ordenan por defecto según el backend de búsqueda (tienda/busqueda.py)
+ORDEN_RELEVANCIA = 'relevancia'
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def normalizar_orden(orden, busqueda=False):
+    if busqueda and orden in (None, '', ORDEN_RELEVANCIA):
+        return ORDEN_RELEVANCIA
+    return orden if orden in ORDENES else ORDEN_POR_DEFECTO
+
+
+def codificar_cursor(valores) -> str:
+    """
+    [valor, id] -> texto opaco para la URL (también lo usa tienda/tablas.py).
+    """
+    texto = json.dumps(valores, separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno).decode('utf-8'))
+    except (ValueError, TypeError):
+        raise CursorInvalido("Cursor no válido")
+    if not isinstance(valores, list) or len(valores) != 2 or not isinstance(valores[1], int):
+        raise CursorInvalido("Cursor no válido")
+    return valores
+
+
+def ordenar(queryset, orden):
+    campo, desc = ORDENES[orden]
+    signo = '-' if desc else ''
+    if campo is None:
+        return queryset.order_by(f'{signo}id')
+    return queryset.order_by(f'{signo}{campo}', f'{signo}id')
+
+
+def _despues_de(orden, cursor):
+    """
+    Condición "viene después del cursor" para el orden dado:
+    (campo > valor) OR (campo = valor AND id > ultimo_id), o con < si es descendente.
+    """
+    campo, desc = ORDENES[orden]
+    valor, ultimo_id = decodificar_cursor(cursor)
+    op = 'lt' if desc else 'gt'
+    if campo is None:
+        return Q(**{f'id__{op}': ultimo_id})
+    # cursor_de escribe el nombre y el precio como texto; cualquier otra cosa
+    # (null, números, "NaN") la armó alguien a mano
+    if not isinstance(valor, str):
+        raise CursorInvalido("Cursor no válido")
+    if campo == 'precio':
+        try:
+            valor = Decimal(valor)
+        except InvalidOperation:
+            raise CursorInvalido("Cursor no válido")
+        if not valor.is_finite():
+            raise CursorInvalido("Cursor no válido")
+    return Q(**{f'{campo}__{op}': valor}) | Q(**{campo: valor, f'id__{op}': ultimo_id})
+
+
+def cursor_de(producto, orden) -> str:
+    campo, _ = ORDENES[orden]
+    valor = None if campo is None else getattr(producto, campo)
+    if isinstance(valor, Decimal):
+        valor = str(valor)
+    return codificar_cursor([valor, producto.id])
+
+
+def _consulta_pagina(queryset, orden, cursor, tamano):
+    orden = normalizar_orden(orden)
+    queryset = ordenar(queryset, orden)
+    if cursor:
+        queryset = queryset.filter(_despues_de(orden, cursor))
+    return queryset[:tamano + 1], orden
+
+
+def _recortar(filas, orden, tamano):
+    if len(filas) > tamano:
+        filas = filas[:tamano]
+        return filas, cursor_de(filas[-1], orden)
+    return filas, None
+
+
+def paginar(queryset, orden=ORDEN_POR_DEFECTO, cursor=None, tamano=24):
+    """
+    Devuelve (productos, siguiente_cursor) con una sola consulta LIMIT tamano+1.
+    El costo no depende de qué tan adentro del catálogo esté la página.
+    siguiente_cursor es None en la última página.
+    """
+    consulta, orden = _consulta_pagina(queryset, orden, cursor, tamano)
+    return _recortar(list(consulta), orden, tamano)
+
+
+async def apaginar(queryset, orden=ORDEN_POR_DEFECTO, cursor=None, tamano=24):
+    """
+    Igual que paginar() pero con el ORM async.
+    """
+    consulta, orden = _consulta_pagina(queryset, orden, cursor, tamano)
+    return _recortar([fila async for fila in consulta], orden, tamano)
+
+
+def paginar_ids(ids, cursor=None, tamano=24):
+    """
+    Pagina una lista ya ordenada de ids (p. ej. resultados por relevancia).
+    Aquí el cursor guarda la posición en la lista.
+    Devuelve (ids_de_la_pagina, siguiente_cursor).
+    """
+    inicio = 0
+    if cursor:
+        valor, inicio = decodificar_cursor(cursor)
+        if valor != ORDEN_RELEVANCIA or inicio < 0:
+            raise CursorInvalido("Cursor no válido")
+    fin = inicio + tamano
+    siguiente = codificar_cursor([ORDEN_RELEVANCIA, fin]) if fin < len(ids) else None
+    return ids[inicio:fin], siguiente
@@ -0,0 +1,161 @@
+# pagos.py
+
+# confirmaciones de PayU: registro idempotente de eventos (EventoPayU) y su aplicación al pedido
+import logging
+import traceback
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .inventario import descontar_stock_pedido, liberar_reservas
+from .models import EventoPayU, Pedido, Transaccion
+from .ventas import cambiar_estado_pedido
+
+logger = logging.getLogger(__name__)
+
+# state_pol de PayU
+APROBADO = '4'
+RECHAZADOS = ('5', '6')  # expirado o rechazado
+
+# Resultados de procesar_confirmacion
+APLICADO = 'aplicado'
+DUPLICADO = 'duplicado'
+
+
+def pedido_de_referencia(referencia):
+    """
+    "MOTO-19" -> 19; None si la referencia no tiene ese formato.
+    """
+    try:
+        return int((referencia or '').split('-')[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def registrar_evento(datos) -> tuple:
+    """
+    Guarda el evento si es nuevo. Devuelve (evento, creado). Un reintento de
+    PayU se reconoce con una sola búsqueda por el índice único.
+    """
+    clave = {'transaction_id': datos.get('transaction_id') or '', 'state_pol': datos.get('state_pol') or ''}
+    evento = EventoPayU.objects.filter(**clave).first()
+    if evento is not None:
+        return evento, False
+    try:
+        with transaction.atomic():
+            return EventoPayU.objects.create(referencia=datos.get('reference_sale') or '', datos=datos, **clave), True
+    except IntegrityError:
+        # Llegó el mismo evento al mismo tiempo por otra conexión
+        return EventoPayU.objects.get(**clave), False
+
+
+def _evento_nuevo(datos):
+    return EventoPayU(
+        transaction_id=datos.get('transaction_id') or '',
+        state_pol=datos.get('state_pol') or '',
+        referencia=datos.get('reference_sale') or '',
+        datos=datos,
+    )
+
+
+def recibir_evento(datos):
+    """
+    Modo diferido (settings.PAYU_CONFIRMACION_DIFERIDA): solo guarda el evento,
+    con un único INSERT que ignora los repetidos. Lo aplica después
+    `manage.py process_payu_events`.
+    """
+    EventoPayU.objects.bulk_create([_evento_nuevo(datos)], ignore_conflicts=True)
+
+
+async def arecibir_evento(datos):
+    await EventoPayU.objects.abulk_create([_evento_nuevo(datos)], ignore_conflicts=True)
+
+
+def aplicar_evento(evento, forzar=False) -> bool:
+    """
+    Aplica un evento registrado: guarda la Transaccion y mueve el pedido.
+    Bloquea la fila del pedido, así los eventos de un mismo pedido se procesan
+    de a uno (en SQLite la transacción IMMEDIATE ya serializa las escrituras).
+    El evento se marca procesado en la misma transacción con un UPDATE
+    condicionado: si otro proceso ya lo aplicó devuelve False y no hace nada.
+    Con `forzar` se vuelve a aplicar aunque ya esté procesado; los cambios de
+    estado del pedido están condicionados, así que repetirlo no descuenta dos veces.
+    """
+    datos = evento.datos
+    with transaction.atomic():
+        pedido_id = pedido_de_referencia(evento.referencia)
+        pedido = Pedido.objects.select_for_update().filter(id=pedido_id).first() if pedido_id else None
+
+        pendiente = EventoPayU.objects.filter(pk=evento.pk)
+        if not forzar:
+            pendiente = pendiente.filter(procesado__isnull=True)
+        if not pendiente.update(procesado=timezone.now(), error=''):
+            return False
+
+        Transaccion.objects.update_or_create(
+            id_transaccion_payu=evento.transaction_id,
+            defaults={
+                'pedido': pedido,
+                'estado_pol': evento.state_pol,
+                'mensaje_respuesta': datos.get("response_message_pol"),
+                'metodo_pago_nombre': datos.get("payment_method_name"),
+                'valor': Decimal(datos.get("value")),
+                'moneda': datos.get("currency"),
+            }
+        )
+
+        if pedido:
+            if evento.state_pol == APROBADO:
+                # Solo si sigue Pendiente en la base de datos: descuenta el stock
+                # de todo el pedido en un UPDATE y suelta su reserva
+                if cambiar_estado_pedido(pedido, "Procesando", desde='Pendiente'):
+                    descontar_stock_pedido(pedido)
+                    liberar_reservas(pedido)
+            elif evento.state_pol in RECHAZADOS:
+                cambiar_estado_pedido(pedido, "Cancelado", desde='Pendiente')
+                liberar_reservas(pedido)
+    return True
+
+
+def procesar_confirmacion(datos) -> str:
+    """
+    Registra y aplica una confirmación ya validada (firma correcta).
+    Si la aplicación falla, el error queda en el evento y se relanza; el evento
+    sigue sin procesar y lo toma el siguiente reintento de PayU o
+    `manage.py reprocesar_payu`.
+    """
+    evento, _ = registrar_evento(datos)
+    if evento.procesado:
+        return DUPLICADO
+    try:
+        aplicado = aplicar_evento(evento)
+    except Exception:
+        EventoPayU.objects.filter(pk=evento.pk).update(error=traceback.format_exc())
+        logger.exception("Error aplicando el evento PayU %s", evento.pk)
+        raise
+    return APLICADO if aplicado else DUPLICADO
+
+
+def procesar_pendientes(cantidad=100) -> tuple:
+    """
+    Aplica hasta `cantidad` eventos sin procesar, en el orden en que llegaron,
+    dentro de una sola transacción (un solo commit por lote). Cada evento va en
+    su propio savepoint: si uno falla se guarda su error y el resto del lote sigue.
+    Los eventos con error no se toman otra vez; se reintentan con `manage.py reprocesar_payu`.
+    Devuelve (aplicados, fallidos).
+    """
+    eventos = list(
+        EventoPayU.objects.filter(procesado__isnull=True, error='').order_by('recibido', 'id')[:cantidad]
+    )
+    aplicados, errores = 0, {}
+    with transaction.atomic():
+        for evento in eventos:
+            try:
+                aplicados += aplicar_evento(evento)
+            except Exception:
+                errores[evento.pk] = traceback.format_exc()
+                logger.exception("Error aplicando el evento PayU %s", evento.pk)
+    for pk, error in errores.items():
+        EventoPayU.objects.filter(pk=pk).update(error=error)
+    return aplicados, len(errores)
@@ -0,0 +1,135 @@
+# payu_local.py
+
+# pasarela PayU falsa para desarrollo y pruebas de carga (`manage.py payu_local`):
+# recibe el formulario de WebCheckout, firma la confirmación como PayU y la envía
+# a confirmationUrl; al navegador lo redirige a responseUrl
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import URLError
+from urllib.parse import parse_qsl, urlencode, urlsplit
+from urllib.request import Request, urlopen
+
+from .utils import build_confirmation_payload, generate_payment_signature
+
+logger = logging.getLogger(__name__)
+
+# Reintentos de la confirmación si la tienda no responde 200 (PayU también reintenta)
+REINTENTOS = 3
+ESPERA_REINTENTO = 0.5
+
+
+class PasarelaLocal(ThreadingHTTPServer):
+    """
+    Servidor HTTP de la pasarela. `rechazos` es la fracción de pagos que se
+    rechazan (state_pol 6); `demora` los segundos antes de enviar la confirmación.
+    Guarda cuánto tardó cada confirmación para /estadisticas.
+    """
+    daemon_threads = True
+
+    def __init__(self, direccion, api_key, merchant_id, rechazos=0.0, demora=0.0):
+        super().__init__(direccion, _Manejador)
+        self.api_key = api_key
+        self.merchant_id = merchant_id
+        self.rechazos = rechazos
+        self.demora = demora
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self.pagos = 0
+            self.tiempos = []
+            self.fallidas = 0
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {'pagos': self.pagos, 'confirmaciones_ms': list(self.tiempos), 'fallidas': self.fallidas}
+
+    def confirmar(self, url, datos):
+        """
+        POST de la confirmación a la tienda, como lo hace PayU (en otro hilo).
+        """
+        time.sleep(self.demora)
+        cuerpo = urlencode(datos).encode()
+        for intento in range(REINTENTOS):
+            inicio = time.perf_counter()
+            try:
+                with urlopen(Request(url, data=cuerpo), timeout=30) as respuesta:
+                    ok = respuesta.status == 200
+            except (URLError, OSError) as e:
+                logger.warning("Confirmación %s falló: %s", datos['transaction_id'], e)
+                ok = False
+            if ok:
+                with self._lock:
+                    self.tiempos.append((time.perf_counter() - inicio) * 1000)
+                return
+            time.sleep(ESPERA_REINTENTO * 2 ** intento)
+        with self._lock:
+            self.fallidas += 1
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    server_version = 'PayULocal/1.0'
+
+    def log_message(self, formato, *args):
+        logger.debug(formato, *args)
+
+    def _responder(self, codigo, cuerpo='', tipo='text/plain; charset=utf-8', **cabeceras):
+        datos = cuerpo.encode()
+        self.send_response(codigo)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(datos)))
+        for nombre, valor in cabeceras.items():
+            self.send_header(nombre, valor)
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def do_GET(self):
+        ruta = urlsplit(self.path).path
+        if ruta == '/estadisticas':
+            return self._responder(200, json.dumps(self.server.estadisticas()), 'application/json')
+        if ruta == '/reiniciar':
+            self.server.reiniciar()
+            return self._responder(200, 'OK')
+        return self._responder(404, 'No encontrado')
+
+    def do_POST(self):
+        largo = int(self.headers.get('Content-Length') or 0)
+        form = dict(parse_qsl(self.rfile.read(largo).decode()))
+        pasarela = self.server
+
+        # Misma validación que PayU: firma MD5 del formulario de WebCheckout
+        esperada = generate_payment_signature(
+            pasarela.api_key, form.get('merchantId'), form.get('referenceCode'), form.get('amount'), form.get('currency'),
+        )
+        if form.get('merchantId') != pasarela.merchant_id or form.get('signature') != esperada:
+            return self._responder(400, 'Firma inválida')
+
+        estado = '6' if random.random() < pasarela.rechazos else '4'
+        datos = build_confirmation_payload(
+            pasarela.api_key, pasarela.merchant_id, form['referenceCode'], form['amount'], form['currency'],
+            estado, str(uuid.uuid4()), email_buyer=form.get('buyerEmail', ''),
+        )
+        with pasarela._lock:
+            pasarela.pagos += 1
+        if form.get('confirmationUrl'):
+            threading.Thread(target=pasarela.confirmar, args=(form['confirmationUrl'], datos), daemon=True).start()
+
+        # Al navegador: parámetros de la página de respuesta (los nombres de PayU y
+        # los de la confirmación, que son los que lee payu_response)
+        parametros = {
+            **{k: v for k, v in datos.items() if k != 'sign'},
+            'merchantId': pasarela.merchant_id,
+            'referenceCode': form['referenceCode'],
+            'transactionState': estado,
+            'transactionId': datos['transaction_id'],
+            'TX_VALUE': form['amount'],
+        }
+        destino = form.get('responseUrl') or '/'
+        separador = '&' if '?' in destino else '?'
+        return self._responder(302, Location=f"{destino}{separador}{urlencode(parametros)}")
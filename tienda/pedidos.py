@@ -0,0 +1,117 @@
+# pedidos.py
+
+# armado de pedidos desde el carrito: validación y escritura en bloque
+from django.db import transaction
+
+from .inventario import con_disponible, reservar_stock
+from .models import CarritoProductoPedido, Pedido, Producto
+from .precios import CuponInvalido, Linea, get_motor
+from .ventas import actualizar_resumenes
+from .contadores import sumar
+
+# Códigos de error por línea del carrito
+NO_EXISTE = 'no_existe'
+SIN_STOCK = 'sin_stock'
+CANTIDAD_INVALIDA = 'cantidad_invalida'
+CUPON_INVALIDO = 'cupon_invalido'
+
+MENSAJES = {
+    NO_EXISTE: "El producto ya no está disponible en la tienda.",
+    SIN_STOCK: "No hay stock suficiente.",
+    CANTIDAD_INVALIDA: "Cantidad o producto no válido.",
+    CUPON_INVALIDO: "El cupón no existe.",
+}
+
+
+class PedidoInvalido(Exception):
+    """
+    El carrito no se puede convertir en pedido. `errores` es una lista de
+    {"producto_id", "codigo", "mensaje"} (+ "disponible" si falta stock).
+    """
+
+    def __init__(self, errores):
+        super().__init__("Pedido inválido")
+        self.errores = errores
+
+    @property
+    def solo_stock(self) -> bool:
+        return all(error['codigo'] == SIN_STOCK for error in self.errores)
+
+
+def _error(producto_id, codigo, **extra):
+    return {'producto_id': producto_id, 'codigo': codigo, 'mensaje': MENSAJES[codigo], **extra}
+
+
+def leer_carrito(carrito) -> dict:
+    """
+    Normaliza las líneas enviadas por el navegador ({id, quantity}) a
+    producto_id -> cantidad; suma las líneas repetidas. El precio que manda el
+    navegador se ignora: lo calcula el motor de precios (tienda/precios.py).
+    """
+    lineas = {}
+    errores = []
+    for item in carrito or []:
+        try:
+            producto_id = int(item['id'])
+            cantidad = int(item['quantity'])
+        except (KeyError, TypeError, ValueError):
+            errores.append(_error(item.get('id') if isinstance(item, dict) else None, CANTIDAD_INVALIDA))
+            continue
+        if cantidad < 1:
+            errores.append(_error(producto_id, CANTIDAD_INVALIDA))
+            continue
+        lineas[producto_id] = lineas.get(producto_id, 0) + cantidad
+    if errores:
+        raise PedidoInvalido(errores)
+    if not lineas:
+        raise PedidoInvalido([_error(None, CANTIDAD_INVALIDA)])
+    return lineas
+
+
+def crear_pedido_desde_carrito(usuario, carrito, cupon=None) -> Pedido:
+    """
+    Crea el pedido Pendiente, sus líneas y la reserva de stock en una sola
+    transacción. El número de consultas no depende de las líneas del carrito:
+    un SELECT (in_bulk con el disponible de cada producto), el INSERT del pedido,
+    un bulk_create de líneas, uno de reservas y los resúmenes del día.
+    Los totales salen de Producto.precio y las reglas de precios, no del navegador.
+    Si algo no cuadra lanza PedidoInvalido y no se guarda nada.
+    """
+    lineas = leer_carrito(carrito)
+    with transaction.atomic():
+        productos = con_disponible(Producto.objects.select_for_update()).in_bulk(list(lineas))
+
+        errores = []
+        for producto_id, cantidad in lineas.items():
+            producto = productos.get(producto_id)
+            if producto is None:
+                errores.append(_error(producto_id, NO_EXISTE))
+            elif producto.disponible < cantidad:
+                errores.append(_error(producto_id, SIN_STOCK, disponible=max(producto.disponible, 0)))
+        if errores:
+            raise PedidoInvalido(errores)
+
+        try:
+            cotizacion = get_motor().cotizar(
+                [Linea(producto_id, productos[producto_id].categoria_id, productos[producto_id].precio, cantidad)
+                 for producto_id, cantidad in lineas.items()],
+                cupon=cupon,
+            )
+        except CuponInvalido:
+            raise PedidoInvalido([_error(None, CUPON_INVALIDO)])
+
+        pedido = Pedido.objects.create(usuario=usuario, total=cotizacion.total, estado="Pendiente")
+        actualizar_resumenes(pedido, None, pedido.estado)
+        CarritoProductoPedido.objects.bulk_create([
+            CarritoProductoPedido(pedido=pedido, producto_id=linea.producto_id, cantidad=linea.cantidad,
+                                  total=linea.total)
+            for linea in cotizacion.lineas
+        ])
+        # bulk_create no envía post_save
+        sumar('lineas_pedido', len(cotizacion.lineas))
+        # El disponible ya se validó arriba con las filas bloqueadas
+        reservar_stock(
+            pedido, lineas,
+            disponible={producto_id: producto.disponible for producto_id, producto in productos.items()},
+        )
+    return pedido
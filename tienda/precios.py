@@ -0,0 +1,246 @@
+# precios.py
+
+# motor de precios: totales de línea y de pedido con Decimal y reglas de descuento configurables
+from dataclasses import dataclass, field
+from decimal import Decimal, ROUND_FLOOR, ROUND_HALF_UP
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Los precios de la tienda son pesos enteros (decimal_places=0)
+UNIDAD = Decimal('1')
+CIEN = Decimal('100')
+CERO = Decimal('0')
+
+# Claves de la tabla de reglas de línea
+TODOS = ('todos',)
+
+
+def redondear(valor) -> Decimal:
+    return valor.quantize(UNIDAD, rounding=ROUND_HALF_UP)
+
+
+def _porcentaje(valor, porcentaje) -> Decimal:
+    return redondear(valor * porcentaje / CIEN)
+
+
+def _repartir(lineas, valor, neto):
+    """
+    Reparte el descuento `valor` del pedido entre las líneas en proporción a su
+    total, en pesos enteros: cada línea recibe la parte entera y los pesos que
+    sobran van a las de mayor fracción. Así la suma de las líneas sigue siendo
+    el total del pedido.
+    """
+    partes = []
+    for linea in lineas:
+        exacta = linea.total * valor / neto
+        partes.append((linea, exacta.to_integral_value(rounding=ROUND_FLOOR), exacta))
+    sobrante = int(valor - sum(entera for _, entera, _ in partes))
+    for i, (linea, entera, exacta) in enumerate(sorted(partes, key=lambda p: p[1] - p[2])):
+        parte = entera + (1 if i < sobrante else 0)
+        linea.descuento += parte
+        linea.total -= parte
+
+
+class CuponInvalido(ValueError):
+    pass
+
+
+@dataclass(slots=True)
+class Linea:
+    producto_id: int
+    categoria_id: int
+    precio: Decimal
+    cantidad: int
+    subtotal: Decimal = CERO
+    descuento: Decimal = CERO
+    total: Decimal = CERO
+    regla: str = ''
+
+
+@dataclass(slots=True)
+class Cotizacion:
+    lineas: list
+    subtotal: Decimal = CERO
+    descuento: Decimal = CERO
+    total: Decimal = CERO
+    cupon: str = ''
+    reglas: list = field(default_factory=list)
+
+
+# --- Reglas ---
+
+class Regla:
+    """
+    Una regla de línea devuelve el descuento (en pesos) para una línea; la de
+    pedido (cupones) para el subtotal ya descontado. Para agregar una regla nueva
+    basta con una subclase y apuntar a ella en settings.PRECIOS_REGLAS.
+    """
+    nombre = ''
+
+    def claves(self) -> list:
+        """Claves de la tabla donde se registra: ('categoria', id), ('producto', id) o TODOS."""
+        return [TODOS]
+
+    def descuento_linea(self, linea) -> Decimal:
+        return CERO
+
+
+class DescuentoCategoria(Regla):
+    def __init__(self, categoria, porcentaje, nombre=''):
+        self.categoria = categoria
+        self.porcentaje = Decimal(str(porcentaje))
+        self.nombre = nombre or f"{self.porcentaje}% en categoría {categoria}"
+
+    def claves(self):
+        return [('categoria', self.categoria)]
+
+    def descuento_linea(self, linea):
+        return _porcentaje(linea.subtotal, self.porcentaje)
+
+
+class DescuentoPorCantidad(Regla):
+    """
+    Tramos por unidades de la misma línea, p. ej. [(3, 5), (10, 12)]: 5% desde 3
+    unidades y 12% desde 10. Sin producto ni categoría aplica a toda la tienda.
+    """
+
+    def __init__(self, tramos, producto=None, categoria=None, nombre=''):
+        self.tramos = sorted(((int(minimo), Decimal(str(porcentaje))) for minimo, porcentaje in tramos), reverse=True)
+        self.producto = producto
+        self.categoria = categoria
+        self.nombre = nombre or "Descuento por cantidad"
+
+    def claves(self):
+        if self.producto is not None:
+            return [('producto', self.producto)]
+        if self.categoria is not None:
+            return [('categoria', self.categoria)]
+        return [TODOS]
+
+    def descuento_linea(self, linea):
+        for minimo, porcentaje in self.tramos:
+            if linea.cantidad >= minimo:
+                return _porcentaje(linea.subtotal, porcentaje)
+        return CERO
+
+
+class Cupon:
+    """
+    Cupón de pedido: porcentaje o monto fijo sobre el subtotal (ya con los
+    descuentos de línea), con compra mínima opcional.
+    """
+
+    def __init__(self, codigo, porcentaje=None, monto=None, minimo=0, nombre=''):
+        if (porcentaje is None) == (monto is None):
+            raise ValueError("El cupón lleva porcentaje o monto, no ambos")
+        self.codigo = codigo.strip().upper()
+        self.porcentaje = None if porcentaje is None else Decimal(str(porcentaje))
+        self.monto = None if monto is None else Decimal(str(monto))
+        self.minimo = Decimal(str(minimo))
+        self.nombre = nombre or f"Cupón {self.codigo}"
+
+    def descuento_pedido(self, subtotal) -> Decimal:
+        if subtotal < self.minimo:
+            return CERO
+        if self.porcentaje is not None:
+            return _porcentaje(subtotal, self.porcentaje)
+        return min(redondear(self.monto), subtotal)
+
+
+# --- Motor ---
+
+class MotorPrecios:
+    """
+    Las reglas se compilan una vez en una tabla clave -> reglas y un diccionario
+    de cupones, así cotizar una línea son tres búsquedas en diccionarios.
+    En cada línea se aplica el mayor descuento de las reglas que le tocan (no se
+    acumulan); el cupón se aplica después sobre el subtotal y se reparte entre
+    las líneas.
+    """
+
+    def __init__(self, reglas=()):
+        self.tabla = {}
+        self.cupones = {}
+        for regla in reglas:
+            if isinstance(regla, Cupon):
+                self.cupones[regla.codigo] = regla
+            else:
+                for clave in regla.claves():
+                    self.tabla.setdefault(clave, []).append(regla)
+
+    def cupon(self, codigo):
+        if codigo is not None and not isinstance(codigo, str):
+            # Llega del JSON del navegador: {"cupon": 5} no es un código
+            raise CuponInvalido("Cupón no válido")
+        codigo = (codigo or '').strip().upper()
+        if not codigo:
+            return None
+        try:
+            return self.cupones[codigo]
+        except KeyError:
+            raise CuponInvalido(f"El cupón {codigo} no existe")
+
+    def cotizar(self, lineas, cupon=None) -> Cotizacion:
+        """
+        `lineas`: iterable de Linea (o de tuplas producto_id, categoria_id, precio, cantidad).
+        """
+        tabla = self.tabla
+        todas = tabla.get(TODOS, ())
+        cotizacion = Cotizacion(lineas=[])
+        subtotal = descuento = CERO
+        for linea in lineas:
+            if not isinstance(linea, Linea):
+                linea = Linea(*linea)
+            linea.subtotal = linea.precio * linea.cantidad
+            mejor, regla_aplicada = CERO, None
+            for reglas in (tabla.get(('producto', linea.producto_id), ()),
+                           tabla.get(('categoria', linea.categoria_id), ()),
+                           todas):
+                for regla in reglas:
+                    valor = regla.descuento_linea(linea)
+                    if valor > mejor:
+                        mejor, regla_aplicada = valor, regla
+            linea.descuento = min(mejor, linea.subtotal)
+            linea.total = linea.subtotal - linea.descuento
+            linea.regla = regla_aplicada.nombre if regla_aplicada else ''
+            subtotal += linea.subtotal
+            descuento += linea.descuento
+            cotizacion.lineas.append(linea)
+
+        cotizacion.subtotal = subtotal
+        neto = subtotal - descuento
+        regla_cupon = self.cupon(cupon)
+        if regla_cupon:
+            valor = regla_cupon.descuento_pedido(neto)
+            if valor:
+                cotizacion.cupon = regla_cupon.codigo
+                _repartir(cotizacion.lineas, valor, neto)
+                descuento += valor
+                neto -= valor
+        cotizacion.descuento = descuento
+        cotizacion.total = neto
+        cotizacion.reglas = sorted({linea.regla for linea in cotizacion.lineas if linea.regla})
+        return cotizacion
+
+
+def compilar(configuracion) -> MotorPrecios:
+    """
+    settings.PRECIOS_REGLAS: lista de dicts con la ruta de la clase en 'tipo' y
+    sus argumentos, p. ej. {'tipo': 'tienda.precios.Cupon', 'codigo': 'MOTO10', 'porcentaje': 10}.
+    """
+    reglas = []
+    for opciones in configuracion:
+        opciones = dict(opciones)
+        reglas.append(import_string(opciones.pop('tipo'))(**opciones))
+    return MotorPrecios(reglas)
+
+
+_motor = None
+
+
+def get_motor() -> MotorPrecios:
+    global _motor
+    if _motor is None:
+        _motor = compilar(getattr(settings, 'PRECIOS_REGLAS', []))
+    return _motor
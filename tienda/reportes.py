@@ -0,0 +1,98 @@
+# reportes.py
+
+# series de ventas agregadas para el dashboard admin y las exportaciones
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate, TruncWeek, TruncMonth
+
+from .models import VentaDiaria
+
+# Estados que cuentan como venta (pago aprobado)
+ESTADOS_PAGADOS = ['Procesando', 'Entregado']
+
+# Granularidad -> función de truncado usada en el GROUP BY
+GRANULARIDADES = {
+    'dia': TruncDate,
+    'semana': TruncWeek,
+    'mes': TruncMonth,
+}
+
+FORMATOS_ETIQUETA = {
+    'dia': "%d %b",
+    'semana': "Sem %d %b",
+    'mes': "%b %Y",
+}
+
+
+def inicio_bucket(dia: date, granularidad: str) -> date:
+    """
+    Devuelve la fecha con la que empieza el bucket que contiene `dia`.
+    Las semanas empiezan el lunes (igual que TruncWeek).
+    """
+    if granularidad == 'semana':
+        return dia - timedelta(days=dia.weekday())
+    if granularidad == 'mes':
+        return dia.replace(day=1)
+    return dia
+
+
+def siguiente_bucket(dia: date, granularidad: str) -> date:
+    """
+    Devuelve el inicio del bucket siguiente a `dia` (que ya debe ser inicio de bucket).
+    """
+    if granularidad == 'semana':
+        return dia + timedelta(days=7)
+    if granularidad == 'mes':
+        return (dia.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return dia + timedelta(days=1)
+
+
+def rango_buckets(start_date: date, end_date: date, granularidad: str = 'dia') -> list:
+    """
+    Lista de inicios de bucket que cubren el rango [start_date, end_date].
+    """
+    buckets = []
+    actual = inicio_bucket(start_date, granularidad)
+    while actual <= end_date:
+        buckets.append(actual)
+        actual = siguiente_bucket(actual, granularidad)
+    return buckets
+
+
+def etiqueta_bucket(dia: date, granularidad: str = 'dia') -> str:
+    """
+    Texto que se muestra en el eje X del gráfico para un bucket.
+    """
+    return dia.strftime(FORMATOS_ETIQUETA[granularidad])
+
+
+def serie_ventas(start_date: date, end_date: date, granularidad: str = 'dia') -> list:
+    """
+    Ingresos por bucket (día, semana o mes) en el rango [start_date, end_date].
+
+    Lee del resumen VentaDiaria (ya agrupado por día local de TIME_ZONE, p. ej.
+    America/Bogota) con una sola consulta con GROUP BY y rellena en Python los
+    buckets sin ventas con 0, así el número de consultas no depende de los días.
+    Devuelve una lista de tuplas (inicio_bucket, total).
+    """
+    if granularidad not in GRANULARIDADES:
+        raise ValueError(f"Granularidad no válida: {granularidad}")
+
+    # fecha ya es un DateField local: por día no hace falta truncar
+    bucket = F('fecha') if granularidad == 'dia' else GRANULARIDADES[granularidad]('fecha')
+    filas = (
+        VentaDiaria.objects
+        .filter(fecha__range=[start_date, end_date])
+        .annotate(bucket=bucket)
+        .values('bucket')
+        .annotate(total=Sum('ingresos'))
+        .order_by('bucket')
+    )
+
+    totales = {}
+    for fila in filas:
+        totales[fila['bucket']] = fila['total'] or Decimal(0)
+
+    return [(bucket, totales.get(bucket, Decimal(0))) for bucket in rango_buckets(start_date, end_date, granularidad)]
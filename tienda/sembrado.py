@@ -0,0 +1,179 @@
+# sembrado.py
+
+# datos sintéticos en volumen para medir consultas, índices y vistas (seed_perf,
+# explicar_consultas, bench_urls): categorías, productos con imágenes, clientes,
+# pedidos con sus líneas y transacciones. Los pedidos se insertan con executemany
+# directo (un millón en pocos minutos); no disparan señales.
+import io
+import os
+import random
+import tempfile
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from django.utils import timezone
+from PIL import Image, ImageDraw
+
+from .busqueda import get_backend
+from .cache_catalogo import invalidar_catalogo
+from .contadores import reconciliar
+from .imagenes import generar_derivados
+from .models import CarritoProductoPedido, Categoria, Pedido, Producto, ProductoImagen, Transaccion, Usuario
+from .ventas import reconstruir_resumenes
+
+# Estado -> peso al sortear el estado de cada pedido
+ESTADOS = {'Entregado': 50, 'Procesando': 20, 'Pendiente': 15, 'Cancelado': 15}
+# Pedidos que se sortean e insertan por vez
+LOTE = 50_000
+# Imagen de los productos cuando no se generan fotos
+IMAGEN_POR_DEFECTO = 'productos/logo.png'
+
+
+@contextmanager
+def base_temporal():
+    """
+    Mientras dura el `with`, la conexión usa una base SQLite nueva y migrada en
+    un directorio temporal; al salir se borra y se vuelve a la base real.
+    """
+    carpeta = tempfile.mkdtemp()
+    connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(carpeta, 'sembrado.sqlite3')
+    nombre_original = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+
+def _insertar(modelo, campos, filas):
+    tabla = modelo._meta.db_table
+    columnas = [modelo._meta.get_field(campo).column for campo in campos]
+    sql = (f'INSERT INTO "{tabla}" ({", ".join(columnas)}) '
+           f'VALUES ({", ".join(["%s"] * len(columnas))})')
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, filas)
+
+
+def _fotos(cantidad, prefijo, aleatorio) -> list:
+    """
+    Genera `cantidad` fotos JPEG de 1200x900 en el storage, con sus derivados,
+    para repartirlas entre los productos. Devuelve [(nombre, derivados)].
+    """
+    fotos = []
+    for i in range(cantidad):
+        color = tuple(aleatorio.randrange(256) for _ in range(3))
+        imagen = Image.new('RGB', (1200, 900), color)
+        ImageDraw.Draw(imagen).ellipse((300, 150, 900, 750), fill=tuple(255 - c for c in color))
+        contenido = io.BytesIO()
+        imagen.save(contenido, 'JPEG', quality=85)
+        nombre = default_storage.save(f"productos/sembrado/{prefijo}foto-{i:03d}.jpg", ContentFile(contenido.getvalue()))
+        fotos.append((nombre, generar_derivados(Producto(imagen=nombre).imagen)))
+    return fotos
+
+
+def poblar(pedidos=1_000_000, usuarios=10_000, productos=2_000, categorias=20, imagenes=0,
+           dias=730, semilla=7, prefijo='', salida=None) -> dict:
+    """
+    Crea `categorias` categorías, `productos` productos, `usuarios` clientes y
+    `pedidos` pedidos repartidos en los últimos `dias` días. Con `imagenes` > 0
+    genera ese número de fotos (con derivados) y las reparte como imagen principal
+    y adicionales; si no, todos usan IMAGEN_POR_DEFECTO. Los perfiles de cliente
+    los crea la señal `create_or_update_user_profile`, como en un registro real.
+    `prefijo` distingue los nombres de usuario al poblar varias veces la misma base.
+
+    El primer cliente es un comprador frecuente (1 de cada 500 pedidos) para medir
+    `perfil` con muchos pedidos. Devuelve ids útiles para las consultas de ejemplo.
+    """
+    aleatorio = random.Random(semilla)
+    escribir = salida or (lambda texto: None)
+    ahora = timezone.now()
+    fecha_bd = connection.ops.adapt_datetimefield_value
+
+    fotos = _fotos(imagenes, prefijo, aleatorio) if imagenes else [(IMAGEN_POR_DEFECTO, {})]
+    if imagenes:
+        escribir(f"{len(fotos)} fotos")
+
+    with transaction.atomic():
+        grupos = Categoria.objects.bulk_create([Categoria(nombre=f"{prefijo}Categoría {i}") for i in range(categorias)])
+        catalogo = Producto.objects.bulk_create([
+            Producto(nombre=f"{prefijo}Producto {i:05d}", descripcion='-',
+                     precio=aleatorio.randrange(5_000, 5_000_000, 1_000), categoria=aleatorio.choice(grupos),
+                     imagen=foto, derivados=derivados,
+                     stock=aleatorio.randint(0, 5) if aleatorio.random() < 0.02 else aleatorio.randint(6, 500))
+            for i, (foto, derivados) in ((i, aleatorio.choice(fotos)) for i in range(productos))
+        ], batch_size=1_000)
+        precios = {p.id: p.precio for p in catalogo}
+        ids_producto = list(precios)
+        if imagenes:
+            ProductoImagen.objects.bulk_create([
+                ProductoImagen(producto_id=pk, imagen=foto, derivados=derivados)
+                for pk in ids_producto
+                for foto, derivados in aleatorio.sample(fotos, min(len(fotos), aleatorio.randint(0, 2)))
+            ], batch_size=1_000)
+        escribir(f"{len(catalogo)} productos")
+
+        cuentas = User.objects.bulk_create([
+            User(username=f"{prefijo}cliente{i:06d}", email=f"{prefijo}cliente{i:06d}@example.com", password='!')
+            for i in range(usuarios)
+        ], batch_size=1_000)
+        # bulk_create no envía post_save: se envía a mano para que el perfil lo cree la señal
+        for cuenta in cuentas:
+            post_save.send(sender=User, instance=cuenta, created=True, update_fields=None, raw=False, using='default')
+        ids_usuario = list(Usuario.objects.filter(user_id__gte=cuentas[0].id).order_by('id')
+                           .values_list('id', flat=True)) if cuentas else []
+        escribir(f"{len(ids_usuario)} clientes")
+
+        primero = (Pedido.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+        estados = list(ESTADOS)
+        pesos = list(ESTADOS.values())
+        for inicio in range(0, pedidos, LOTE):
+            # Se sortea el lote antes de insertar: las líneas y la transacción usan
+            # el id del pedido, que es consecutivo (primero + posición)
+            lote = [
+                (primero + inicio + i,
+                 ids_usuario[0] if aleatorio.random() < 0.002 else aleatorio.choice(ids_usuario),
+                 ahora - timedelta(seconds=aleatorio.randrange(dias * 86_400)),
+                 aleatorio.choices(estados, pesos)[0],
+                 [(pid, aleatorio.randint(1, 3)) for pid in aleatorio.sample(ids_producto, aleatorio.randint(1, 3))])
+                for i in range(min(LOTE, pedidos - inicio))
+            ]
+            totales = [sum(precios[pid] * cantidad for pid, cantidad in lineas) for *_, lineas in lote]
+            _insertar(Pedido, ['id', 'usuario', 'fecha', 'total', 'estado'], [
+                (pk, usuario, fecha_bd(fecha), str(total), estado)
+                for (pk, usuario, fecha, estado, _), total in zip(lote, totales)
+            ])
+            _insertar(CarritoProductoPedido, ['pedido', 'producto', 'cantidad', 'total'], [
+                (pk, pid, cantidad, str(precios[pid] * cantidad))
+                for pk, *_, lineas in lote
+                for pid, cantidad in lineas
+            ])
+            _insertar(Transaccion, ['pedido', 'id_transaccion_payu', 'estado_pol', 'mensaje_respuesta',
+                                    'metodo_pago_nombre', 'valor', 'moneda', 'fecha'], [
+                (pk, str(uuid.UUID(int=aleatorio.getrandbits(128))), '6' if estado == 'Cancelado' else '4',
+                 'DECLINED' if estado == 'Cancelado' else 'APPROVED', 'VISA', str(Decimal(total)), 'COP',
+                 fecha_bd(fecha + timedelta(minutes=2)))
+                for (pk, _, fecha, estado, _), total in zip(lote, totales)
+                if estado != 'Pendiente'
+            ])
+            escribir(f"{inicio + len(lote)} pedidos")
+
+    # Lo que las señales de Producto y Pedido habrían mantenido al día
+    reconstruir_resumenes()
+    reconciliar()
+    get_backend().reconstruir()
+    invalidar_catalogo()
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+    return {
+        'usuario_frecuente': ids_usuario[0],
+        'pedido': primero + pedidos // 2,
+        'producto': ids_producto[0],
+        'categoria': grupos[0].id,
+    }
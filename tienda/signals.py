@@ -1,7 +1,16 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import Usuario, Rol
+from django.contrib.auth.signals import user_logged_in
+from .models import Usuario, Rol, Pedido, Producto, Categoria, ProductoImagen
+from .ventas import actualizar_resumenes
+from .cache_catalogo import invalidar_catalogo, tocar_producto
+from .busqueda import get_backend
+from .imagenes import archivos_de, derivados_al_dia
+from .tareas import encolar
+from .carrito import fusionar
+from . import contadores
 
 @receiver(post_save, sender=User)
 def create_or_update_user_profile(sender, instance, created, **kwargs):
@@ -12,4 +21,103 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
         # Asigna un rol por defecto, por ejemplo 'Cliente'
         # Asegúrate de que este rol exista en tu base de datos.
         cliente_rol, _ = Rol.objects.get_or_create(nombre='Cliente')
-        Usuario.objects.create(user=instance, rol=cliente_rol)
\ No newline at end of file
+        Usuario.objects.create(user=instance, rol=cliente_rol)
+
+
+@receiver(pre_delete, sender=Pedido)
+def descontar_pedido_de_resumenes(sender, instance, **kwargs):
+    """
+    Al borrar un pedido (también en cascada desde Usuario) lo descuenta de los
+    resúmenes de ventas. Se usa pre_delete porque sus líneas aún existen.
+    """
+    actualizar_resumenes(instance, instance.estado, None)
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_save, sender=ProductoImagen)
+@receiver(post_delete, sender=ProductoImagen)
+def invalidar_cache_catalogo(sender, **kwargs):
+    """
+    Cualquier cambio en productos, categorías o imágenes sube la versión del
+    catálogo. Se hace al confirmar la transacción para que nadie vuelva a
+    cachear datos viejos con la versión nueva.
+    """
+    transaction.on_commit(invalidar_catalogo)
+
+
+@receiver(post_save, sender=ProductoImagen)
+@receiver(post_delete, sender=ProductoImagen)
+def actualizar_producto_de_imagen(sender, instance, **kwargs):
+    """
+    La fila del producto en el panel y su página muestran las imágenes adicionales.
+    """
+    tocar_producto(instance.producto_id)
+
+
+@receiver(post_save, sender=Producto)
+def indexar_producto(sender, instance, **kwargs):
+    """
+    Mantiene el índice de búsqueda al día con el producto guardado.
+    """
+    get_backend().indexar([instance])
+
+
+@receiver(post_delete, sender=Producto)
+def desindexar_producto(sender, instance, **kwargs):
+    get_backend().eliminar([instance.pk])
+
+
+@receiver(post_save, sender=Categoria)
+def reindexar_categoria(sender, instance, created, **kwargs):
+    # El nombre de la categoría se indexa con cada producto
+    if not created:
+        get_backend().indexar(instance.productos.only('id'))
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_save, sender=ProductoImagen)
+def generar_derivados_imagen(sender, instance, **kwargs):
+    """
+    Encola la generación de las versiones redimensionadas cuando se sube una
+    imagen nueva; mientras tanto la tienda sirve el original.
+    """
+    if not derivados_al_dia(instance):
+        encolar('generar_derivados', modelo=instance._meta.label, pk=instance.pk, origen=instance.imagen.name)
+
+
+@receiver(post_delete, sender=Producto)
+@receiver(post_delete, sender=ProductoImagen)
+def borrar_archivos_imagen(sender, instance, **kwargs):
+    """
+    Los archivos (original y derivados) se borran en el worker, fuera de la petición.
+    """
+    encolar('eliminar_archivos', nombres=archivos_de(instance))
+
+
+def contar_creado(sender, instance, created, **kwargs):
+    if created:
+        contadores.sumar(contadores.NOMBRES[sender], 1)
+
+
+def descontar_borrado(sender, instance, **kwargs):
+    contadores.sumar(contadores.NOMBRES[sender], -1)
+
+
+# Totales del panel (tienda/contadores.py). Los borrados en cascada también
+# envían post_delete por cada fila.
+for modelo in contadores.CONTADOS.values():
+    post_save.connect(contar_creado, sender=modelo, dispatch_uid=f'contar_{modelo._meta.label}')
+    post_delete.connect(descontar_borrado, sender=modelo, dispatch_uid=f'descontar_{modelo._meta.label}')
+
+
+@receiver(user_logged_in)
+def fusionar_carrito(sender, request, user, **kwargs):
+    """
+    Suma lo que el visitante agregó al carrito antes de iniciar sesión al
+    carrito guardado en su cuenta.
+    """
+    if request is not None and hasattr(user, 'perfil'):
+        fusionar(request.session, user.perfil)
@@ -0,0 +1,280 @@
+# tablas.py
+
+# tablas del panel paginadas en el servidor (pedidos, transacciones, usuarios).
+# Hablan el protocolo de bootstrap-table con sidePagination: 'server' (offset,
+# limit, sort, order, search, filter -> {"total", "rows"}) y además devuelven un
+# cursor para pedir la página siguiente sin OFFSET, que en tablas grandes recorre
+# todas las filas saltadas. Solo se ordena por columnas con índice.
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.formats import date_format
+
+from .exportar import ESTADOS_POL
+from .models import Pedido, Transaccion, Usuario
+from .paginacion import CursorInvalido, codificar_cursor, decodificar_cursor
+
+# Filas por página por defecto y máximo que se acepta en ?limit=
+POR_PAGINA = 25
+MAXIMO_POR_PAGINA = 200
+# Con búsqueda o filtros el total se cuenta hasta este número; más allá se informa
+# como aproximado (contar todas las coincidencias cuesta lo mismo que recorrer la tabla)
+LIMITE_CONTEO = 10_000
+
+
+@dataclass(frozen=True, slots=True)
+class Columna:
+    campo: str
+    # Solo columnas con índice (el de la tabla o el de la tabla unida)
+    ordenable: bool = False
+    # Valores únicos: el orden no necesita desempatar por id
+    unica: bool = False
+    # Valores admitidos en ?filter={"columna": valor}
+    filtro: tuple = ()
+
+
+@dataclass(frozen=True, slots=True)
+class Tabla:
+    queryset: Callable
+    columnas: dict
+    fila: Callable
+    # Campos donde busca ?search= (icontains); un número busca además el id
+    busqueda: tuple = ()
+    orden: str = 'id'
+    descendente: bool = True
+
+
+def _fecha(valor, formato='d/m/Y H:i') -> str:
+    return date_format(timezone.localtime(valor), formato) if valor else ''
+
+
+def _fila_pedido(pedido) -> dict:
+    user = pedido.usuario.user
+    return {
+        'id': pedido.id,
+        'fecha': _fecha(pedido.fecha),
+        'cliente': user.get_full_name() or user.username,
+        'email': user.email,
+        'total': pedido.total,
+        'estado': pedido.estado,
+        'url': reverse('pedido_detalle', args=[pedido.id]),
+    }
+
+
+def _fila_transaccion(transaccion) -> dict:
+    pedido = transaccion.pedido
+    return {
+        'id': transaccion.id,
+        'pedido': pedido.id if pedido else None,
+        'url_pedido': reverse('pedido_detalle', args=[pedido.id]) if pedido else '',
+        'fecha': _fecha(transaccion.fecha),
+        'cliente': pedido.usuario.user.get_full_name() if pedido else '',
+        'valor': transaccion.valor,
+        'moneda': transaccion.moneda,
+        'metodo': transaccion.metodo_pago_nombre,
+        'estado': ESTADOS_POL.get(transaccion.estado_pol, 'Pendiente'),
+        'mensaje': transaccion.mensaje_respuesta,
+        'url': reverse('transaction_detail', args=[transaccion.id]),
+    }
+
+
+def _fila_usuario(usuario) -> dict:
+    user = usuario.user
+    return {
+        'id': usuario.id,
+        'nombre': user.get_full_name() or user.username,
+        'email': user.email,
+        'rol': usuario.rol.nombre,
+        'telefono': usuario.telefono or '-',
+        'registro': _fecha(user.date_joined, 'd/m/Y'),
+        'url_eliminar': reverse('eliminar_usuario', args=[usuario.id]),
+    }
+
+
+TABLAS = {
+    'pedidos': Tabla(
+        queryset=lambda: Pedido.objects.select_related('usuario__user'),
+        columnas={
+            'id': Columna('id', ordenable=True, unica=True),
+            'fecha': Columna('fecha', ordenable=True),
+            'estado': Columna('estado', filtro=tuple(dict(Pedido.ESTADOS))),
+        },
+        fila=_fila_pedido,
+        busqueda=('usuario__user__email', 'usuario__user__username', 'usuario__user__first_name',
+                  'usuario__user__last_name'),
+        orden='fecha',
+    ),
+    'transacciones': Tabla(
+        queryset=lambda: Transaccion.objects.select_related('pedido__usuario__user'),
+        columnas={
+            'id': Columna('id', ordenable=True, unica=True),
+            'fecha': Columna('fecha', ordenable=True),
+            'estado_pol': Columna('estado_pol', filtro=tuple(ESTADOS_POL)),
+        },
+        fila=_fila_transaccion,
+        busqueda=('id_transaccion_payu', 'pedido__usuario__user__email', 'metodo_pago_nombre'),
+        orden='fecha',
+    ),
+    'usuarios': Tabla(
+        queryset=lambda: Usuario.objects.select_related('user', 'rol'),
+        columnas={
+            # El id del perfil sigue el orden de registro; date_joined no tiene índice
+            'id': Columna('id', ordenable=True, unica=True),
+            'nombre': Columna('user__username', ordenable=True, unica=True),
+            'rol': Columna('rol__nombre', filtro=('Administrador', 'Cliente')),
+        },
+        fila=_fila_usuario,
+        busqueda=('user__email', 'user__username', 'user__first_name', 'user__last_name', 'cedula', 'telefono'),
+    ),
+}
+
+
+def estimar_filas(modelo) -> int:
+    """
+    Filas de la tabla sin COUNT(*): en PostgreSQL, la estadística del planificador;
+    en SQLite, el rango de ids (dos búsquedas en el índice de la clave primaria,
+    exacto mientras no se borren filas). En otras bases, COUNT.
+    """
+    tabla = modelo._meta.db_table
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [tabla])
+            fila = cursor.fetchone()
+        # -1: la tabla nunca se analizó
+        if fila and fila[0] >= 0:
+            return fila[0]
+    elif connection.vendor == 'sqlite':
+        nombre, pk = connection.ops.quote_name(tabla), connection.ops.quote_name(modelo._meta.pk.column)
+        # Dos subconsultas: SQLite solo usa el índice para MIN o MAX sueltos
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT (SELECT MIN({pk}) FROM {nombre}), (SELECT MAX({pk}) FROM {nombre})")
+            minimo, maximo = cursor.fetchone()
+        return 0 if maximo is None else maximo - minimo + 1
+    return modelo.objects.count()
+
+
+def contar(queryset, filtrada) -> tuple:
+    """
+    (total, aproximado). Sin filtros se estima; si la estimación es chica o hay
+    filtros se cuenta, pero nunca más allá de LIMITE_CONTEO.
+    """
+    if not filtrada:
+        estimado = estimar_filas(queryset.model)
+        if estimado > LIMITE_CONTEO:
+            return estimado, True
+    total = queryset.order_by()[:LIMITE_CONTEO + 1].count()
+    return min(total, LIMITE_CONTEO), total > LIMITE_CONTEO
+
+
+def _entero(valor, defecto, minimo, maximo) -> int:
+    try:
+        return min(max(int(valor), minimo), maximo)
+    except (TypeError, ValueError):
+        return defecto
+
+
+def _campo_modelo(modelo, ruta):
+    partes = ruta.split('__')
+    for parte in partes[:-1]:
+        modelo = modelo._meta.get_field(parte).related_model
+    return modelo._meta.get_field(partes[-1])
+
+
+def _valor(objeto, ruta):
+    for parte in ruta.split('__'):
+        objeto = getattr(objeto, parte)
+    return objeto
+
+
+def _despues_de(modelo, columna, desc, cursor):
+    """
+    Condición "viene después del cursor" en el orden (campo, id), como en
+    tienda/paginacion.py.
+    """
+    valor, ultimo_id = decodificar_cursor(cursor)
+    op = 'lt' if desc else 'gt'
+    try:
+        valor = _campo_modelo(modelo, columna.campo).to_python(valor)
+    except (ValidationError, TypeError, ValueError):
+        raise CursorInvalido("Cursor no válido")
+    # _cursor_de nunca escribe null (las columnas ordenables no admiten NULL)
+    if valor is None:
+        raise CursorInvalido("Cursor no válido")
+    # Un cursor con solo la fecha ("2025-01-31") se lee como medianoche sin zona
+    if isinstance(valor, datetime) and timezone.is_naive(valor):
+        valor = timezone.make_aware(valor)
+    if columna.unica:
+        return Q(**{f'{columna.campo}__{op}': valor})
+    # El límite inclusivo delante deja al planificador recorrer el índice desde el
+    # cursor; con solo el OR, SQLite lee el índice entero hasta llegar a él
+    return Q(**{f'{columna.campo}__{op}e': valor}) & (
+        Q(**{f'{columna.campo}__{op}': valor}) | Q(**{f'pk__{op}': ultimo_id}))
+
+
+def _cursor_de(objeto, columna) -> str:
+    valor = _valor(objeto, columna.campo)
+    if hasattr(valor, 'isoformat'):
+        valor = valor.isoformat()
+    return codificar_cursor([str(valor) if not isinstance(valor, (int, str)) else valor, objeto.pk])
+
+
+def datos(nombre, parametros) -> dict:
+    """
+    Una página de la tabla `nombre` según los parámetros GET de bootstrap-table.
+    Con ?cursor= (el "siguiente" de la respuesta anterior) se ignora ?offset=.
+    Lanza CursorInvalido si el cursor está dañado.
+    """
+    tabla = TABLAS[nombre]
+    limite = _entero(parametros.get('limit'), POR_PAGINA, 1, MAXIMO_POR_PAGINA)
+    orden = parametros.get('sort')
+    if orden not in tabla.columnas or not tabla.columnas[orden].ordenable:
+        orden = tabla.orden
+    columna = tabla.columnas[orden]
+    desc = parametros.get('order', 'desc' if tabla.descendente else 'asc') != 'asc'
+
+    queryset = tabla.queryset()
+    filtrada = False
+    busqueda = parametros.get('search', '').strip()[:100]
+    if busqueda and tabla.busqueda:
+        condicion = Q()
+        for campo in tabla.busqueda:
+            condicion |= Q(**{f'{campo}__icontains': busqueda})
+        if busqueda.isdigit():
+            condicion |= Q(pk=int(busqueda))
+        queryset = queryset.filter(condicion)
+        filtrada = True
+    try:
+        filtros = json.loads(parametros.get('filter') or '{}')
+    except ValueError:
+        filtros = {}
+    for clave, valor in (filtros.items() if isinstance(filtros, dict) else ()):
+        if clave in tabla.columnas and valor in tabla.columnas[clave].filtro:
+            queryset = queryset.filter(**{tabla.columnas[clave].campo: valor})
+            filtrada = True
+
+    total, aproximado = contar(queryset, filtrada)
+
+    signo = '-' if desc else ''
+    pagina = queryset.order_by(f'{signo}{columna.campo}', *(() if columna.unica else (f'{signo}pk',)))
+    cursor = parametros.get('cursor')
+    if cursor:
+        pagina = pagina.filter(_despues_de(queryset.model, columna, desc, cursor))[:limite + 1]
+    else:
+        offset = _entero(parametros.get('offset'), 0, 0, 10 ** 9)
+        pagina = pagina[offset:offset + limite + 1]
+    filas = list(pagina)
+    siguiente = _cursor_de(filas[limite - 1], columna) if len(filas) > limite else None
+
+    return {
+        'total': total,
+        'total_aproximado': aproximado,
+        'rows': [tabla.fila(objeto) for objeto in filas[:limite]],
+        'siguiente': siguiente,
+    }
@@ -0,0 +1,157 @@
+# tareas.py
+
+# cola de trabajos en la base de datos: los encola la web y los ejecuta `manage.py run_worker`
+import logging
+import os
+import traceback
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Producto, ProductoImagen, Tarea
+
+logger = logging.getLogger(__name__)
+
+# Segundos de espera antes de cada reintento: 30 s, 2 min, 8 min...
+ESPERA_REINTENTO = 30
+# Una tarea "en proceso" más vieja que esto se considera abandonada (el worker murió)
+TIEMPO_MAXIMO = timedelta(minutes=10)
+# Con True las tareas se ejecutan en el momento, sin worker (útil en desarrollo)
+EN_LINEA = getattr(settings, 'TAREAS_EN_LINEA', False)
+
+# tipo -> función que ejecuta la tarea
+TIPOS = {}
+
+
+def tarea(funcion):
+    """
+    Registra `funcion` como tipo de tarea (con su nombre) para poder encolarla.
+    """
+    TIPOS[funcion.__name__] = funcion
+    return funcion
+
+
+def encolar(tipo, max_intentos=3, **argumentos):
+    """
+    Crea la tarea en la misma transacción del llamador: si esta se revierte,
+    la tarea tampoco existe. Los argumentos deben poder guardarse como JSON.
+    """
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de tarea desconocido: {tipo}")
+    if EN_LINEA:
+        transaction.on_commit(lambda: TIPOS[tipo](**argumentos))
+        return None
+    return Tarea.objects.create(tipo=tipo, argumentos=argumentos, max_intentos=max_intentos)
+
+
+def liberar_abandonadas() -> int:
+    """
+    Devuelve a la cola las tareas que quedaron "en proceso" por un worker caído.
+    """
+    return Tarea.objects.filter(
+        estado=Tarea.EN_PROCESO, iniciada__lt=timezone.now() - TIEMPO_MAXIMO,
+    ).update(estado=Tarea.PENDIENTE)
+
+
+def reclamar(cantidad) -> list:
+    """
+    Toma hasta `cantidad` tareas pendientes. Cada una se marca "en proceso" con
+    un UPDATE condicionado al estado, así dos workers nunca toman la misma.
+    """
+    ahora = timezone.now()
+    ids = (
+        Tarea.objects
+        .filter(estado=Tarea.PENDIENTE, ejecutar_despues__lte=ahora)
+        .order_by('ejecutar_despues', 'id')
+        .values_list('id', flat=True)[:cantidad]
+    )
+    reclamadas = [
+        pk for pk in ids
+        if Tarea.objects.filter(pk=pk, estado=Tarea.PENDIENTE).update(estado=Tarea.EN_PROCESO, iniciada=ahora)
+    ]
+    return list(Tarea.objects.filter(pk__in=reclamadas).order_by('id'))
+
+
+def ejecutar(tarea_obj) -> bool:
+    """
+    Ejecuta una tarea ya reclamada y guarda el resultado. Si falla se reintenta
+    con espera exponencial hasta max_intentos; después queda "fallida" con el
+    traceback visible en el admin.
+    """
+    tarea_obj.intentos += 1
+    try:
+        funcion = TIPOS[tarea_obj.tipo]
+        funcion(**tarea_obj.argumentos)
+    except Exception:
+        tarea_obj.error = traceback.format_exc()
+        if tarea_obj.intentos < tarea_obj.max_intentos:
+            tarea_obj.estado = Tarea.PENDIENTE
+            espera = ESPERA_REINTENTO * 4 ** (tarea_obj.intentos - 1)
+            tarea_obj.ejecutar_despues = timezone.now() + timedelta(seconds=espera)
+        else:
+            tarea_obj.estado = Tarea.FALLIDA
+        logger.warning("Tarea %s (%s) falló en el intento %s", tarea_obj.id, tarea_obj.tipo, tarea_obj.intentos)
+    else:
+        tarea_obj.estado = Tarea.COMPLETADA
+        tarea_obj.error = ''
+    tarea_obj.save(update_fields=['estado', 'intentos', 'error', 'ejecutar_despues', 'actualizada'])
+    return tarea_obj.estado == Tarea.COMPLETADA
+
+
+# --- Tipos de tarea ---
+
+@tarea
+def generar_derivados(modelo, pk, origen):
+    """
+    Genera los derivados de la imagen de un Producto o ProductoImagen.
+    Si la imagen cambió mientras la tarea esperaba, no hace nada (ya hay otra encolada).
+    """
+    from .cache_catalogo import invalidar_catalogo, tocar_producto
+    from .imagenes import actualizar_derivados, derivados_al_dia
+
+    instancia = apps.get_model(modelo).objects.filter(pk=pk).first()
+    if instancia is None or instancia.imagen.name != origen or derivados_al_dia(instancia):
+        return
+    actualizar_derivados(instancia)
+    # Las tarjetas y filas del panel cacheadas todavía apuntan a la imagen original
+    tocar_producto(getattr(instancia, 'producto_id', instancia.pk))
+    invalidar_catalogo()
+
+
+@tarea
+def eliminar_archivos(nombres):
+    for nombre in nombres:
+        if nombre:
+            default_storage.delete(nombre)
+
+
+@tarea
+def limpiar_huerfanos(carpeta='productos', horas=24):
+    """
+    Borra los archivos de `carpeta` (y subcarpetas) que ningún producto ni imagen
+    adicional usa. Solo toca archivos con más de `horas` de antigüedad, para no
+    borrar subidas cuyo registro todavía no se ha guardado.
+    """
+    usados = set()
+    for modelo in (Producto, ProductoImagen):
+        for imagen, derivados in modelo.objects.values_list('imagen', 'derivados').iterator():
+            usados.add(imagen)
+            usados.update(d['nombre'] for d in (derivados or {}).values() if isinstance(d, dict))
+
+    limite = timezone.now() - timedelta(hours=horas)
+    pendientes = [carpeta]
+    borrados = 0
+    while pendientes:
+        actual = pendientes.pop()
+        subcarpetas, archivos = default_storage.listdir(actual)
+        pendientes.extend(os.path.join(actual, sub) for sub in subcarpetas)
+        for archivo in archivos:
+            nombre = os.path.join(actual, archivo)
+            if nombre not in usados and default_storage.get_modified_time(nombre) < limite:
+                default_storage.delete(nombre)
+                borrados += 1
+    logger.info("limpiar_huerfanos: %s archivos borrados en %s", borrados, carpeta)
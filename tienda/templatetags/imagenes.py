@@ -0,0 +1,22 @@
+from django import template
+
+from tienda import imagenes
+
+register = template.Library()
+
+
+@register.simple_tag
+def imagen_url(instancia, tamano='tarjeta'):
+    """
+    {% imagen_url producto 'tarjeta' %} -> URL del derivado (o del original si aún no hay).
+    """
+    return imagenes.url_derivado(instancia, tamano)
+
+
+@register.simple_tag
+def srcset(instancia):
+    """
+    {% srcset producto %} -> "…-150w.webp 150w, …-400w.webp 400w, …-1000w.webp 1000w"
+    para el atributo srcset; vacío si la imagen no tiene derivados.
+    """
+    return imagenes.srcset(instancia)
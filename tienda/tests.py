@@ -1,3 +1,638 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import zipfile
+from datetime import timedelta
+from decimal import Decimal
+import tempfile
+import warnings
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from .cache_catalogo import VERSION_KEY, invalidar_catalogo, version_catalogo
+from .consultas import PresupuestoExcedido
+from .inventario import (RESERVA_MINUTOS, StockInsuficiente, disponibles, liberar_vencidas, reservar_stock,
+                         reservas_activas)
+from .management.commands.bench_urls import ids_de_ejemplo, rutas
+from .models import (CarritoProductoPedido, Categoria, EstadoCatalogo, EventoPayU, ItemCarrito, Pedido, Producto,
+                     ReservaStock, Tarea, Transaccion, Usuario, VentaDiaria, VentaProductoDiaria)
+from .pagos import (APLICADO, APROBADO, DUPLICADO, RECHAZADOS, aplicar_evento, procesar_confirmacion,
+                    procesar_pendientes, recibir_evento)
+from .paginacion import CursorInvalido, _despues_de, codificar_cursor
+from .pedidos import PedidoInvalido, crear_pedido_desde_carrito
+from .precios import Cupon, CuponInvalido, Linea, MotorPrecios
+from .sembrado import poblar
+from .urls import PRESUPUESTO_CONSULTAS
+from .utils import build_confirmation_payload
+from .ventas import reconstruir_resumenes
+
+
+class CursorCatalogoTests(SimpleTestCase):
+    """
+    Cursores armados a mano: deben dar CursorInvalido (400 o primera página), nunca un 500.
+    """
+
+    def test_cursores_validos(self):
+        _despues_de('nombre', codificar_cursor(['Casco', 5]))
+        _despues_de('precio', codificar_cursor(['125000.00', 5]))
+        _despues_de('nuevos', codificar_cursor([None, 5]))
+
+    def test_nombre_no_texto(self):
+        # [null, id] es el cursor del orden "nuevos" usado con otro orden
+        for valor in (None, 5, ['a'], {'a': 1}):
+            with self.subTest(valor=valor), self.assertRaises(CursorInvalido):
+                _despues_de('nombre', codificar_cursor([valor, 5]))
+
+    def test_precio_no_finito_o_no_numerico(self):
+        for valor in ('NaN', 'Infinity', '-inf', 'sNaN', 'abc', None, 1.5, True):
+            for orden in ('precio', 'precio_desc'):
+                with self.subTest(valor=valor, orden=orden), self.assertRaises(CursorInvalido):
+                    _despues_de(orden, codificar_cursor([valor, 5]))
+
+    def test_cursor_dañado(self):
+        for cursor in ('zzz', codificar_cursor(['Casco']), codificar_cursor(['Casco', 'x'])):
+            with self.subTest(cursor=cursor), self.assertRaises(CursorInvalido):
+                _despues_de('nombre', cursor)
+
+
+class CursorVistasTests(TestCase):
+
+    def test_api_productos_cursor_invalido(self):
+        for orden, valor in (('nombre', None), ('precio', 'NaN'), ('precio_desc', 'Infinity')):
+            with self.subTest(orden=orden, valor=valor):
+                respuesta = self.client.get(reverse('api_productos'),
+                                            {'orden': orden, 'cursor': codificar_cursor([valor, 5])})
+                self.assertEqual(respuesta.status_code, 400)
+
+    def test_catalogo_cursor_invalido_muestra_primera_pagina(self):
+        for orden, valor in (('nombre', None), ('precio', 'NaN')):
+            with self.subTest(orden=orden, valor=valor):
+                respuesta = self.client.get(reverse('catalogo'),
+                                            {'orden': orden, 'cursor': codificar_cursor([valor, 5])})
+                self.assertEqual(respuesta.status_code, 200)
+
+
+class CursorTablasTests(TestCase):
+    """
+    Cursores de /tablas/<nombre>/ (tienda/tablas.py).
+    """
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+
+    def test_solo_staff(self):
+        self.client.logout()
+        cliente = User.objects.create_user('cliente')
+        for nombre in ('pedidos', 'transacciones', 'usuarios'):
+            with self.subTest(nombre=nombre):
+                self.assertEqual(self.client.get(reverse('tabla_datos', args=[nombre])).status_code, 302)
+                self.client.force_login(cliente)
+                self.assertEqual(self.client.get(reverse('tabla_datos', args=[nombre])).status_code, 302)
+                self.client.logout()
+
+    def test_cursor_null(self):
+        cursor = codificar_cursor([None, 5])
+        for nombre, orden in (('pedidos', 'fecha'), ('transacciones', 'fecha'), ('usuarios', 'nombre'),
+                              ('usuarios', 'id')):
+            with self.subTest(nombre=nombre, orden=orden):
+                respuesta = self.client.get(reverse('tabla_datos', args=[nombre]), {'sort': orden, 'cursor': cursor})
+                self.assertEqual(respuesta.status_code, 400)
+
+    def test_cursor_de_fecha_sin_hora(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', RuntimeWarning)
+            respuesta = self.client.get(reverse('tabla_datos', args=['pedidos']),
+                                        {'cursor': codificar_cursor(['2025-01-31', 5])})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['rows'], [])
+
+
+class EditarProductoImagenTests(TestCase):
+    """
+    La imagen anterior solo se manda a borrar si el producto se guardó.
+    """
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.producto = Producto.objects.create(
+            nombre='Casco', descripcion='Casco', precio=100, stock=1,
+            categoria=Categoria.objects.create(nombre='Cascos'), imagen='productos/viejo.jpg',
+            derivados={'origen': 'productos/viejo.jpg', 'tarjeta': {'nombre': 'productos/derivados/viejo-400w.webp'}},
+        )
+
+    def _imagen(self):
+        salida = io.BytesIO()
+        Image.new('RGB', (20, 20), 'red').save(salida, 'JPEG')
+        return SimpleUploadedFile('nuevo.jpg', salida.getvalue(), content_type='image/jpeg')
+
+    def _tareas_de_borrado(self):
+        return list(Tarea.objects.filter(tipo='eliminar_archivos').values_list('argumentos', flat=True))
+
+    def test_guardado_fallido_no_borra_la_imagen_en_uso(self):
+        respuesta = self.client.post(reverse('editar_producto', args=[self.producto.id]),
+                                     {'precio': 'no es un precio', 'imagen': self._imagen()})
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertEqual(self._tareas_de_borrado(), [])
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.imagen.name, 'productos/viejo.jpg')
+
+    def test_guardado_correcto_borra_la_imagen_anterior(self):
+        self.client.post(reverse('editar_producto', args=[self.producto.id]), {'imagen': self._imagen()})
+        self.assertEqual(self._tareas_de_borrado(),
+                         [{'nombres': ['productos/viejo.jpg', 'productos/derivados/viejo-400w.webp']}])
+
+
+@override_settings(CONSULTAS_ESTRICTO=True, CONSULTAS_MUESTREO=1.0)
+class PresupuestoConsultasTests(TestCase):
+    """
+    Cada vista con presupuesto en tienda/urls.py se pide con y sin sesión; con
+    CONSULTAS_ESTRICTO el middleware lanza PresupuestoExcedido y la prueba falla.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ids = ids_de_ejemplo(poblar(pedidos=60, usuarios=8, productos=30, categorias=4)['usuario_frecuente'])
+        # Las vistas del panel (las exportaciones) piden un usuario del staff
+        cls.user = Usuario.objects.select_related('user').get(id=cls.ids['usuario']).user
+        cls.user.is_staff = True
+        cls.user.save(update_fields=['is_staff'])
+        cls.producto = Producto.objects.filter(stock__gte=10).values_list('id', flat=True).first()
+
+    def _pedir(self, cliente, visitadas):
+        for nombre, ruta in rutas(self.ids).values():
+            if nombre not in PRESUPUESTO_CONSULTAS:
+                continue
+            with self.subTest(ruta=ruta):
+                respuesta = cliente.get(ruta)
+                if respuesta.streaming:
+                    b''.join(respuesta.streaming_content)
+                visitadas.add(nombre)
+        for nombre in ('api_carrito_agregar', 'api_carrito_actualizar', 'api_carrito_quitar', 'api_carrito_agregar'):
+            with self.subTest(ruta=nombre):
+                respuesta = cliente.post(reverse(nombre), json.dumps({'producto_id': self.producto, 'cantidad': 2}),
+                                         content_type='application/json')
+                self.assertEqual(respuesta.status_code, 200)
+                visitadas.add(nombre)
+
+    def test_presupuestos(self):
+        visitadas = set()
+        self._pedir(self.client, visitadas)
+
+        self.client.force_login(self.user)
+        self._pedir(self.client, visitadas)
+        respuesta = self.client.post(reverse('crear_pedido'), '{}', content_type='application/json')
+        self.assertTrue(respuesta.json()['success'])
+        visitadas.add('crear_pedido')
+
+        self.assertEqual(set(PRESUPUESTO_CONSULTAS) - visitadas, set())
+
+    def test_cambio_de_estado_de_pedido_grande(self):
+        # Entrar o salir de los estados pagados ajusta el resumen de cada producto
+        self.client.force_login(self.user)
+        pedido = Pedido.objects.create(usuario_id=self.ids['usuario'], total=20 * 1000, estado='Pendiente')
+        CarritoProductoPedido.objects.bulk_create([
+            CarritoProductoPedido(pedido=pedido, producto_id=pk, cantidad=1, total=1000)
+            for pk in Producto.objects.values_list('id', flat=True)[:20]
+        ])
+        for estado in ('Procesando', 'Cancelado', 'Entregado', 'Pendiente', 'Entregado'):
+            with self.subTest(estado=estado):
+                respuesta = self.client.post(reverse('pedido_detalle', args=[pedido.id]), {'estado': estado})
+                self.assertEqual(respuesta.status_code, 302)
+        pedido.refresh_from_db()
+        self.assertEqual(pedido.estado, 'Entregado')
+        # Lo acumulado coincide con recalcular desde cero
+        resumen = lambda: sorted(VentaProductoDiaria.objects.values_list('fecha', 'producto_id', 'unidades', 'ingresos'))
+        acumulado = [fila for fila in resumen() if fila[2] or fila[3]]
+        reconstruir_resumenes()
+        self.assertEqual(acumulado, resumen())
+
+    def test_exceso_hace_fallar(self):
+        with self.assertRaises(PresupuestoExcedido):
+            PRESUPUESTO_CONSULTAS['index'], anterior = 0, PRESUPUESTO_CONSULTAS['index']
+            try:
+                self.client.get(reverse('index'))
+            finally:
+                PRESUPUESTO_CONSULTAS['index'] = anterior
+
+
+class ExportacionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cliente = User.objects.create_user('cliente', first_name='=HYPERLINK("http://x")', last_name='+1',
+                                           email='c@x.co')
+        Usuario.objects.filter(user=cliente).update(ciudad='@SUM(A1)', departamento='-2+3')
+        pedido = Pedido.objects.create(usuario=cliente.perfil, total=1000, estado='Pendiente')
+        Transaccion.objects.create(pedido=pedido, id_transaccion_payu='t1', estado_pol='4', valor=1000, moneda='COP',
+                                   mensaje_respuesta='=1+1', metodo_pago_nombre='\tVISA')
+        cls.staff = User.objects.create_user('staff', is_staff=True)
+
+    def test_solo_staff(self):
+        for nombre in ('exportar_pedidos', 'exportar_transacciones', 'exportar_ventas'):
+            with self.subTest(nombre=nombre):
+                self.assertEqual(self.client.get(reverse(nombre)).status_code, 302)
+                self.client.force_login(User.objects.get(username='cliente'))
+                self.assertEqual(self.client.get(reverse(nombre)).status_code, 302)
+                self.client.logout()
+
+    def _csv(self, nombre):
+        self.client.force_login(self.staff)
+        respuesta = self.client.get(reverse(nombre))
+        self.assertEqual(respuesta.status_code, 200)
+        texto = b''.join(respuesta.streaming_content).decode('utf-8-sig')
+        return list(csv.DictReader(io.StringIO(texto)))
+
+    def test_ventas(self):
+        self.client.force_login(self.staff)
+        respuesta = self.client.get(reverse('exportar_ventas'))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('text/csv', respuesta['Content-Type'])
+
+    def test_csv_sin_formulas(self):
+        pedido, = self._csv('exportar_pedidos')
+        self.assertEqual(pedido['Nombre'], '\'=HYPERLINK("http://x")')
+        self.assertEqual(pedido['Apellido'], "'+1")
+        self.assertEqual(pedido['Ciudad'], "'@SUM(A1)")
+        self.assertEqual(pedido['Departamento'], "'-2+3")
+        transaccion, = self._csv('exportar_transacciones')
+        self.assertEqual(transaccion['Mensaje'], "'=1+1")
+        self.assertEqual(transaccion['Método de pago'], "'\tVISA")
+        self.assertEqual(transaccion['Valor'], '1000.00')
+
+    def test_xlsx_sin_formulas(self):
+        self.client.force_login(self.staff)
+        respuesta = self.client.get(reverse('exportar_pedidos'), {'formato': 'xlsx'})
+        with zipfile.ZipFile(io.BytesIO(b''.join(respuesta.streaming_content))) as libro:
+            hoja = libro.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertIn("<t>'=HYPERLINK", hoja)
+        self.assertNotIn('<t>=', hoja)
+
+
+class CuponTests(SimpleTestCase):
+
+    def setUp(self):
+        self.motor = MotorPrecios([Cupon('MOTO7', porcentaje=7), Cupon('FIJO', monto=1001)])
+
+    def _lineas(self):
+        return [Linea(1, 1, Decimal('333'), 1), Linea(2, 1, Decimal('12345'), 3), Linea(3, 2, Decimal('99'), 7)]
+
+    def test_codigo_que_no_es_texto(self):
+        for codigo in (5, 1.5, ['MOTO7'], {'codigo': 'MOTO7'}, True):
+            with self.subTest(codigo=codigo), self.assertRaises(CuponInvalido):
+                self.motor.cotizar(self._lineas(), cupon=codigo)
+
+    def test_descuento_repartido_en_las_lineas(self):
+        for codigo in ('MOTO7', 'FIJO'):
+            with self.subTest(codigo=codigo):
+                cotizacion = self.motor.cotizar(self._lineas(), cupon=codigo)
+                self.assertTrue(cotizacion.cupon)
+                self.assertEqual(sum(linea.total for linea in cotizacion.lineas), cotizacion.total)
+                self.assertEqual(sum(linea.descuento for linea in cotizacion.lineas), cotizacion.descuento)
+                for linea in cotizacion.lineas:
+                    self.assertEqual(linea.total, linea.total.to_integral_value())
+                    self.assertGreaterEqual(linea.total, 0)
+
+
+class CrearPedidoCuponTests(TestCase):
+
+    def test_cupon_numerico_es_400(self):
+        user = User.objects.create_user('comprador')
+        producto = Producto.objects.create(nombre='Casco', descripcion='Casco', precio=100, stock=5,
+                                           categoria=Categoria.objects.create(nombre='Cascos'), imagen='productos/c.jpg')
+        self.client.force_login(user)
+        respuesta = self.client.post(reverse('crear_pedido'),
+                                     json.dumps({'carrito': [{'id': producto.id, 'quantity': 1}], 'cupon': 5}),
+                                     content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(Pedido.objects.exists())
+
+
+
+class PedidoPendienteMixin:
+    """
+    Un cliente con un pedido Pendiente de dos unidades de un producto con
+    stock 10, creado como en crear_pedido (con su reserva).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('comprador')
+        cls.producto = Producto.objects.create(nombre='Casco', descripcion='Casco', precio=100, stock=10,
+                                               categoria=Categoria.objects.create(nombre='Cascos'),
+                                               imagen='productos/c.jpg')
+
+    def setUp(self):
+        self.pedido = crear_pedido_desde_carrito(self.user.perfil, [{'id': self.producto.id, 'quantity': 2}])
+
+    def stock(self):
+        return Producto.objects.values_list('stock', flat=True).get(pk=self.producto.pk)
+
+    def disponible(self):
+        return disponibles([self.producto.pk])[self.producto.pk]
+
+
+class PagosTests(PedidoPendienteMixin, TestCase):
+    """
+    Confirmaciones de PayU repetidas o reenviadas no descuentan el stock ni
+    suman los ingresos dos veces; un rechazo cancela el pedido y suelta la reserva.
+    """
+
+    def confirmacion(self, state_pol, transaction_id='tx-1'):
+        return build_confirmation_payload(settings.PAYU_API_KEY, settings.PAYU_MERCHANT_ID, f"MOTO-{self.pedido.id}",
+                                          '200.00', 'COP', state_pol, transaction_id)
+
+    def ingresos(self):
+        return VentaDiaria.objects.aggregate(total=Sum('ingresos'))['total'] or 0
+
+    def test_confirmacion_repetida(self):
+        datos = self.confirmacion(APROBADO)
+        self.assertEqual(procesar_confirmacion(datos), APLICADO)
+        self.assertEqual(procesar_confirmacion(dict(datos)), DUPLICADO)
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.estado, 'Procesando')
+        self.assertEqual(self.stock(), 8)
+        self.assertEqual(self.ingresos(), 200)
+        self.assertEqual(EventoPayU.objects.count(), 1)
+        self.assertEqual(Transaccion.objects.count(), 1)
+
+    def test_reenvio_por_el_webhook(self):
+        datos = self.confirmacion(APROBADO)
+        for _ in range(2):
+            respuesta = self.client.post(reverse('payu_confirmation'), datos)
+            self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(self.stock(), 8)
+        self.assertEqual(self.ingresos(), 200)
+
+    def test_reaplicar_a_la_fuerza(self):
+        procesar_confirmacion(self.confirmacion(APROBADO))
+        # reprocesar_payu: el cambio de estado condicionado impide un segundo descuento
+        self.assertTrue(aplicar_evento(EventoPayU.objects.get(), forzar=True))
+        self.assertEqual(self.stock(), 8)
+        self.assertEqual(self.ingresos(), 200)
+
+    def test_otra_transaccion_aprobada_del_mismo_pedido(self):
+        procesar_confirmacion(self.confirmacion(APROBADO))
+        self.assertEqual(procesar_confirmacion(self.confirmacion(APROBADO, 'tx-2')), APLICADO)
+        self.assertEqual(self.stock(), 8)
+        self.assertEqual(self.ingresos(), 200)
+
+    def test_diferido_repetido(self):
+        datos = self.confirmacion(APROBADO)
+        recibir_evento(datos)
+        recibir_evento(dict(datos))
+        self.assertEqual(procesar_pendientes(), (1, 0))
+        self.assertEqual(procesar_pendientes(), (0, 0))
+        self.assertEqual(self.stock(), 8)
+        self.assertEqual(self.ingresos(), 200)
+
+    def test_rechazo_cancela_y_libera(self):
+        self.assertEqual(self.disponible(), 8)
+        self.assertEqual(procesar_confirmacion(self.confirmacion(RECHAZADOS[1])), APLICADO)
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.estado, 'Cancelado')
+        self.assertEqual(self.stock(), 10)
+        self.assertEqual(self.disponible(), 10)
+        self.assertFalse(ReservaStock.objects.filter(pedido=self.pedido, activa=True).exists())
+        self.assertEqual(self.ingresos(), 0)
+
+    def test_aprobado_despues_de_rechazo(self):
+        procesar_confirmacion(self.confirmacion(RECHAZADOS[1]))
+        procesar_confirmacion(self.confirmacion(APROBADO, 'tx-2'))
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.estado, 'Cancelado')
+        self.assertEqual(self.stock(), 10)
+        self.assertEqual(self.ingresos(), 0)
+
+
+class ReservasTests(PedidoPendienteMixin, TestCase):
+    """
+    Reservas de stock: se crean con el pedido, se liberan con la respuesta de
+    PayU y dejan de contar al vencer RESERVA_MINUTOS.
+    """
+
+    def confirmar(self, state_pol):
+        procesar_confirmacion(build_confirmation_payload(
+            settings.PAYU_API_KEY, settings.PAYU_MERCHANT_ID, f"MOTO-{self.pedido.id}", '200.00', 'COP', state_pol, 'tx-1'))
+
+    def test_crear_pedido_reserva(self):
+        reserva = ReservaStock.objects.get(pedido=self.pedido)
+        self.assertEqual((reserva.producto_id, reserva.cantidad, reserva.activa), (self.producto.id, 2, True))
+        esperada = timezone.now() + timedelta(minutes=RESERVA_MINUTOS)
+        self.assertAlmostEqual(reserva.expira, esperada, delta=timedelta(seconds=30))
+        # Se aparta sin descontar
+        self.assertEqual(self.stock(), 10)
+        self.assertEqual(self.disponible(), 8)
+
+    def test_no_reserva_lo_apartado(self):
+        with self.assertRaises(StockInsuficiente) as error:
+            reservar_stock(self.pedido, {self.producto.id: 9})
+        self.assertEqual(error.exception.faltantes, {self.producto.id: 8})
+        with self.assertRaises(PedidoInvalido) as error:
+            crear_pedido_desde_carrito(self.user.perfil, [{'id': self.producto.id, 'quantity': 9}])
+        self.assertTrue(error.exception.solo_stock)
+        self.assertEqual(ReservaStock.objects.count(), 1)
+
+    def test_pago_aprobado_libera(self):
+        self.confirmar(APROBADO)
+        self.assertFalse(reservas_activas().exists())
+        # Las unidades ya salieron del stock: no se cuentan dos veces
+        self.assertEqual(self.stock(), 8)
+        self.assertEqual(self.disponible(), 8)
+
+    def test_pago_rechazado_libera(self):
+        self.confirmar(RECHAZADOS[0])
+        self.assertFalse(reservas_activas().exists())
+        self.assertEqual(self.stock(), 10)
+        self.assertEqual(self.disponible(), 10)
+
+    def test_vencimiento(self):
+        ReservaStock.objects.update(expira=timezone.now() - timedelta(seconds=1))
+        # Vencida ya no cuenta, aunque siga marcada activa hasta la limpieza
+        self.assertEqual(self.disponible(), 10)
+        self.assertTrue(ReservaStock.objects.get().activa)
+        salida = io.StringIO()
+        call_command('liberar_reservas', stdout=salida)
+        self.assertIn('1 reservas vencidas liberadas', salida.getvalue())
+        self.assertFalse(ReservaStock.objects.get().activa)
+        self.assertEqual(liberar_vencidas(), 0)
+
+    def test_vigente_no_se_libera(self):
+        ReservaStock.objects.update(expira=timezone.now() + timedelta(seconds=30))
+        self.assertEqual(liberar_vencidas(), 0)
+        self.assertEqual(self.disponible(), 8)
+
+
+class FusionarCarritoTests(TestCase):
+    """
+    Al iniciar sesión, el carrito anónimo de la sesión se suma al guardado en la cuenta.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cliente', password='clave-segura-123')
+        categoria = Categoria.objects.create(nombre='Cascos')
+        cls.a, cls.b, cls.c, cls.d = (
+            Producto.objects.create(nombre=nombre, descripcion=nombre, precio=100, stock=stock, categoria=categoria,
+                                    imagen='productos/c.jpg')
+            for nombre, stock in (('A', 10), ('B', 10), ('C', 10), ('D', 3))
+        )
+        ItemCarrito.objects.bulk_create([
+            ItemCarrito(usuario=cls.user.perfil, producto=cls.a, cantidad=3),
+            ItemCarrito(usuario=cls.user.perfil, producto=cls.c, cantidad=4),
+            ItemCarrito(usuario=cls.user.perfil, producto=cls.d, cantidad=2),
+        ])
+
+    def agregar(self, producto, cantidad):
+        respuesta = self.client.post(reverse('api_carrito_agregar'),
+                                     json.dumps({'producto_id': producto.id, 'cantidad': cantidad}),
+                                     content_type='application/json')
+        self.assertEqual(respuesta.status_code, 200)
+
+    def cantidades(self):
+        return {linea['producto_id']: linea['cantidad'] for linea in self.client.get(reverse('api_carrito')).json()['lineas']}
+
+    def test_fusion_al_iniciar_sesion(self):
+        self.agregar(self.a, 2)
+        self.agregar(self.b, 1)
+        self.agregar(self.d, 2)
+        self.assertEqual(self.cantidades(), {self.a.id: 2, self.b.id: 1, self.d.id: 2})
+
+        self.assertTrue(self.client.login(username='cliente', password='clave-segura-123'))
+        # Se suman los repetidos; D se recorta a su stock
+        esperado = {self.a.id: 5, self.b.id: 1, self.c.id: 4, self.d.id: 3}
+        self.assertEqual(self.cantidades(), esperado)
+        self.assertEqual(dict(ItemCarrito.objects.values_list('producto_id', 'cantidad')), esperado)
+
+        # El carrito de la sesión se vació: volver a entrar no suma otra vez
+        self.client.logout()
+        self.assertEqual(self.cantidades(), {})
+        self.client.login(username='cliente', password='clave-segura-123')
+        self.assertEqual(self.cantidades(), esperado)
+
+    def test_sin_carrito_anonimo(self):
+        self.client.login(username='cliente', password='clave-segura-123')
+        self.assertEqual(self.cantidades(), {self.a.id: 3, self.c.id: 4, self.d.id: 2})
+
+
+class CondicionalTests(TestCase):
+    """
+    GET condicional de las páginas públicas (tienda/condicional.py): 304 si el
+    navegador ya tiene la versión actual, y un ETag nuevo cuando algo cambia.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.producto = Producto.objects.create(nombre='Casco', descripcion='Casco', precio=100, stock=10,
+                                               categoria=Categoria.objects.create(nombre='Cascos'),
+                                               imagen='productos/logo.png')
+        invalidar_catalogo()
+
+    def setUp(self):
+        self.detalle = reverse('producto_detalle', args=[self.producto.id])
+
+    def test_etag_coincide(self):
+        for ruta in (reverse('index'), self.detalle):
+            with self.subTest(ruta=ruta):
+                respuesta = self.client.get(ruta)
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertIn('public', respuesta['Cache-Control'])
+                repetida = self.client.get(ruta, HTTP_IF_NONE_MATCH=respuesta['ETag'])
+                self.assertEqual(repetida.status_code, 304)
+                self.assertEqual(repetida['ETag'], respuesta['ETag'])
+                self.assertEqual(self.client.get(ruta, HTTP_IF_NONE_MATCH='"otro"').status_code, 200)
+
+    def test_fecha_coincide(self):
+        for ruta in (reverse('index'), self.detalle):
+            with self.subTest(ruta=ruta):
+                modificada = self.client.get(ruta)['Last-Modified']
+                self.assertEqual(self.client.get(ruta, HTTP_IF_MODIFIED_SINCE=modificada).status_code, 304)
+                self.assertEqual(self.client.get(ruta, HTTP_IF_MODIFIED_SINCE='Mon, 01 Jan 2001 00:00:00 GMT').status_code, 200)
+
+    def test_cambio_de_producto_da_etag_nuevo(self):
+        etags = {ruta: self.client.get(ruta)['ETag'] for ruta in (reverse('index'), self.detalle)}
+        self.producto.precio = 120
+        with self.captureOnCommitCallbacks(execute=True):
+            self.producto.save()
+        for ruta, etag in etags.items():
+            with self.subTest(ruta=ruta):
+                respuesta = self.client.get(ruta, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertNotEqual(respuesta['ETag'], etag)
+
+    def test_reserva_da_etag_nuevo_al_detalle(self):
+        # El disponible cambia sin tocar el producto
+        etag = self.client.get(self.detalle)['ETag']
+        crear_pedido_desde_carrito(User.objects.create_user('comprador').perfil, [{'id': self.producto.id, 'quantity': 1}])
+        self.assertEqual(self.client.get(self.detalle, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_con_sesion_no_hay_304(self):
+        self.client.force_login(User.objects.create_user('cliente'))
+        respuesta = self.client.get(self.detalle)
+        self.assertFalse(respuesta.has_header('ETag'))
+        self.assertIn('private', respuesta['Cache-Control'])
+
+class ExplicarConsultasTests(SimpleTestCase):
+    """
+    Humo de `manage.py explicar_consultas` a escala mínima. Corre en otro proceso:
+    el comando cambia la conexión a una base temporal propia.
+    """
+
+    def test_mide_antes_y_despues(self):
+        with tempfile.TemporaryDirectory() as carpeta:
+            informe = os.path.join(carpeta, 'informe.json')
+            resultado = subprocess.run(
+                [sys.executable, 'manage.py', 'explicar_consultas', '--pedidos', '200', '--usuarios', '20',
+                 '--productos', '30', '--repeticiones', '1', '--json', informe],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=300,
+                env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'motolux.settings'})
+            self.assertEqual(resultado.returncode, 0, resultado.stderr)
+            with open(informe) as f:
+                datos = json.load(f)
+        self.assertEqual(datos['antes'].keys(), datos['despues'].keys())
+        # Sin 0019 el listado de pedidos recorre la tabla; con 0019 usa el índice de fecha
+        self.assertNotIn('pedido_fecha_idx', datos['antes']['pedidos (50 primeros)']['plan'])
+        self.assertIn('pedido_fecha_idx', datos['despues']['pedidos (50 primeros)']['plan'])
+
+
+class VersionCatalogoTests(TestCase):
+    """
+    La versión sale de EstadoCatalogo: un cambio hecho en otro proceso (el worker,
+    con su propia caché LocMem) se ve aquí cuando vence la versión cacheada.
+    """
+
+    def setUp(self):
+        # La caché no se revierte entre tests como la base
+        cache.delete(VERSION_KEY)
+
+    def test_cambio_en_otro_proceso(self):
+        invalidar_catalogo()
+        version = version_catalogo()
+        # Lo que hace invalidar_catalogo() en el worker: su caché no es la nuestra
+        EstadoCatalogo.objects.filter(pk=1).update(actualizado=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(version_catalogo(), version)
+        cache.delete(VERSION_KEY)  # vence CATALOGO_VERSION_SEGUNDOS
+        self.assertGreater(version_catalogo(), version)
+
+    def test_invalidar_sube_la_version(self):
+        version = version_catalogo()
+        invalidar_catalogo()
+        self.assertGreater(version_catalogo(), version)
+        cache.delete(VERSION_KEY)
+        self.assertEqual(version_catalogo(), version_catalogo())
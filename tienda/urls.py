@@ -1,26 +1,31 @@
 from django.urls import path, include
-from . import views
+from . import views, views_async
 from django.conf import settings
 from django.conf.urls.static import static
 
+# Con ASGI las vistas más leídas y el webhook de PayU usan sus versiones async
+vistas = views_async if getattr(settings, 'VISTAS_ASYNC', False) else views
+
 urlpatterns = [
     #payU
     path("payu/checkout/<int:pedido_id>/", views.payu_checkout, name="payu_checkout"),
     path("payu/response/", views.payu_response, name="payu_response"),
-    path("payu/confirmation/", views.payu_confirmation, name="payu_confirmation"),
+    path("payu/confirmation/", vistas.payu_confirmation, name="payu_confirmation"),
 
 
     
     
     #index
-    path('', views.index, name='index'),
+    path('', vistas.index, name='index'),
     # productos por categoria
-    path('productos/categoria/<int:categoria_id>/', views.productos_por_categoria, name='productos_por_categoria'),
+    path('productos/categoria/<int:categoria_id>/', vistas.productos_por_categoria, name='productos_por_categoria'),
     #detalle producto
-    path('producto/<int:producto_id>/', views.producto_detalle, name='producto_detalle'),
+    path('producto/<int:producto_id>/', vistas.producto_detalle, name='producto_detalle'),
     
     #catalogo
-    path('catalogo/', views.catalogo, name='catalogo'),
+    path('catalogo/', vistas.catalogo, name='catalogo'),
+    path('api/productos/', views.api_productos, name='api_productos'),
+    path('api/autocomplete/', views.api_autocompletar, name='api_autocompletar'),
     
     #google login
     path('accounts/', include('allauth.urls')),
@@ -31,6 +36,10 @@ urlpatterns = [
     
     #Carrito
     path('detalles-de-facturacion/', views.detalles_facturacion, name='detalles_facturacion'),
+    path('api/carrito/', views.api_carrito, name='api_carrito'),
+    path('api/carrito/agregar/', views.api_carrito_agregar, name='api_carrito_agregar'),
+    path('api/carrito/actualizar/', views.api_carrito_actualizar, name='api_carrito_actualizar'),
+    path('api/carrito/quitar/', views.api_carrito_quitar, name='api_carrito_quitar'),
     
     
 
@@ -39,6 +48,7 @@ urlpatterns = [
     
     # Admin
     path('index-admin/', views.index_admin, name='index_admin'),
+    path('index-admin/exportar-ventas/', views.exportar_ventas, name='exportar_ventas'),
     path('base-admin/', views.base_admin, name='base_admin'),
     # Productos admin
     path('productos/', views.productos, name='productos'),
@@ -65,6 +75,7 @@ urlpatterns = [
     #pedidos
     
     path('pedidos/', views.pedidos, name='pedidos'),
+    path('pedidos/exportar/', views.exportar_pedidos, name='exportar_pedidos'),
     
     path('pedidos/<int:pedido_id>/', views.pedido_detalle, name='pedido_detalle'),
     path ('transaccion/<int:transaction_id>/', views.transaction_detail, name='transaction_detail'),
@@ -75,6 +86,9 @@ urlpatterns = [
     #plantilla
     path('tablas-bootstrap-tables/', views.tablas_bootstrap, name='tablas_bootstrap'),
     path('transactions/', views.transactions, name='transactions'),
+    path('transactions/exportar/', views.exportar_transacciones, name='exportar_transacciones'),
+    # Datos de las tablas del panel (pedidos, transacciones, usuarios)
+    path('tablas/<slug:nombre>/', views.tabla_datos, name='tabla_datos'),
     
    
     
@@ -85,4 +99,44 @@ urlpatterns = [
     
    
     
-]+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+]+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+
+
+# Máximo de consultas SQL por petición de cada vista, incluidas las de sesión y
+# autenticación (ver tienda/consultas.py). Las vistas que no están no tienen límite,
+# pero igual se avisa si repiten un SELECT.
+PRESUPUESTO_CONSULTAS = {
+    # Tienda (con sesión iniciada suman sesión, usuario, perfil y rol)
+    'index': 5,
+    'productos_por_categoria': 5,
+    'catalogo': 5,
+    'producto_detalle': 8,
+    'api_productos': 5,
+    'api_autocompletar': 3,
+    'perfil': 7,
+    'detalles_facturacion': 5,
+    'api_carrito': 5,
+    'api_carrito_agregar': 8,
+    'api_carrito_actualizar': 8,
+    'api_carrito_quitar': 8,
+    'crear_pedido': 20,
+    'payu_checkout': 8,
+    # Panel. `productos` carga en lotes de ~1000 los productos cuyas filas no
+    # están en caché: el límite cubre un catálogo de 5.000 con la caché vacía.
+    'index_admin': 10,
+    'productos': 16,
+    'categorias': 4,
+    'usuarios': 3,
+    'pedidos': 3,
+    # El POST que cambia el estado ajusta los resúmenes de ventas con un número
+    # fijo de consultas (un solo UPDATE para todas las líneas), contando el
+    # inicio y el fin de la transacción
+    'pedido_detalle': 9,
+    'transactions': 3,
+    # Estimación o conteo acotado del total y la página
+    'tabla_datos': 5,
+    'transaction_detail': 4,
+    # La consulta de las filas corre mientras se envía la respuesta (fuera de la medición)
+    'exportar_pedidos': 3,
+    'exportar_transacciones': 3,
+}
@@ -42,3 +42,23 @@ def generate_confirmation_signature(api_key: str, merchant_id: str, reference_sa
     new_value = format_confirmation_value(value) # Usamos la función de formato
     base_string = f"{api_key}~{merchant_id}~{reference_sale}~{new_value}~{currency}~{state_pol}"
     return hashlib.md5(base_string.encode("utf-8")).hexdigest()
+
+
+def build_confirmation_payload(api_key: str, merchant_id: str, reference_sale: str, value: str, currency: str, state_pol: str, transaction_id: str, **extra) -> dict:
+    """
+    Arma un POST de confirmación firmado como lo envía PayU (para pruebas y
+    pruebas de carga).
+    """
+    payload = {
+        'merchant_id': merchant_id,
+        'reference_sale': reference_sale,
+        'value': value,
+        'currency': currency,
+        'state_pol': state_pol,
+        'transaction_id': transaction_id,
+        'response_message_pol': 'APPROVED' if state_pol == '4' else 'DECLINED',
+        'payment_method_name': 'VISA',
+        **extra,
+    }
+    payload['sign'] = generate_confirmation_signature(api_key, merchant_id, reference_sale, value, currency, state_pol)
+    return payload
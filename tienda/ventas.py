@@ -0,0 +1,159 @@
+# ventas.py
+
+# mantenimiento incremental de los resúmenes VentaDiaria / VentaProductoDiaria
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Pedido, CarritoProductoPedido, VentaDiaria, VentaProductoDiaria
+from .reportes import ESTADOS_PAGADOS
+
+# Estado del pedido -> columna de conteo en VentaDiaria
+CAMPOS_ESTADO = {
+    'Pendiente': 'pendientes',
+    'Procesando': 'procesando',
+    'Entregado': 'entregados',
+    'Cancelado': 'cancelados',
+}
+
+
+def dia_pedido(pedido) -> date:
+    """
+    Día (en la zona horaria local) al que se asigna el pedido en los resúmenes.
+    """
+    return timezone.localtime(pedido.fecha).date()
+
+
+def _sumar_dia(dia, **deltas):
+    VentaDiaria.objects.bulk_create([VentaDiaria(fecha=dia)], ignore_conflicts=True)
+    VentaDiaria.objects.filter(fecha=dia).update(**{campo: F(campo) + delta for campo, delta in deltas.items()})
+
+
+def _por_producto(lineas, campo, signo, output_field):
+    # CASE producto_id WHEN 1 THEN 2 WHEN 5 THEN -1 ... END, como inventario._por_producto
+    return Case(*[When(producto_id=linea['producto_id'], then=Value(signo * (linea[campo] or 0)))
+                  for linea in lineas], output_field=output_field)
+
+
+def _sumar_productos(pedido, dia, signo):
+    lineas = (
+        CarritoProductoPedido.objects
+        .filter(pedido=pedido)
+        .values('producto_id')
+        .annotate(unidades=Sum('cantidad'), ingresos=Sum('total'))
+    )
+    lineas = list(lineas)
+    if not lineas:
+        return
+    VentaProductoDiaria.objects.bulk_create(
+        [VentaProductoDiaria(fecha=dia, producto_id=linea['producto_id']) for linea in lineas],
+        ignore_conflicts=True,
+    )
+    # Un solo UPDATE para todas las líneas, sea cual sea el tamaño del pedido
+    VentaProductoDiaria.objects.filter(fecha=dia, producto_id__in=[linea['producto_id'] for linea in lineas]).update(
+        unidades=F('unidades') + _por_producto(lineas, 'unidades', signo, IntegerField()),
+        ingresos=F('ingresos') + _por_producto(lineas, 'ingresos', signo, VentaProductoDiaria._meta.get_field('ingresos')),
+    )
+
+
+def actualizar_resumenes(pedido, estado_anterior, estado_nuevo):
+    """
+    Aplica a los resúmenes el paso de `estado_anterior` a `estado_nuevo`.
+
+    `estado_anterior=None` registra un pedido nuevo y `estado_nuevo=None` lo
+    descuenta (pedido eliminado). Los ingresos y las unidades por producto solo
+    cambian cuando el pedido entra o sale de ESTADOS_PAGADOS.
+    """
+    if estado_anterior == estado_nuevo:
+        return
+
+    dia = dia_pedido(pedido)
+    deltas = {}
+    if estado_anterior in CAMPOS_ESTADO:
+        deltas[CAMPOS_ESTADO[estado_anterior]] = -1
+    if estado_nuevo in CAMPOS_ESTADO:
+        deltas[CAMPOS_ESTADO[estado_nuevo]] = 1
+
+    pagado_antes = estado_anterior in ESTADOS_PAGADOS
+    pagado_ahora = estado_nuevo in ESTADOS_PAGADOS
+    signo = 0
+    if pagado_ahora and not pagado_antes:
+        signo = 1
+    elif pagado_antes and not pagado_ahora:
+        signo = -1
+    if signo:
+        deltas['ingresos'] = signo * (pedido.total or 0)
+
+    # Sin savepoint: dentro de cambiar_estado_pedido ya hay una transacción
+    with transaction.atomic(savepoint=False):
+        if deltas:
+            _sumar_dia(dia, **deltas)
+        if signo:
+            _sumar_productos(pedido, dia, signo)
+
+
+def cambiar_estado_pedido(pedido, nuevo_estado, desde=None) -> bool:
+    """
+    Cambia el estado del pedido y actualiza los resúmenes en la misma transacción.
+    Con `desde` el cambio solo se hace si el pedido sigue en ese estado en la base
+    de datos (UPDATE condicionado): si dos confirmaciones llegan a la vez, solo una
+    gana. Devuelve False si el pedido ya no estaba en `desde`.
+    """
+    with transaction.atomic():
+        if desde is None:
+            estado_anterior = pedido.estado
+            pedido.estado = nuevo_estado
+            pedido.save(update_fields=['estado'])
+        else:
+            if not Pedido.objects.filter(pk=pedido.pk, estado=desde).update(estado=nuevo_estado):
+                return False
+            estado_anterior = desde
+            pedido.estado = nuevo_estado
+        actualizar_resumenes(pedido, estado_anterior, nuevo_estado)
+    return True
+
+
+@transaction.atomic
+def reconstruir_resumenes():
+    """
+    Borra y recalcula todos los resúmenes a partir de Pedido y CarritoProductoPedido.
+    Devuelve (días, filas de producto) creados.
+    """
+    VentaDiaria.objects.all().delete()
+    VentaProductoDiaria.objects.all().delete()
+
+    tz = timezone.get_current_timezone()
+    dias = {}
+    filas = (
+        Pedido.objects
+        .annotate(dia=TruncDate('fecha', tzinfo=tz))
+        .values('dia', 'estado')
+        .annotate(cantidad=Count('id'), total=Sum('total'))
+    )
+    for fila in filas:
+        venta = dias.setdefault(fila['dia'], VentaDiaria(fecha=fila['dia'], ingresos=Decimal(0)))
+        campo = CAMPOS_ESTADO.get(fila['estado'])
+        if campo:
+            setattr(venta, campo, getattr(venta, campo) + fila['cantidad'])
+        if fila['estado'] in ESTADOS_PAGADOS:
+            venta.ingresos += fila['total'] or 0
+    VentaDiaria.objects.bulk_create(dias.values(), batch_size=500)
+
+    filas_producto = (
+        CarritoProductoPedido.objects
+        .filter(pedido__estado__in=ESTADOS_PAGADOS)
+        .annotate(dia=TruncDate('pedido__fecha', tzinfo=tz))
+        .values('dia', 'producto_id')
+        .annotate(unidades=Sum('cantidad'), ingresos=Sum('total'))
+    )
+    productos = [
+        VentaProductoDiaria(fecha=fila['dia'], producto_id=fila['producto_id'],
+                            unidades=fila['unidades'] or 0, ingresos=fila['ingresos'] or 0)
+        for fila in filas_producto
+    ]
+    VentaProductoDiaria.objects.bulk_create(productos, batch_size=500)
+    return len(dias), len(productos)
@@ -1,7 +1,9 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse
-from django.views.decorators.csrf import csrf_exempt
+from django.http import HttpResponse, JsonResponse, Http404
+from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.conf import settings
@@ -9,9 +11,23 @@ import json
 from decimal import Decimal
 from django.db import transaction
 
-from .models import Producto, Rol, Categoria, Usuario, Pedido, CarritoProductoPedido, Transaccion, ProductoImagen
+from .models import Producto, Rol, Categoria, Usuario, Pedido, CarritoProductoPedido, Transaccion, ProductoImagen, VentaDiaria, VentaProductoDiaria
 from .forms import ProductoForm, categoriaForm, UsuarioForm, ProductoImagenForm
 from .utils import generate_payment_signature, generate_confirmation_signature  # ✅ importamos desde utils
+from .ventas import CAMPOS_ESTADO, cambiar_estado_pedido
+from . import cache_catalogo
+from .paginacion import CursorInvalido, normalizar_orden
+from .autocompletar import get_indice
+from .imagenes import archivos_de
+from .tareas import encolar
+from .inventario import con_disponible
+from .pagos import procesar_confirmacion, recibir_evento
+from .pedidos import PedidoInvalido, crear_pedido_desde_carrito
+from . import carrito as carrito_servidor
+from . import exportar
+from . import tablas
+from . import contadores
+from .condicional import condicional, marca_catalogo, marca_producto
 
 
 # --------------------------
@@ -48,6 +64,12 @@ def payu_checkout(request, pedido_id):
     )
 
     action_url = settings.PAYU_SANDBOX_URL if settings.PAYU_USE_SANDBOX else settings.PAYU_PROD_URL
+    response_url, confirmation_url = settings.PAYU_RESPONSE_URL, settings.PAYU_CONFIRMATION_URL
+    if getattr(settings, "PAYU_LOCAL_URL", None):
+        # Pasarela falsa (manage.py payu_local): responde a este mismo servidor
+        action_url = settings.PAYU_LOCAL_URL
+        response_url = request.build_absolute_uri(reverse("payu_response"))
+        confirmation_url = request.build_absolute_uri(reverse("payu_confirmation"))
 
     form_html = f"""
     <html><body>
@@ -64,8 +86,8 @@ def payu_checkout(request, pedido_id):
         <!-- 2. Añadimos el nombre completo del comprador -->
         <input name="buyerFullName" type="hidden" value="{request.user.get_full_name()}" />
         <input name="buyerEmail" type="hidden" value="{request.user.email}" />
-        <input name="responseUrl" type="hidden" value="{settings.PAYU_RESPONSE_URL}" />
-        <input name="confirmationUrl" type="hidden" value="{settings.PAYU_CONFIRMATION_URL}" />
+        <input name="responseUrl" type="hidden" value="{response_url}" />
+        <input name="confirmationUrl" type="hidden" value="{confirmation_url}" />
       </form>
       <script>document.getElementById('payuForm').submit();</script>
     </body></html>
@@ -73,12 +95,10 @@ def payu_checkout(request, pedido_id):
     return HttpResponse(form_html)
 
 
-@csrf_exempt
-def payu_confirmation(request):
+def firma_confirmacion_valida(data) -> bool:
     """
-    Webhook de PayU: actualiza estado del pedido.
+    Compara la firma enviada por PayU en la confirmación con la esperada.
     """
-    data = request.POST.dict()
     merchant_id = data.get("merchant_id")
     reference_sale = data.get("reference_sale")   # Ej: "MOTO-19"
     value = data.get("value")
@@ -96,48 +116,28 @@ def payu_confirmation(request):
         state_pol,
         secret_key=settings.PAYU_API_KEY
     )
+    return expected_sign == sign_received
+
 
-    if expected_sign == sign_received:
+@csrf_exempt
+def payu_confirmation(request):
+    """
+    Webhook de PayU: actualiza estado del pedido.
+    """
+    data = request.POST.dict()
+    if firma_confirmacion_valida(data):
+        if settings.PAYU_CONFIRMACION_DIFERIDA:
+            # Solo se guarda el evento; lo aplica `manage.py process_payu_events`
+            recibir_evento(data)
+            return HttpResponse("OK")
+
+        # Cada (transaction_id, state_pol) se registra y aplica una sola vez:
+        # los reintentos de PayU responden OK sin volver a tocar el pedido
         try:
-            # La referencia ahora es "MOTO-{pedido_id}"
-            pedido_id = int(reference_sale.split("-")[1])
-            pedido = Pedido.objects.filter(id=pedido_id).first()
-
-            # Guardamos o actualizamos la transacción
-            Transaccion.objects.update_or_create(
-                id_transaccion_payu=data.get("transaction_id"),
-                defaults={
-                    'pedido': pedido,
-                    'estado_pol': state_pol,
-                    'mensaje_respuesta': data.get("response_message_pol"),
-                    'metodo_pago_nombre': data.get("payment_method_name"),
-                    'valor': Decimal(value),
-                    'moneda': currency,
-                }
-            )
-
-
-            if pedido:
-                if state_pol == "4" and pedido.estado == 'Pendiente':  # Pago APROBADO y pedido aún pendiente
-                    with transaction.atomic():
-                        # 1. Actualizar el estado del pedido
-                        pedido.estado = "Procesando"
-                        pedido.save()
-
-                        # 2. Descontar el stock de cada producto en el pedido
-                        for item_carrito in pedido.carritos.all():
-                            producto = item_carrito.producto
-                            # Restamos la cantidad comprada del stock del producto
-                            producto.stock -= item_carrito.cantidad
-                            producto.save()
-
-                elif state_pol in ["5", "6"]:  # expirado o rechazado
-                    if pedido.estado == 'Pendiente':
-                        pedido.estado = "Cancelado"
-                        pedido.save()
-        except Exception as e:
-            # Es buena práctica registrar el error
-            print("Error procesando confirmation:", e)
+            procesar_confirmacion(data)
+        except Exception:
+            # El evento queda registrado con el error; PayU reintenta ante un 500
+            return HttpResponse("Error", status=500)
 
         return HttpResponse("OK")
 
@@ -157,26 +157,141 @@ def payu_response(request):
 
 
 
+def _pagina_catalogo(request, **filtros):
+    """
+    Página de productos según ?orden= y ?cursor=; un cursor dañado vuelve a la primera página.
+    """
+    orden = normalizar_orden(request.GET.get('orden'), busqueda=bool(filtros.get('query', '').strip()))
+    try:
+        productos, siguiente = cache_catalogo.pagina(orden=orden, cursor=request.GET.get('cursor'), **filtros)
+    except CursorInvalido:
+        productos, siguiente = cache_catalogo.pagina(orden=orden, **filtros)
+    return productos, siguiente, orden
+
+
 #index
+@condicional(marca_catalogo)
 def index(request):
-    productos = Producto.objects.all()
-    categorias = Categoria.objects.all()
-    return render(request, 'tienda/index/index.html', {'productos': productos , 'categorias': categorias})
+    productos, siguiente, orden = _pagina_catalogo(request)
+    return render(request, 'tienda/index/index.html', {
+        'tarjetas': cache_catalogo.tarjetas(productos, 'index'),
+        'categorias': cache_catalogo.categorias(),
+        'siguiente': siguiente,
+        'orden': orden,
+        'variante': 'index',
+    })
 
 # productos por categoria
+@condicional(marca_catalogo)
 def productos_por_categoria(request, categoria_id):
-    categorias = Categoria.objects.all()
-    categoria = get_object_or_404(Categoria, id=categoria_id)
-    productos = Producto.objects.filter(categoria=categoria)
+    categoria = cache_catalogo.categoria(categoria_id)
+    if categoria is None:
+        raise Http404("Categoría no encontrada")
+    productos, siguiente, orden = _pagina_catalogo(request, categoria_id=categoria_id)
     return render(request, 'tienda/index/productos_por_categoria.html', {
-        'productos': productos,
+        'tarjetas': cache_catalogo.tarjetas(productos, 'categoria'),
         'categoria': categoria,
-        'categorias': categorias
+        'categorias': cache_catalogo.categorias(),
+        'siguiente': siguiente,
+        'orden': orden,
+        'variante': 'categoria',
+    })
+
+
+# siguiente página de tarjetas para el scroll infinito ("cargar más")
+@condicional(marca_catalogo)
+def api_productos(request):
+    variante = request.GET.get('variante', 'catalogo')
+    if variante not in ('index', 'catalogo', 'categoria'):
+        variante = 'catalogo'
+    filtros = {'query': request.GET.get('q', '')}
+    categoria_id = request.GET.get('categoria')
+    if categoria_id:
+        if not categoria_id.isdigit() or cache_catalogo.categoria(int(categoria_id)) is None:
+            return JsonResponse({"error": "Categoría no encontrada"}, status=404)
+        filtros['categoria_id'] = int(categoria_id)
+
+    try:
+        productos, siguiente = cache_catalogo.pagina(
+            orden=request.GET.get('orden'), cursor=request.GET.get('cursor'), **filtros
+        )
+    except CursorInvalido:
+        return JsonResponse({"error": "Cursor no válido"}, status=400)
+
+    return JsonResponse({
+        "tarjetas": "".join(cache_catalogo.tarjetas(productos, variante)),
+        "siguiente": siguiente,
     })
+
+
+# sugerencias del buscador mientras se escribe (índice en memoria, sin consultas a la BD)
+def api_autocompletar(request):
+    query = request.GET.get('q', '')[:100]
+    try:
+        limite = min(max(int(request.GET.get('limite', 8)), 1), 20)
+    except ValueError:
+        limite = 8
+    return JsonResponse({"sugerencias": get_indice().sugerir(query, limite=limite)})
     
+# --------------------------
+# API DEL CARRITO
+# --------------------------
+# Cada operación responde solo con la línea que cambió y el resumen del carrito.
+
+def _datos_carrito(request):
+    """
+    Lee producto_id y cantidad del cuerpo JSON. Devuelve (producto_id, cantidad) o lanza ValueError.
+    """
+    try:
+        data = json.loads(request.body or b'{}')
+        producto_id = int(data["producto_id"])
+        cantidad = int(data.get("cantidad", 1))
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Datos del carrito inválidos")
+    if cantidad < 0:
+        raise ValueError("La cantidad no puede ser negativa")
+    return producto_id, cantidad
+
+
+def _cambiar_carrito(request, calcular):
+    if request.method != "POST":
+        return JsonResponse({"success": False, "error": "Método no permitido"}, status=405)
+    try:
+        producto_id, cantidad = _datos_carrito(request)
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+    try:
+        cambio = carrito_servidor.cambiar(
+            carrito_servidor.get_carrito(request), producto_id, lambda actual: calcular(actual, cantidad),
+        )
+    except carrito_servidor.ProductoNoDisponible:
+        return JsonResponse({"success": False, "error": "El producto no existe"}, status=404)
+    return JsonResponse({"success": True, **cambio})
+
+
+# el token CSRF de las páginas cacheadas sale de la cookie, que se crea aquí
+@ensure_csrf_cookie
+def api_carrito(request):
+    return JsonResponse({"success": True, **carrito_servidor.contenido(carrito_servidor.get_carrito(request))})
+
+
+def api_carrito_agregar(request):
+    return _cambiar_carrito(request, lambda actual, cantidad: actual + max(cantidad, 1))
+
+
+def api_carrito_actualizar(request):
+    return _cambiar_carrito(request, lambda actual, cantidad: cantidad)
+
+
+def api_carrito_quitar(request):
+    return _cambiar_carrito(request, lambda actual, cantidad: 0)
+
+
 #detalle producto
+@condicional(marca_producto)
 def producto_detalle(request, producto_id):
-    producto = get_object_or_404(Producto, id=producto_id)
+    # `disponible` descuenta las unidades apartadas por pedidos pendientes de pago
+    producto = get_object_or_404(con_disponible(Producto.objects.all()), id=producto_id)
     # Obtenemos otros productos de la misma categoría para mostrarlos como sugerencias
     imagenes_adicionales = producto.imagenes_adicionales.all()
 
@@ -193,17 +308,17 @@ def detalles_facturacion(request):
     return render(request, 'tienda/detalles_factura.html')
 
 #catalogo
-from django.db.models import Q
+@condicional(marca_catalogo)
 def catalogo(request):
     query = request.GET.get('q', '')
-    productos = Producto.objects.all()
-    if query:
-        productos = productos.filter(
-            Q(nombre__icontains=query) |
-            Q(descripcion__icontains=query) |
-            Q(categoria__nombre__icontains=query)
-        )
-    return render(request, 'tienda/index/catalogo.html', {'productos': productos, 'query': query})
+    productos, siguiente, orden = _pagina_catalogo(request, query=query)
+    return render(request, 'tienda/index/catalogo.html', {
+        'tarjetas': cache_catalogo.tarjetas(productos, 'catalogo'),
+        'query': query,
+        'siguiente': siguiente,
+        'orden': orden,
+        'variante': 'catalogo',
+    })
 
 
 
@@ -228,12 +343,11 @@ def productos(request):
             messages.error(request, "Corrige los errores del formulario.")
     else:
         form = ProductoForm()
-    productos_qs = Producto.objects.all()
-    categorias_qs = Categoria.objects.all()  # Obtenemos todas las categorías
     return render(request, 'tienda/admin/productos/productos.html', {
-        'productos': productos_qs,
+        'filas': cache_catalogo.filas_admin(),
         'formulario': form,
-        'categorias': categorias_qs,  # Las pasamos al contexto
+        # Un solo <select> de categorías para el modal de edición compartido
+        'categorias': cache_catalogo.categorias(),
     })
 
 #eliminar producto admin
@@ -265,23 +379,29 @@ def editar_producto(request, producto_id=None, id=None):
 
         
         # Si viene una nueva imagen principal
+        anteriores = []
         if 'imagen' in request.FILES:
-            # Opcional: eliminar imagen anterior
             if producto.imagen:
-                producto.imagen.delete()
+                anteriores = archivos_de(producto)
             producto.imagen = request.FILES['imagen']
 
         try:
-            # Guardar cambios del producto
-            producto.save()
-            
-            # Procesar imágenes adicionales si hay
-            imagenes = request.FILES.getlist('imagenes_adicionales')
-            for imagen in imagenes:
-                ProductoImagen.objects.create(
-                    producto=producto,
-                    imagen=imagen
-                )
+            with transaction.atomic():
+                # Guardar cambios del producto
+                producto.save()
+
+                # La imagen anterior y sus derivados los borra el worker; la tarea
+                # se crea en esta transacción, así que solo existe si el guardado se confirma
+                if anteriores:
+                    encolar('eliminar_archivos', nombres=anteriores)
+
+                # Procesar imágenes adicionales si hay
+                imagenes = request.FILES.getlist('imagenes_adicionales')
+                for imagen in imagenes:
+                    ProductoImagen.objects.create(
+                        producto=producto,
+                        imagen=imagen
+                    )
             
             messages.success(request, "Producto actualizado correctamente.")
         except Exception as e:
@@ -296,9 +416,9 @@ def eliminar_imagenes_producto(request, id):
     if request.method == 'POST':
         producto = get_object_or_404(Producto, id=id)
         # Eliminar todas las imágenes adicionales asociadas
+        # Los archivos los borra el worker (señal post_delete de ProductoImagen)
         for img_adicional in producto.imagenes_adicionales.all():
-            img_adicional.imagen.delete() # Borra el archivo
-            img_adicional.delete() # Borra el registro de la BD
+            img_adicional.delete()
         messages.success(request, "Se eliminaron todas las imágenes adicionales del producto.")
     return redirect('productos')
 
@@ -364,9 +484,10 @@ def usuarios(request):
         messages.success(request, f"Administrador '{email}' creado exitosamente.")
         return redirect('usuarios')
 
-    # Para la petición GET, mostramos la lista de usuarios
-    lista_usuarios = Usuario.objects.select_related('user', 'rol').order_by('-user__date_joined')
-    return render(request, 'tienda/admin/usuarios/usuario_admin.html', {'usuarios': lista_usuarios})
+    # Para la petición GET, la tabla pide los usuarios por partes a tabla_datos
+    return render(request, 'tienda/admin/usuarios/usuario_admin.html', {
+        'roles': [(rol, rol) for rol in tablas.TABLAS['usuarios'].columnas['rol'].filtro],
+    })
 
 #eliminar usuario
 def eliminar_usuario(request, id):
@@ -377,18 +498,19 @@ def eliminar_usuario(request, id):
 
 #index admin
 # ...existing code...
-from django.db.models import Sum, Count
+from django.db.models import Sum
+from django.utils import timezone
 from datetime import datetime, timedelta
+import csv
 import json
+from .reportes import GRANULARIDADES, serie_ventas, etiqueta_bucket
 # ...existing code...
 
-def index_admin(request):
+def _rango_fechas(request):
     """
-    Dashboard admin: prepara KPIs, series de ventas (últimos 30 días),
-    top productos por unidades vendidas, estado de pedidos y pedidos recientes.
+    Lee start_date/end_date (YYYY-MM-DD) del request; por defecto los últimos 30 días.
     """
-    # 1. Obtener y validar el rango de fechas desde el request
-    today = datetime.now().date()
+    today = timezone.localdate()
     end_date_str = request.GET.get('end_date', today.strftime('%Y-%m-%d'))
     start_date_str = request.GET.get('start_date', (today - timedelta(days=29)).strftime('%Y-%m-%d'))
 
@@ -401,50 +523,57 @@ def index_admin(request):
 
     if start_date > end_date:
         start_date, end_date = end_date, start_date # Swap
+    return start_date, end_date
 
-    # KPIs básicos
-    total_productos = Producto.objects.count()
-    total_usuarios = Usuario.objects.count()
-    total_categorias = Categoria.objects.count()
-    total_pedidos = Pedido.objects.filter(fecha__date__range=[start_date, end_date]).count()
-    
-    # Consideramos solo pedidos pagados para los ingresos
-    pedidos_pagados = Pedido.objects.filter(estado__in=['Procesando', 'Entregado'], fecha__date__range=[start_date, end_date])
-
-    # Ventas en el rango de fechas (por día)
-    sales_labels = []
-    sales_data = []
-    delta = end_date - start_date
-    for i in range(delta.days + 1):
-        day = start_date + timedelta(days=i)
-        sales_labels.append(day.strftime("%d %b"))
-        day_total = (
-            pedidos_pagados.filter(fecha__date=day)
-            .aggregate(total=Sum('total'))['total'] or 0
-        )
-        sales_data.append(float(day_total))
 
-    # Top productos por unidades vendidas en el rango de fechas
+def _granularidad(request):
+    granularidad = request.GET.get('granularidad', 'dia')
+    return granularidad if granularidad in GRANULARIDADES else 'dia'
+
+
+def index_admin(request):
+    """
+    Dashboard admin: prepara KPIs, series de ventas (últimos 30 días),
+    top productos por unidades vendidas, estado de pedidos y pedidos recientes.
+    """
+    # 1. Obtener y validar el rango de fechas desde el request
+    start_date, end_date = _rango_fechas(request)
+    granularidad = _granularidad(request)
+
+    # KPIs básicos (contadores mantenidos por señales, una sola consulta)
+    totales = contadores.valores('productos', 'usuarios', 'categorias')
+    total_productos = totales['productos']
+    total_usuarios = totales['usuarios']
+    total_categorias = totales['categorias']
+
+    # Ventas en el rango de fechas (una sola consulta agrupada por día/semana/mes)
+    serie = serie_ventas(start_date, end_date, granularidad)
+    sales_labels = [etiqueta_bucket(bucket, granularidad) for bucket, _ in serie]
+    sales_data = [float(total) for _, total in serie]
+
+    # Top productos por unidades vendidas en el rango de fechas (desde el resumen diario)
     top_products_qs = (
-        CarritoProductoPedido.objects
-        .filter(pedido__estado__in=['Procesando', 'Entregado'],
-                pedido__fecha__date__range=[start_date, end_date])
+        VentaProductoDiaria.objects
+        .filter(fecha__range=[start_date, end_date])
         .values('producto__id', 'producto__nombre')
-        .annotate(units_sold=Sum('cantidad'))
+        .annotate(units_sold=Sum('unidades'))
+        .filter(units_sold__gt=0)
         .order_by('-units_sold')[:6]
     )
     top_products_labels = [p['producto__nombre'] for p in top_products_qs]
     top_products_data = [int(p['units_sold'] or 0) for p in top_products_qs]
 
     # Estado de pedidos (conteo por estado) en el rango de fechas
-    orders_status_qs = (
-        Pedido.objects.filter(fecha__date__range=[start_date, end_date])
-        .values('estado')
-        .annotate(count=Count('id'))
-        .order_by('-count')
+    conteos = VentaDiaria.objects.filter(fecha__range=[start_date, end_date]).aggregate(
+        **{estado: Sum(campo) for estado, campo in CAMPOS_ESTADO.items()}
+    )
+    orders_status = sorted(
+        ((estado, int(conteos[estado] or 0)) for estado in CAMPOS_ESTADO if conteos[estado]),
+        key=lambda o: -o[1],
     )
-    orders_status_labels = [o['estado'] for o in orders_status_qs]
-    orders_status_data = [int(o['count']) for o in orders_status_qs]
+    orders_status_labels = [estado for estado, _ in orders_status]
+    orders_status_data = [count for _, count in orders_status]
+    total_pedidos = sum(orders_status_data)
 
     # Pedidos recientes (últimos 8)
     recent_orders_qs = (
@@ -467,8 +596,8 @@ def index_admin(request):
 
     # Productos que nunca se han vendido
     sold_product_ids = (
-        CarritoProductoPedido.objects
-        .filter(pedido__estado__in=['Procesando', 'Entregado'])
+        VentaProductoDiaria.objects
+        .filter(unidades__gt=0)
         .values_list('producto_id', flat=True).distinct()
     )
     unsold_products = Producto.objects.exclude(id__in=sold_product_ids).order_by('nombre')[:5]
@@ -476,6 +605,7 @@ def index_admin(request):
     context = {
         'start_date': start_date.strftime('%Y-%m-%d'),
         'end_date': end_date.strftime('%Y-%m-%d'),
+        'granularidad': granularidad,
         'total_productos': total_productos,
         'total_usuarios': total_usuarios,
         'total_categorias': total_categorias,
@@ -495,6 +625,23 @@ def index_admin(request):
     return render(request, 'tienda/admin/index_admin.html', context)
 
 
+@staff_member_required
+def exportar_ventas(request):
+    """
+    Exporta a CSV la misma serie de ingresos que muestra el dashboard.
+    """
+    start_date, end_date = _rango_fechas(request)
+    granularidad = _granularidad(request)
+
+    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="ventas_{start_date}_{end_date}.csv"'
+    writer = csv.writer(response)
+    writer.writerow(['periodo', 'ingresos'])
+    for bucket, total in serie_ventas(start_date, end_date, granularidad):
+        writer.writerow([bucket.strftime('%Y-%m-%d'), total])
+    return response
+
+
 def base_admin(request):
     return render(request, 'tienda/admin/base_admin.html')
 
@@ -548,8 +695,29 @@ def tablas_bootstrap(request):
     return render(request, 'tienda/admin/pedidos/tables-bootstrap-tables.html')
 
 def transactions(request):
-    lista_transacciones = Transaccion.objects.select_related('pedido__usuario__user').order_by('-fecha')
-    return render(request, 'tienda/admin/pedidos/transactions.html', {'transacciones': lista_transacciones})
+    # Las filas las trae la tabla desde tabla_datos, página por página
+    return render(request, 'tienda/admin/pedidos/transactions.html', {'estados': list(exportar.ESTADOS_POL.items())})
+
+
+@staff_member_required
+def tabla_datos(request, nombre):
+    """
+    JSON de las tablas del panel (pedidos, transacciones, usuarios) con el
+    protocolo de bootstrap-table sidePagination: 'server' (ver tienda/tablas.py).
+    """
+    if nombre not in tablas.TABLAS:
+        raise Http404("Tabla no encontrada")
+    try:
+        return JsonResponse(tablas.datos(nombre, request.GET))
+    except CursorInvalido:
+        return JsonResponse({"error": "Cursor no válido"}, status=400)
+
+@staff_member_required
+def exportar_transacciones(request):
+    """
+    Como exportar_pedidos, para las transacciones de PayU (?estado= es el estado_pol).
+    """
+    return exportar.respuesta(request, 'transacciones')
 
 def transaction_detail(request, transaction_id):
     transaccion = get_object_or_404(Transaccion.objects.select_related('pedido__usuario__user'), id=transaction_id)
@@ -594,15 +762,20 @@ def detalles_facturacion(request):
 
 # pedidos
 def pedidos(request):
-    # Optimizamos la consulta para incluir datos del usuario y evitar consultas extra en la plantilla
-    lista_pedidos = Pedido.objects.select_related('usuario__user').order_by('-fecha')
-    return render(request, 'tienda/admin/pedidos/pedidos.html', {
-        'pedidos': lista_pedidos
-    })
+    # Las filas las trae la tabla desde tabla_datos, página por página
+    return render(request, 'tienda/admin/pedidos/pedidos.html', {'estados': Pedido.ESTADOS})
+
+@staff_member_required
+def exportar_pedidos(request):
+    """
+    Todos los pedidos, o los filtrados por ?start_date, ?end_date y ?estado, en
+    CSV (o XLSX con ?formato=xlsx). Se envía por partes: sirve para millones de filas.
+    """
+    return exportar.respuesta(request, 'pedidos')
 
 def pedido_detalle(request, pedido_id):
-    pedido = get_object_or_404(Pedido, id=pedido_id)
-    carritos = CarritoProductoPedido.objects.filter(pedido=pedido)
+    pedido = get_object_or_404(Pedido.objects.select_related('usuario__user'), id=pedido_id)
+    carritos = CarritoProductoPedido.objects.filter(pedido=pedido).select_related('producto')
 
     # obtenemos transacciones relacionadas
     transacciones = Transaccion.objects.filter(pedido=pedido).order_by('-fecha')
@@ -610,8 +783,7 @@ def pedido_detalle(request, pedido_id):
     if request.method == 'POST':
         nuevo_estado = request.POST.get('estado')
         if nuevo_estado in [estado[0] for estado in Pedido.ESTADOS]:
-            pedido.estado = nuevo_estado
-            pedido.save()
+            cambiar_estado_pedido(pedido, nuevo_estado)
             messages.success(request, f"El estado del pedido #{pedido.id} ha sido actualizado a '{nuevo_estado}'.")
             return redirect('pedido_detalle', pedido_id=pedido.id)
 
@@ -636,22 +808,23 @@ def crear_pedido(request):
         # Asegúrate de tener al menos un método de pago en tu base de datos.
         
 
-        pedido = Pedido.objects.create(
-            usuario=usuario,
-            
-            total=sum(float(item["price"]) * int(item["quantity"]) for item in data["carrito"]),
-            estado="Pendiente"
-        )
-
-        for item in data["carrito"]:
-            producto = get_object_or_404(Producto, id=item["id"])
-            CarritoProductoPedido.objects.create(
-                pedido=pedido,
-                producto=producto,
-                cantidad=item["quantity"],
-                total=float(item["price"]) * int(item["quantity"])
-            )
+        # Sin "carrito" en el cuerpo se usa el que está guardado en el servidor
+        guardado = carrito_servidor.get_carrito(request)
+        contenido = data.get("carrito")
+        if contenido is None:
+            contenido = [{"id": pk, "quantity": cantidad} for pk, cantidad in guardado.items().items()]
 
+        try:
+            # Valida el carrito, crea el pedido y sus líneas y aparta el stock en una transacción
+            pedido = crear_pedido_desde_carrito(usuario, contenido, cupon=data.get("cupon"))
+        except PedidoInvalido as e:
+            return JsonResponse({
+                "success": False,
+                "error": e.errores[0]['mensaje'] if len(e.errores) == 1 else "Algunos productos de tu carrito no están disponibles.",
+                "errores": e.errores,
+            }, status=409 if e.solo_stock else 400)
+
+        guardado.vaciar()
         return JsonResponse({"success": True, "pedido_id": pedido.id})
 
     return JsonResponse({"success": False})
@@ -0,0 +1,120 @@
+# views_async.py
+
+# versiones async de las vistas de la tienda que más se leen y del webhook de PayU,
+# para servir con ASGI (uvicorn motolux.asgi:application) y settings.VISTAS_ASYNC = True.
+# Con WSGI se siguen usando las de views.py.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.shortcuts import aget_object_or_404, render
+from django.views.decorators.csrf import csrf_exempt
+
+from . import cache_catalogo
+from .condicional import condicional, marca_catalogo, marca_producto
+from .inventario import con_disponible
+from .models import Producto, Usuario
+from .pagos import arecibir_evento, procesar_confirmacion
+from .paginacion import CursorInvalido, normalizar_orden
+from .views import firma_confirmacion_valida
+
+
+async def _cargar_usuario(request):
+    """
+    En una vista async la plantilla no puede disparar consultas: se cargan antes
+    el usuario y, si inició sesión, su perfil con el rol (los usa base1.html).
+    """
+    usuario = await request.auser()
+    if usuario.is_authenticated:
+        perfil = await Usuario.objects.select_related('rol').filter(user=usuario).afirst()
+        if perfil is not None:
+            usuario.perfil = perfil
+    request.user = usuario
+
+
+async def _pagina_catalogo(request, **filtros):
+    orden = normalizar_orden(request.GET.get('orden'), busqueda=bool(filtros.get('query', '').strip()))
+    try:
+        productos, siguiente = await cache_catalogo.apagina(orden=orden, cursor=request.GET.get('cursor'), **filtros)
+    except CursorInvalido:
+        productos, siguiente = await cache_catalogo.apagina(orden=orden, **filtros)
+    return productos, siguiente, orden
+
+
+@condicional(marca_catalogo)
+async def index(request):
+    await _cargar_usuario(request)
+    productos, siguiente, orden = await _pagina_catalogo(request)
+    return render(request, 'tienda/index/index.html', {
+        'tarjetas': await cache_catalogo.atarjetas(productos, 'index'),
+        'categorias': await cache_catalogo.acategorias(),
+        'siguiente': siguiente,
+        'orden': orden,
+        'variante': 'index',
+    })
+
+
+@condicional(marca_catalogo)
+async def productos_por_categoria(request, categoria_id):
+    categoria = await cache_catalogo.acategoria(categoria_id)
+    if categoria is None:
+        raise Http404("Categoría no encontrada")
+    await _cargar_usuario(request)
+    productos, siguiente, orden = await _pagina_catalogo(request, categoria_id=categoria_id)
+    return render(request, 'tienda/index/productos_por_categoria.html', {
+        'tarjetas': await cache_catalogo.atarjetas(productos, 'categoria'),
+        'categoria': categoria,
+        'categorias': await cache_catalogo.acategorias(),
+        'siguiente': siguiente,
+        'orden': orden,
+        'variante': 'categoria',
+    })
+
+
+@condicional(marca_catalogo)
+async def catalogo(request):
+    await _cargar_usuario(request)
+    query = request.GET.get('q', '')
+    productos, siguiente, orden = await _pagina_catalogo(request, query=query)
+    return render(request, 'tienda/index/catalogo.html', {
+        'tarjetas': await cache_catalogo.atarjetas(productos, 'catalogo'),
+        'query': query,
+        'siguiente': siguiente,
+        'orden': orden,
+        'variante': 'catalogo',
+    })
+
+
+@condicional(marca_producto)
+async def producto_detalle(request, producto_id):
+    await _cargar_usuario(request)
+    producto = await aget_object_or_404(con_disponible(Producto.objects.select_related('categoria')), id=producto_id)
+    imagenes_adicionales = [imagen async for imagen in producto.imagenes_adicionales.all()]
+    productos_relacionados = [
+        relacionado async for relacionado in
+        Producto.objects.filter(categoria_id=producto.categoria_id).exclude(id=producto_id)[:4]
+    ]
+    return render(request, 'tienda/index/producto_detalle.html', {
+        'producto': producto,
+        'productos_relacionados': productos_relacionados,
+        'imagenes_adicionales': imagenes_adicionales,
+    })
+
+
+@csrf_exempt
+async def payu_confirmation(request):
+    """
+    Webhook de PayU. En modo diferido el evento se guarda sin salir del event
+    loop; si no, se aplica en un hilo porque usa transacciones (el ORM async no las tiene).
+    """
+    data = request.POST.dict()
+    if not firma_confirmacion_valida(data):
+        return HttpResponse("Invalid signature", status=400)
+
+    if settings.PAYU_CONFIRMACION_DIFERIDA:
+        await arecibir_evento(data)
+        return HttpResponse("OK")
+    try:
+        await sync_to_async(procesar_confirmacion)(data)
+    except Exception:
+        return HttpResponse("Error", status=500)
+    return HttpResponse("OK")